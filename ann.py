@@ -0,0 +1,232 @@
+import numpy as np
+from scoring import unitvec, top_k
+from cache import model_tag
+from time import time
+import argparse
+import os
+import sys
+
+
+def index_path(model_path: str) -> str:
+    """Path of the ANN index stored next to a model file (models/fasttext_model.bin -> models/fasttext_model.ivf.npz)
+
+    Arguments:
+        model_path {str} -- path to the model file
+    """
+    return os.path.splitext(model_path)[0] + '.ivf.npz'
+
+class IVFIndex():
+    """Approximate nearest neighbor index (inverted file) over normalized word vectors.
+    The vocabulary is clustered with spherical k-means; a query only scans the vectors of its nprobe closest clusters.
+    nprobe is the recall knob: nprobe = nlist gives the exact search.
+    """
+
+    def __init__(self, vectors, centroids, ids, offsets, nprobe=8):
+        """
+        Arguments:
+            vectors {np.ndarray} -- normalized vocabulary matrix (the index stores only row ids)
+            centroids {np.ndarray} -- normalized cluster centroids (nlist x dim)
+            ids {np.ndarray} -- row ids sorted by cluster
+            offsets {np.ndarray} -- start of every cluster in ids (nlist + 1)
+
+        Keyword Arguments:
+            nprobe {int} -- number of clusters scanned per query (default: {8})
+        """
+        self._vectors = vectors
+        self._centroids = centroids
+        self._ids = ids
+        self._offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self):
+        return self._centroids.shape[0]
+
+    @classmethod
+    def build(cls, vectors, nlist=None, n_iter=10, sample_size=None, seed=0, batch_size=4096, nprobe=8):
+        """Cluster the vocabulary and build the inverted lists
+
+        Arguments:
+            vectors {np.ndarray} -- normalized vocabulary matrix
+
+        Keyword Arguments:
+            nlist {int} -- number of clusters (default: {4 * sqrt(vocabulary size)})
+            n_iter {int} -- k-means iterations (default: {10})
+            sample_size {int} -- number of vectors used for training the centroids (default: {64 * nlist})
+            seed {int} -- random seed (default: {0})
+            batch_size {int} -- number of vectors assigned at once (default: {4096})
+            nprobe {int} -- number of clusters scanned per query (default: {8})
+
+        Returns:
+            IVFIndex -- index
+        """
+        rng = np.random.RandomState(seed)
+        nlist = min(nlist or int(4 * np.sqrt(len(vectors))), len(vectors))
+        sample_size = min(sample_size or 64 * nlist, len(vectors))
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)]
+        for _ in range(n_iter):
+            assignment = _assign(sample, centroids, batch_size)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            # re-seed empty clusters with random samples
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            centroids = unitvec(sums)
+
+        assignment = _assign(vectors, centroids, batch_size)
+        ids = np.argsort(assignment, kind='stable').astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+
+        return cls(vectors, centroids, ids, offsets, nprobe=nprobe)
+
+    def search(self, queries, topn: int, nprobe=None) -> list:
+        """Approximate topn nearest vocabulary rows of every (unit) query vector
+
+        Arguments:
+            queries {np.ndarray} -- matrix of query unit vectors
+            topn {int} -- number of neighbors
+
+        Keyword Arguments:
+            nprobe {int} -- number of clusters scanned per query (default: {self.nprobe})
+
+        Returns:
+            list -- list of (row ids, similarities) sorted by decreasing similarity for every query
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = top_k(queries @ self._centroids.T, nprobe)
+
+        result = []
+        for query, lists in zip(queries, probes):
+            candidates = np.concatenate([self._ids[self._offsets[l]:self._offsets[l + 1]] for l in lists])
+            dists = self._vectors[candidates] @ query
+            best = top_k(dists[None, :], topn)[0]
+            result.append((candidates[best], dists[best]))
+        return result
+
+    def save(self, path: str, tag=''):
+        """Save the index (written aside then renamed: other processes may be loading it)
+
+        Arguments:
+            path {str} -- path to the index file (.npz)
+
+        Keyword Arguments:
+            tag {str} -- identifies the model the index was built for (see model_tag) (default: {''})
+        """
+        temp_path = path[:-len('.npz')] + '.tmp{}.npz'.format(os.getpid())
+        np.savez(temp_path, centroids=self._centroids, ids=self._ids, offsets=self._offsets, model=np.array(tag))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, vectors, nprobe=8, tag=None):
+        """Load an index saved by save
+
+        Arguments:
+            path {str} -- path to the index file
+            vectors {np.ndarray} -- normalized vocabulary matrix the index was built on
+
+        Keyword Arguments:
+            nprobe {int} -- number of clusters scanned per query (default: {8})
+            tag {str} -- model the index must have been built for, ValueError otherwise (default: {None, not checked})
+        """
+        data = np.load(path)
+        if data['ids'].shape[0] != vectors.shape[0]:
+            raise ValueError('ANN index {} was built for another vocabulary'.format(path))
+        if tag is not None and ('model' not in data or str(data['model']) != tag):
+            raise ValueError('ANN index {} was built for another model'.format(path))
+        return cls(vectors, data['centroids'], data['ids'], data['offsets'], nprobe=nprobe)
+
+def _assign(vectors, centroids, batch_size: int):
+    """Index of the closest centroid of every vector
+    """
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for begin in range(0, len(vectors), batch_size):
+        assignment[begin:begin + batch_size] = np.argmax(vectors[begin:begin + batch_size] @ centroids.T, axis=1)
+    return assignment
+
+def load_index(model_path: str, vectors, nprobe=8, nlist=None):
+    """Load the index stored next to the model, building (and saving) it first if it does not exist or was built for
+    another model file (its model_tag is stored with the index)
+
+    Arguments:
+        model_path {str} -- path to the model file
+        vectors {np.ndarray} -- normalized vocabulary matrix of the model
+
+    Keyword Arguments:
+        nprobe {int} -- number of clusters scanned per query (default: {8})
+        nlist {int} -- number of clusters if the index is built (default: {4 * sqrt(vocabulary size)})
+
+    Returns:
+        IVFIndex -- index
+    """
+    path = index_path(model_path)
+    tag = model_tag(model_path)
+    if os.path.exists(path):
+        try:
+            return IVFIndex.load(path, vectors, nprobe=nprobe, tag=tag)
+        except ValueError as e:
+            print('{}, rebuilding it'.format(e))
+
+    index = IVFIndex.build(vectors, nlist=nlist, nprobe=nprobe)
+    index.save(path, tag=tag)
+    print('ANN index saved at: ', path)
+    return index
+
+def recall_report(index: IVFIndex, vectors, n_queries=1000, topn=10, nprobes=(1, 2, 4, 8, 16, 32), seed=0) -> list:
+    """Compare the index against the exact search on random vocabulary words
+
+    Arguments:
+        index {IVFIndex} -- index
+        vectors {np.ndarray} -- normalized vocabulary matrix
+
+    Keyword Arguments:
+        n_queries {int} -- number of query words (default: {1000})
+        topn {int} -- number of neighbors (default: {10})
+        nprobes {tuple} -- nprobe values to evaluate (default: {(1, 2, 4, 8, 16, 32)})
+        seed {int} -- random seed (default: {0})
+
+    Returns:
+        list -- one dict per nprobe with recall@topn and mean latency per query (ms) of the exact and approximate search
+    """
+    rng = np.random.RandomState(seed)
+    queries = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)]
+
+    start = time()
+    exact = [set(row) for row in top_k(queries @ vectors.T, topn)]
+    exact_ms = (time() - start) * 1000 / len(queries)
+
+    report = []
+    for nprobe in nprobes:
+        start = time()
+        approx = index.search(queries, topn, nprobe=nprobe)
+        ann_ms = (time() - start) * 1000 / len(queries)
+        recall = np.mean([len(truth.intersection(ids)) / len(truth) for truth, (ids, _) in zip(exact, approx)])
+        report.append({'nprobe': min(nprobe, index.nlist), 'recall': float(recall), 'exact_ms': exact_ms, 'ann_ms': ann_ms})
+    return report
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--modelpath', type=str, help='Enter path of pre-trained word embedding model in gensim keywordvector format')
+    parser.add_argument('--nlist', type=int, help='Number of clusters of the index (default: 4*sqrt(vocabulary size))')
+    parser.add_argument('--n_queries', type=int, help='Number of query words for the recall/latency report', default=1000)
+    parser.add_argument('--topn', type=int, help='Number of neighbors per query', default=10)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE (builds the index next to the model if needed and prints the report):
+    # python ann.py --modelpath /media/druv022/Data2/Challenge/models/fasttext_model.bin
+    from gensim.models.wrappers import FastText
+
+    args = parse_arguments(sys.argv[1:])
+    model = FastText.load_fasttext_format(args.modelpath)
+    model.wv.init_sims()
+
+    index = load_index(args.modelpath, model.wv.vectors_norm, nlist=args.nlist)
+    print('nlist: ', index.nlist)
+    for row in recall_report(index, model.wv.vectors_norm, n_queries=args.n_queries, topn=args.topn):
+        print('nprobe: {nprobe:4d}  recall@{topn}: {recall:.3f}  exact: {exact_ms:.2f} ms  ann: {ann_ms:.2f} ms'.format(
+            topn=args.topn, **row))
@@ -0,0 +1,67 @@
+import shutil
+import time
+import os
+
+
+def temp_path(path: str) -> str:
+    """Temporary directory of this process next to path (two processes writing the same path never share it). A
+    leftover of a crashed process with the same pid is removed
+
+    Arguments:
+        path {str} -- path of the directory to write
+    """
+    temp = '{}.tmp{}'.format(path.rstrip(os.sep), os.getpid())
+    if os.path.exists(temp):
+        shutil.rmtree(temp)
+    return temp
+
+def replace_dir(temp_path: str, path: str, keep_seconds=60):
+    """Publish a fully written directory at path atomically. The directory is renamed to a version next to path
+    (path.v<time>.<pid>) and path is a symlink swapped onto the new version in one rename, so a reader opening path
+    sees the old version or the new one, never a missing or partial directory, and concurrent writers do not collide
+    (the last swap wins). A replaced version is removed by a later swap once it has been replaced for keep_seconds, so
+    a reader which resolved it just before the swap can finish loading.
+    Readers should resolve path once (os.path.realpath) and read every file of the version it points to.
+
+    Arguments:
+        temp_path {str} -- fully written directory (see temp_path)
+        path {str} -- path to publish it at (a directory, a symlink to a version or a file)
+
+    Keyword Arguments:
+        keep_seconds {float} -- how long a replaced version is kept (default: {60})
+    """
+    path = path.rstrip(os.sep)
+    version = '{}.v{:020d}.{}'.format(path, time.time_ns(), os.getpid())
+    os.rename(temp_path, version)
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        # directory written before versions were used: moved aside once as the oldest version (the only step with a
+        # moment where path is missing)
+        try:
+            os.rename(path, '{}.v{:020d}.{}'.format(path, 0, os.getpid()))
+        except FileNotFoundError:
+            pass
+    previous = os.path.basename(os.path.realpath(path)) if os.path.islink(path) else None
+
+    link = '{}.link{}'.format(path, os.getpid())
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, path)
+
+    if previous is not None:
+        _remove_versions(path, previous, keep_seconds)
+
+def _remove_versions(path: str, previous: str, keep_seconds: float):
+    """Remove the versions of path older than the replaced one (names sort by the time they were written) whose
+    successor was written more than keep_seconds ago
+    """
+    directory, name = os.path.split(path)
+    prefix = name + '.v'
+    versions = sorted(entry for entry in os.listdir(directory or '.')
+                      if entry.startswith(prefix) and entry[len(prefix):len(prefix) + 20].isdigit() and
+                      entry[len(prefix) + 20:len(prefix) + 21] == '.')
+    limit = time.time_ns() - int(keep_seconds * 1e9)
+    for entry, successor in zip(versions, versions[1:]):
+        if entry < previous and int(successor[len(prefix):len(prefix) + 20]) < limit:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
@@ -0,0 +1,383 @@
+"""Offline benchmark suite for the ingest and query hot paths.
+
+Generates synthetic postings (benchmarks/synthetic.py), trains a tiny fastText embedding on them and measures:
+    preprocess      -- TextPreprocessor.pre_process (docs/sec)
+    parse           -- spacy parsing in batches (docs/sec)
+    filter          -- Filter.process on parsed documents, scalar and vectorized scoring (docs/sec)
+    filter.<dtype>  -- vectorized scoring with float16/int8 vectors (docs/sec) and how many skill lists change
+    learn_graph     -- end to end graph learning (docs/sec)
+    query.*         -- nearest_neighbor/next_neighbor latency on Graph and CSRGraph for a fixed set of queries (ms)
+    query.batch.*   -- NeighborIndex latency of the whole set of queries answered as one batch (ms)
+
+The query graph is built from the skills written into the synthetic postings (not learned), so query results do not
+depend on the embedding. Stages whose dependencies are not installed are reported as skipped.
+Results are written as JSON (one file per commit by default) and can be compared with an earlier run:
+
+    python benchmarks/run.py --n_docs 2000 --output results.json
+    python benchmarks/run.py --compare benchmarks/results/<commit>.json
+"""
+from contextlib import redirect_stdout
+from time import perf_counter
+import subprocess
+import statistics
+import argparse
+import platform
+import tempfile
+import random
+import json
+import time
+import sys
+import os
+import io
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import write_postings
+
+
+def throughput(function, items: list, repeat: int) -> dict:
+    """Time function(items) a number of times
+
+    Arguments:
+        function {callable} -- processes the whole list
+        items {list} -- input documents
+        repeat {int} -- number of timed runs
+
+    Returns:
+        dict -- number of documents, median docs/sec and the time of every run
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function(items)
+        seconds.append(perf_counter() - start)
+    return {'docs': len(items), 'docs_per_sec': len(items) / statistics.median(seconds), 'seconds': seconds}
+
+def latency(function, queries: list, repeat: int) -> dict:
+    """Time every query separately (after one warm-up pass)
+
+    Arguments:
+        function {callable} -- answers one query
+        queries {list} -- list of queries
+        repeat {int} -- number of passes over the queries
+
+    Returns:
+        dict -- number of queries, mean/p50/p99 latency in milliseconds
+    """
+    for query in queries:
+        function(query)
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = perf_counter()
+            function(query)
+            timings.append((perf_counter() - start) * 1000)
+    timings.sort()
+    return {'queries': len(queries), 'mean_ms': statistics.mean(timings), 'p50_ms': timings[len(timings) // 2],
+            'p99_ms': timings[min(int(0.99 * len(timings)), len(timings) - 1)]}
+
+def train_embedding(filepath: str, model_path: str, dim=32, epoch=5) -> str:
+    """Train a tiny fastText model on the cleaned descriptions (single thread, so the model is the same on every run)
+
+    Arguments:
+        filepath {str} -- path to JSON file
+        model_path {str} -- path of the model to write
+
+    Keyword Arguments:
+        dim {int} -- vector size (default: {32})
+        epoch {int} -- number of epochs (default: {5})
+
+    Returns:
+        str -- path to the model
+    """
+    import fasttext
+    from preprocess import TextPreprocessor
+    from read import read, loads
+
+    text_path = model_path + '.txt'
+    cleaner = TextPreprocessor()
+    with open(text_path, 'w') as f:
+        for line in read(filepath):
+            f.write(cleaner.pre_process(loads(line)['description']) + '\n')
+
+    model = fasttext.train_unsupervised(text_path, dim=dim, epoch=epoch, minCount=1, thread=1, verbose=0)
+    model.save_model(model_path)
+    os.remove(text_path)
+    return model_path
+
+def query_graph(truth: list):
+    """Graph built from the skills written into the postings (same update rules as learn_graph)
+
+    Arguments:
+        truth {list} -- (title, list of (skill, weight)) for every posting
+
+    Returns:
+        Graph -- graph
+    """
+    from graph import Graph
+    from methods import add_skills
+
+    graph = Graph()
+    for title, skills in truth:
+        graph.add_node(title.lower(), 'title')
+        add_skills(graph, title, skills)
+    return graph
+
+def fixed_queries(graph, n_queries: int, seed=0) -> list:
+    """Deterministic query set: the most connected skills and titles followed by random nodes
+
+    Arguments:
+        graph {Graph} -- graph
+        n_queries {int} -- number of queries
+
+    Keyword Arguments:
+        seed {int} -- random seed (default: {0})
+
+    Returns:
+        list -- list of node names
+    """
+    nodes = sorted(graph.graph.nodes)
+    by_degree = sorted(nodes, key=lambda node: -graph.graph.degree(node))
+    hubs = [node for node in by_degree if graph.graph.nodes[node]['type'] == 'skill'][:5] + \
+           [node for node in by_degree if graph.graph.nodes[node]['type'] == 'title'][:5]
+    rest = random.Random(seed).sample([node for node in nodes if node not in hubs], max(n_queries - len(hubs), 0))
+    return (hubs + rest)[:n_queries]
+
+def run_stage(results: dict, name: str, function):
+    """Run one benchmark, recording it as skipped if a dependency is missing
+    """
+    try:
+        results[name] = function()
+    except ImportError as e:
+        results[name] = {'skipped': str(e)}
+    except OSError as e:
+        # spacy raises OSError when the language model is not installed
+        results[name] = {'skipped': str(e)}
+    print('{:<28} {}'.format(name, _summary(results[name])))
+
+def _summary(result: dict) -> str:
+    if 'skipped' in result:
+        return 'skipped ({})'.format(result['skipped'])
+    if 'docs_per_sec' in result:
+        return '{:10.1f} docs/sec'.format(result['docs_per_sec'])
+    if 'gazetteer_precision' in result:
+        return 'precision {:.3f}  recall {:.3f} (prefilter {:.3f}/{:.3f})'.format(
+            result['gazetteer_precision'] or 0.0, result['gazetteer_recall'] or 0.0,
+            result['prefilter_precision'] or 0.0, result['prefilter_recall'] or 0.0)
+    return 'p50 {:.3f} ms  p99 {:.3f} ms'.format(result['p50_ms'], result['p99_ms'])
+
+def run(workdir: str, n_docs=2000, n_queries=200, repeat=3, seed=0) -> dict:
+    """Run every benchmark
+
+    Arguments:
+        workdir {str} -- directory for the generated data, model and graphs
+
+    Keyword Arguments:
+        n_docs {int} -- number of synthetic postings (default: {2000})
+        n_queries {int} -- number of graph queries (default: {200})
+        repeat {int} -- number of timed runs (default: {3})
+        seed {int} -- random seed of the postings and queries (default: {0})
+
+    Returns:
+        dict -- results per benchmark
+    """
+    from preprocess import TextPreprocessor
+    from read import read, loads
+
+    filepath = os.path.join(workdir, 'postings.json')
+    truth = write_postings(filepath, n_docs, seed=seed)
+    descriptions = [loads(line)['description'] for line in read(filepath)]
+    results = {}
+
+    cleaner = TextPreprocessor()
+    run_stage(results, 'preprocess', lambda: throughput(lambda texts: [cleaner.pre_process(text) for text in texts],
+                                                         descriptions, repeat))
+
+    # the embedding is kept in the workdir and reused by runs over the same postings
+    model_path = os.path.join(workdir, 'fasttext_model_{}_{}.bin'.format(n_docs, seed))
+    state = {}
+
+    def parse_stage():
+        from methods import parse, parse_posting
+        texts = [parse_posting(line)[1] for line in read(filepath)]
+        return throughput(lambda items: state.update(docs=list(parse(items))), texts, repeat)
+
+    def gazetteer_stage():
+        from loader import get_gazetteer
+        from methods import Filter, parse_posting
+
+        texts = [parse_posting(line)[1] for line in read(filepath)]
+        gazetteer = get_gazetteer(labels=Filter(None).config()['ner_labels'])
+        return throughput(lambda items: list(gazetteer.pipe(items)), texts, repeat)
+
+    def gazetteer_quality_stage():
+        from gazetteer import compare
+        from loader import get_gazetteer
+        from methods import Filter, parse_posting
+
+        if 'docs' not in state:
+            raise ImportError('no parsed documents')
+        texts = [parse_posting(line)[1] for line in read(filepath)]
+        labels = Filter(None).config()['ner_labels']
+        return compare(texts, get_gazetteer(labels=labels), labels)
+
+    def filter_stage(vectorized: bool, quantize=None):
+        from gensim.models.wrappers import FastText
+        from methods import Filter
+        from scoring import VectorScorer
+        from cache import NeighborCache
+
+        if 'docs' not in state or not os.path.exists(model_path):
+            raise ImportError('no parsed documents or no embedding')
+        if 'model' not in state:
+            state['model'] = FastText.load_fasttext_format(model_path)
+        model = state['model']
+        scorer = VectorScorer(model.wv) if vectorized else None
+        if quantize:
+            from quantize import QuantizedVectors
+            model.wv.init_sims()
+            scorer.quantized = QuantizedVectors.quantize(model.wv.vectors_norm, quantize)
+
+        def process(docs):
+            # a new (empty) neighbor cache for every run
+            filter = Filter(model, scorer=scorer, cache=NeighborCache())
+            for doc in docs:
+                filter.process(doc)
+            state['metrics'] = filter.metrics.snapshot()
+        result = throughput(process, state['docs'], repeat)
+        # where the time goes (last run): stage timers, candidate counts and OOV lookups
+        result.update(stages=state['metrics']['timers'], counters=state['metrics']['counters'])
+        if quantize:
+            from quantize import skill_report
+            report = skill_report(state['docs'], model.wv, scorer.quantized)
+            result.update(identical=report['identical'], overlap=report['overlap'])
+        return result
+
+    def learn_graph_stage():
+        from methods import learn_graph
+
+        if not os.path.exists(model_path):
+            raise ImportError('no embedding')
+        graph_path = os.path.join(workdir, 'learned_graph.pkl')
+        with redirect_stdout(io.StringIO()):
+            return throughput(lambda _: learn_graph(filepath, model_path, graph_path), descriptions, repeat)
+
+    run_stage(results, 'parse', parse_stage)
+    run_stage(results, 'parse.gazetteer', gazetteer_stage)
+    run_stage(results, 'parse.gazetteer.quality', gazetteer_quality_stage)
+    try:
+        if not os.path.exists(model_path):
+            train_embedding(filepath, model_path)
+    except ImportError as e:
+        print('Embedding not trained: ', e)
+    run_stage(results, 'filter', lambda: filter_stage(False))
+    run_stage(results, 'filter.vectorized', lambda: filter_stage(True))
+    for dtype in ['float16', 'int8']:
+        run_stage(results, 'filter.' + dtype, lambda: filter_stage(True, dtype))
+    run_stage(results, 'learn_graph', learn_graph_stage)
+
+    def query_stages():
+        from csr_graph import CSRGraph
+
+        graph = query_graph(truth)
+        csr_path = os.path.join(workdir, 'query_graph.csr')
+        CSRGraph.from_graph(graph).save(csr_path)
+        queries = fixed_queries(graph, n_queries, seed=seed)
+        for name, target in [('graph', graph), ('csr', CSRGraph.load(csr_path))]:
+            run_stage(results, 'query.{}.nearest'.format(name),
+                      lambda: latency(lambda node: target.nearest_neighbor(node, 5), queries, repeat))
+            run_stage(results, 'query.{}.next'.format(name),
+                      lambda: latency(lambda node: target.next_neighbor(node, 5), queries, repeat))
+
+        from neighbors import NeighborIndex
+        index = NeighborIndex.from_graph(CSRGraph.load(csr_path))
+        run_stage(results, 'query.batch.nearest', lambda: latency(lambda nodes: index.nearest_neighbors(nodes, 5), [queries], repeat))
+        run_stage(results, 'query.batch.next', lambda: latency(lambda nodes: index.next_neighbors(nodes, 5), [queries], repeat))
+
+    try:
+        query_stages()
+    except ImportError as e:
+        for name in ['query.graph.nearest', 'query.graph.next', 'query.csr.nearest', 'query.csr.next', 'query.batch.nearest',
+                     'query.batch.next']:
+            results[name] = {'skipped': str(e)}
+
+    return results
+
+def git_revision() -> dict:
+    """Current commit of the repository and whether the tree has uncommitted changes
+    """
+    def git(*command):
+        return subprocess.run(['git'] + list(command), cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              check=True).stdout.decode('utf-8').strip()
+    try:
+        return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+def compare(base: dict, current: dict, tolerance: float) -> list:
+    """Compare two result files: docs/sec should not drop and latencies should not grow by more than the tolerance
+
+    Arguments:
+        base {dict} -- earlier results
+        current {dict} -- new results
+        tolerance {float} -- allowed relative change (0.1 = 10%)
+
+    Returns:
+        list -- names of the regressed benchmarks
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = base['results'].get(name, {})
+        for metric, higher_is_better in [('docs_per_sec', True), ('p50_ms', False), ('p99_ms', False)]:
+            if metric not in result or metric not in before:
+                continue
+            change = result[metric] / before[metric] - 1
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            print('{:<28} {:<13} {:12.3f} -> {:12.3f} ({:+.1%}){}'.format(name, metric, before[metric], result[metric],
+                                                                         change, '  REGRESSION' if regressed else ''))
+            if regressed:
+                regressions.append(name)
+    return regressions
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--n_docs', type=int, help='Number of synthetic postings', default=2000)
+    parser.add_argument('--n_queries', type=int, help='Number of graph queries', default=200)
+    parser.add_argument('--repeat', type=int, help='Number of timed runs', default=3)
+    parser.add_argument('--seed', type=int, help='Random seed of the postings and queries', default=0)
+    parser.add_argument('--workdir', type=str, help='Directory for the generated data (default: temporary directory)')
+    parser.add_argument('--output', type=str, help='Path of the JSON results (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', type=str, help='Compare with the JSON results of an earlier run')
+    parser.add_argument('--tolerance', type=float, help='Allowed relative slowdown when comparing', default=0.1)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_arguments(sys.argv[1:])
+    workdir = args.workdir or tempfile.mkdtemp()
+    if not os.path.exists(workdir):
+        os.makedirs(workdir)
+
+    revision = git_revision()
+    report = dict(revision, timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'), python=platform.python_version(),
+                  machine=platform.platform(), cpu_count=os.cpu_count(),
+                  params={'n_docs': args.n_docs, 'n_queries': args.n_queries, 'repeat': args.repeat, 'seed': args.seed},
+                  results=run(workdir, n_docs=args.n_docs, n_queries=args.n_queries, repeat=args.repeat, seed=args.seed))
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', '{}.json'.format((revision['commit'] or 'unknown')[:10]))
+    if not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Results saved at: ', output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        if base['params'] != report['params']:
+            print('WARNING: runs with different parameters: ', base['params'])
+        if compare(base, report, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,70 @@
+"""Import-time benchmark guarding the query-only startup path of methods.py.
+
+A graph lookup (--t/--neighbor query on a prebuilt graph) must not import the training dependencies and must start
+well under a second. Exits with a non-zero status if either guard fails.
+
+    python benchmarks/startup.py [--budget 1.0] [--repeat 5]
+"""
+import subprocess
+import argparse
+import tempfile
+import sys
+import os
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# modules only needed for training, none of them may be imported by a query
+HEAVY = ['spacy', 'gensim', 'fasttext', 'tqdm', 'nltk', 'networkx', 'regex']
+
+
+def make_graph(path: str):
+    """Write a small CSR graph directory (built directly, without networkx)
+    """
+    import numpy as np
+    from csr_graph import CSRGraph
+
+    names = ['software developer', 'data analyst', 'asp.net', 'sql', 'python']
+    encoded = [name.encode('utf-8') for name in names]
+    graph = CSRGraph(names=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                     name_offsets=np.cumsum([0] + [len(name) for name in encoded]).astype(np.int64),
+                     name_order=np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64),
+                     types=np.array([0, 0, 1, 1, 1], dtype=np.uint8), type_names=['title', 'skill'],
+                     indptr=np.array([0, 2, 4, 5, 7, 8], dtype=np.int64),
+                     indices=np.array([2, 3, 3, 4, 0, 0, 1, 1], dtype=np.int64),
+                     weights=np.array([0.8, 0.7, 0.7, 0.6, 0.8, 0.7, 0.7, 0.6]))
+    graph.save(path)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--budget', type=float, help='Maximum wall time of a query in seconds', default=1.0)
+    parser.add_argument('--repeat', type=int, help='Number of timed runs', default=5)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_arguments(sys.argv[1:])
+    graph_path = os.path.join(tempfile.mkdtemp(), 'graph.csr')
+    make_graph(graph_path)
+
+    command = [sys.executable, os.path.join(ROOT, 'methods.py'), '--t', 'skill', '--name', 'ASP.NET', '--neighbor', 'title',
+               '--n', '5', '--graphpath', graph_path]
+    timings = []
+    for _ in range(args.repeat):
+        start = perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=ROOT)
+        timings.append(perf_counter() - start)
+
+    probe = ('import sys, methods; methods.main(methods.parse_arguments(sys.argv[1:])); '
+             'print("IMPORTED:" + ",".join(m for m in {} if m in sys.modules))'.format(HEAVY))
+    output = subprocess.run([sys.executable, '-c', probe] + command[2:], check=True, stdout=subprocess.PIPE, cwd=ROOT)
+    imported = [m for m in output.stdout.decode('utf-8').split('IMPORTED:')[-1].strip().split(',') if m]
+
+    median = sorted(timings)[len(timings) // 2]
+    print('query startup: median {:.3f} s, min {:.3f} s (budget {:.3f} s)'.format(median, min(timings), args.budget))
+    print('heavy modules imported: ', imported or 'none')
+    if median > args.budget or imported:
+        sys.exit(1)
@@ -0,0 +1,141 @@
+"""Synthetic job postings shaped like the data described in data/README.MD (one JSON object per line with company,
+description, id and title), for benchmarks that must run offline.
+
+Postings are generated from a seeded random generator: the same arguments always give the same file. Skill popularity
+follows a Zipf law so that, as in the real data, a few skills appear in most postings.
+
+    python benchmarks/synthetic.py --output postings.json --n_docs 2000
+"""
+import argparse
+import random
+import json
+import sys
+
+COMPANIES = ['B Spot | Michael Symon Restaurants', 'Advantage / EZ Rent - A - Car', 'Northwind Traders', 'Contoso Ltd',
+             'Fabrikam Inc', 'Globex Corporation', 'Initech', 'Umbrella Health', 'Stark Logistics', 'Wayne Financial']
+
+ROLES = ['Software Developer', 'Data Analyst', 'Kitchen Supervisor', 'Dishwasher', 'Kiosk Agent', 'Accountant',
+         'Sales Representative', 'Registered Nurse', 'Project Manager', 'Warehouse Associate', 'Web Designer',
+         'Network Engineer', 'Customer Service Representative', 'Marketing Coordinator', 'Truck Driver',
+         'Database Administrator', 'Line Cook', 'Financial Analyst', 'HR Generalist', 'QA Engineer']
+
+LEVELS = ['', 'Junior ', 'Senior ', 'Lead ', 'Assistant ']
+
+SKILLS = ['ASP.NET', 'SQL Server', 'Python', 'Java', 'JavaScript', 'Microsoft Office', 'Excel', 'Salesforce', 'SAP',
+          'Oracle', 'AWS', 'Linux', 'Docker', 'Kubernetes', 'React', 'Angular', 'Tableau', 'Power BI', 'QuickBooks',
+          'Photoshop', 'AutoCAD', 'Servsafe', 'Cisco', 'Jira', 'Git', 'C++', 'C#', 'PHP', 'Ruby on Rails', 'MongoDB',
+          'PostgreSQL', 'Hadoop', 'Spark', 'TensorFlow', 'Google Analytics', 'HubSpot', 'Workday', 'PeopleSoft',
+          'Epic', 'Cerner', 'Windows Server', 'VMware', 'Azure', 'Node.js', 'Selenium', 'Jenkins', 'SharePoint',
+          'Outlook', 'Word', 'PowerPoint']
+
+SKILL_SENTENCES = ['Experience with {} and {} is required.', 'Working knowledge of {} preferred.',
+                   'Must be proficient in {} and {}.', 'Hands-on experience using {} in a production environment.',
+                   'Familiarity with {} is a plus.', 'Certification in {} will be considered an asset.']
+
+FILLER = ['Responsible for maintaining cleanliness and sanitation standards for the work area.',
+          'Interacts with customers to review contracts and answer questions.',
+          'Work closely alongside fellow employees and act in a professional manner always.',
+          'The ability to multi-task in a fast-paced environment while maintaining a calm composure.',
+          'Report to the General Manager and work equally alongside the team.',
+          'Demonstrate strong verbal and written communication skills.',
+          'Must be authorized to work in the United States.',
+          'The ability to lift 50 pounds and be on your feet for long periods of time.',
+          'Come to work on time and with a positive attitude every shift.',
+          'Follow all policies and procedures as listed in the Employee Manual.']
+
+REQUIREMENTS = ['High school diploma or GED required', 'Minimum {} years of relevant experience required',
+                'Bachelor degree in a related field preferred', 'Valid driver\'s license with an acceptable driving record']
+
+# weights given to the skills of a posting (Filter._scale)
+WEIGHTS = [0.8, 0.7, 0.6, 0.5, 0.3]
+
+
+def vocabulary(n_titles: int, n_skills: int):
+    """Title and skill names: combinations of the base lists, extended with numbered variants when more are needed
+
+    Arguments:
+        n_titles {int} -- number of distinct titles
+        n_skills {int} -- number of distinct skills
+
+    Returns:
+        tuple -- (list of titles, list of skills)
+    """
+    base_titles = [level + role for role in ROLES for level in LEVELS]
+    titles = [base_titles[i % len(base_titles)] + (' {}'.format(i // len(base_titles) + 1) if i >= len(base_titles) else '')
+              for i in range(n_titles)]
+    skills = [SKILLS[i % len(SKILLS)] + (' {}'.format(i // len(SKILLS) + 1) if i >= len(SKILLS) else '')
+              for i in range(n_skills)]
+    return titles, skills
+
+def postings(n_docs: int, n_titles=200, n_skills=400, skills_per_doc=(3, 8), seed=0):
+    """Generate job postings along with the skills written into their description
+
+    Arguments:
+        n_docs {int} -- number of postings
+
+    Keyword Arguments:
+        n_titles {int} -- number of distinct titles (default: {200})
+        n_skills {int} -- number of distinct skills (default: {400})
+        skills_per_doc {tuple} -- minimum and maximum number of skills per posting (default: {(3, 8)})
+        seed {int} -- random seed (default: {0})
+
+    Returns:
+        generator -- (posting dict, list of (skill, weight)) for every posting
+    """
+    rng = random.Random(seed)
+    titles, skills = vocabulary(n_titles, n_skills)
+    popularity = [1 / (rank + 1) for rank in range(len(skills))]
+
+    for i in range(n_docs):
+        title = titles[int(rng.paretovariate(1.2) - 1) % len(titles)]
+        chosen = list(dict.fromkeys(rng.choices(skills, weights=popularity, k=rng.randint(*skills_per_doc))))
+
+        lines = ['Position Summary'] + rng.sample(FILLER, 3) + ['Responsibilities'] + rng.sample(FILLER, 3)
+        lines.append('Requirements')
+        j = 0
+        while j < len(chosen):
+            sentence = rng.choice([item for item in SKILL_SENTENCES if item.count('{}') <= len(chosen) - j])
+            lines.append(sentence.format(*chosen[j:j + sentence.count('{}')]))
+            j += sentence.count('{}')
+        lines.extend(requirement.format(rng.randint(1, 5)) for requirement in rng.sample(REQUIREMENTS, 2))
+        lines.append('Address: {} Main Street Westlake, OH - {}'.format(rng.randint(1, 999), rng.randint(10000, 99999)))
+
+        posting = {'company': rng.choice(COMPANIES), 'description': '\n'.join(lines), 'id': i, 'title': title}
+        yield posting, [(skill, rng.choice(WEIGHTS)) for skill in chosen]
+
+def write_postings(path: str, n_docs: int, **kwargs) -> list:
+    """Write generated postings to a JSON lines file
+
+    Arguments:
+        path {str} -- path to the JSON file
+        n_docs {int} -- number of postings
+
+    Keyword Arguments:
+        see postings
+
+    Returns:
+        list -- (title, list of (skill, weight)) for every posting, in file order
+    """
+    truth = []
+    with open(path, 'w') as f:
+        for posting, skills in postings(n_docs, **kwargs):
+            f.write(json.dumps(posting) + '\n')
+            truth.append((posting['title'], skills))
+    return truth
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--output', type=str, help='Enter path of the JSON file to write')
+    parser.add_argument('--n_docs', type=int, help='Number of postings', default=2000)
+    parser.add_argument('--n_titles', type=int, help='Number of distinct titles', default=200)
+    parser.add_argument('--n_skills', type=int, help='Number of distinct skills', default=400)
+    parser.add_argument('--seed', type=int, help='Random seed', default=0)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_arguments(sys.argv[1:])
+    write_postings(args.output, args.n_docs, n_titles=args.n_titles, n_skills=args.n_skills, seed=args.seed)
+    print('Postings saved at: ', args.output)
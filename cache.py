@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from time import monotonic
+import hashlib
+import sqlite3
+import pickle
+import json
+import os
+
+
+class NeighborCache():
+    """Bounded LRU cache of most similar neighboring words keyed on (word, topn), shared across documents.
+    The same skill words show up in a large part of the postings, so most lookups are served without scanning the vocabulary.
+    """
+
+    def __init__(self, max_size=100000, tag=None):
+        """
+        Keyword Arguments:
+            max_size {int} -- maximum number of entries, least recently used entries are evicted first (default: {100000})
+            tag {str} -- identifies the embedding model the neighbors were computed with (default: {None})
+        """
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self.tag = tag
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value of a key (None if not cached) and mark it as recently used
+
+        Arguments:
+            key {tuple} -- (word, topn)
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when the cache is full
+
+        Arguments:
+            key {tuple} -- (word, topn)
+            value {list} -- list of (word, similarity)
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def merge(self, other: 'NeighborCache'):
+        """Add the entries and counters of the cache of another process (its entries become the most recently used)
+
+        Arguments:
+            other {NeighborCache} -- cache computed with the same model (same tag)
+        """
+        for key, value in other._entries.items():
+            self.put(key, value)
+        self.hits += other.hits
+        self.misses += other.misses
+
+    def save(self, path: str):
+        """Save the entries (in LRU order) to disk
+
+        Arguments:
+            path {str} -- path to the cache file
+        """
+        with open(path, 'wb') as f:
+            pickle.dump({'tag': self.tag, 'entries': list(self._entries.items())}, f)
+
+    @classmethod
+    def load(cls, path: str, max_size=100000, tag=None):
+        """Load a cache saved by save. The entries are discarded if they were computed with another model (tag mismatch)
+
+        Arguments:
+            path {str} -- path to the cache file
+
+        Keyword Arguments:
+            max_size {int} -- maximum number of entries (default: {100000})
+            tag {str} -- identifies the current embedding model (default: {None})
+
+        Returns:
+            NeighborCache -- loaded (or empty) cache
+        """
+        cache = cls(max_size=max_size, tag=tag)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            if data['tag'] == tag:
+                for key, value in data['entries'][-max_size:]:
+                    cache.put(key, value)
+        return cache
+
+class SkillCache():
+    """Persistent content-addressed cache of Filter.process results (SQLite): the skills of a description are keyed by
+    a hash of the description, so unchanged postings are not processed again when the graph is rebuilt.
+    The cache is tied to a configuration tag (embedding model, spacy model and Filter settings): when the tag changes,
+    every entry is dropped.
+    New entries are buffered in memory and written in short transactions (a small batch, or whatever is pending after
+    commit_interval seconds), so the write lock is only held while a batch is written and other handles on the same
+    file (sharded learning, a second run) are not locked out.
+    """
+
+    def __init__(self, path: str, tag: str, commit_every=100, commit_interval=1.0):
+        """
+        Arguments:
+            path {str} -- path to the SQLite file
+            tag {str} -- identifies the models and Filter configuration the skills were extracted with
+
+        Keyword Arguments:
+            commit_every {int} -- maximum number of new entries buffered before they are written (default: {100})
+            commit_interval {float} -- maximum number of seconds an entry stays buffered, checked on put (default: {1.0})
+        """
+        # several processes may share the cache (sharded learning): wait for the lock instead of failing
+        self._db = sqlite3.connect(path, timeout=60)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS skills (key BLOB PRIMARY KEY, skills TEXT NOT NULL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'tag'").fetchone()
+        # True if entries of another configuration were dropped
+        self.invalidated = row is not None and row[0] != tag
+        if row is None or row[0] != tag:
+            with self._db:
+                self._db.execute('DELETE FROM skills')
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('tag', ?)", (tag,))
+        self._commit_every = commit_every
+        self._commit_interval = commit_interval
+        self._pending = {}
+        self._since = monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        self.commit()
+        return self._db.execute('SELECT COUNT(*) FROM skills').fetchone()[0]
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, text: str):
+        """Cached skills of a description
+
+        Arguments:
+            text {str} -- description (as given to Filter.process)
+
+        Returns:
+            list -- list of (skill, weight) or None if not cached
+        """
+        key = self.key(text)
+        value = self._pending.get(key)
+        if value is None:
+            row = self._db.execute('SELECT skills FROM skills WHERE key = ?', (key,)).fetchone()
+            value = row[0] if row is not None else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [tuple(item) for item in json.loads(value)]
+
+    def put(self, text: str, skills: list):
+        """Store the skills of a description
+
+        Arguments:
+            text {str} -- description (as given to Filter.process)
+            skills {list} -- list of (skill, weight)
+        """
+        if not self._pending:
+            self._since = monotonic()
+        self._pending[self.key(text)] = json.dumps(skills)
+        if len(self._pending) >= self._commit_every or monotonic() - self._since >= self._commit_interval:
+            self.commit()
+
+    def commit(self):
+        """Write the buffered entries in one transaction
+        """
+        if self._pending:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO skills VALUES (?, ?)', self._pending.items())
+            self._pending = {}
+
+    def close(self):
+        self.commit()
+        self._db.close()
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+def model_tag(model_path: str) -> str:
+    """Identify a model file by its path, size and modification time
+
+    Arguments:
+        model_path {str} -- path to the model file
+    """
+    stat = os.stat(model_path)
+    return '{}:{}:{}'.format(os.path.abspath(model_path), stat.st_size, int(stat.st_mtime))
@@ -0,0 +1,197 @@
+from graph import Graph
+import argparse
+import pickle
+import json
+import sys
+import os
+
+
+class CheckpointLog():
+    """Append-only log of graph changes: new nodes (or type changes), edge updates following the max-weight rule and
+    commit records holding the input byte offset up to which every posting has been applied.
+    Checkpointing costs only the changes since the last commit instead of rewriting the whole graph.
+
+    Record format (one JSON list per line):
+        ["n", node, type]               -- add_node
+        ["e", node1, node2, weight]     -- add_edge (new edge or higher weight)
+        ["c", offset]                   -- commit: all postings before the byte offset are in the log
+    """
+
+    def __init__(self, path: str, resume_at=0):
+        """
+        Arguments:
+            path {str} -- path to the log file
+
+        Keyword Arguments:
+            resume_at {int} -- size of the log to keep (end of the last commit), 0 starts a new log (default: {0})
+        """
+        self._path = path
+        self._file = open(path, 'ab' if resume_at else 'wb')
+        # drop records written after the last commit
+        self._file.truncate(resume_at)
+
+    def node(self, node: str, c_type: str):
+        self._write(['n', node, c_type])
+
+    def edge(self, node1: str, node2: str, weight):
+        self._write(['e', node1, node2, weight])
+
+    def commit(self, offset: int):
+        """Mark every record written so far as durable, along with the input position
+
+        Arguments:
+            offset {int} -- byte offset of the next posting to process
+        """
+        self._write(['c', offset])
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def _write(self, record: list):
+        self._file.write((json.dumps(record) + '\n').encode('utf-8'))
+
+    @staticmethod
+    def replay(path: str, graph=None):
+        """Rebuild a graph from a log, up to its last commit
+
+        Arguments:
+            path {str} -- path to the log file
+
+        Keyword Arguments:
+            graph {Graph} -- graph to apply the changes to (default: {new Graph})
+
+        Returns:
+            tuple -- (graph, input offset of the last commit, log size at the last commit)
+        """
+        graph = graph if graph is not None else Graph()
+        offset = 0
+        size = 0
+        pending = []
+        pos = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                pos += len(line)
+                if not line.endswith(b'\n'):
+                    # torn write at the end of the log (a complete record without its newline too: appending after it
+                    # on resume would merge two records)
+                    break
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    break
+                if record[0] == 'c':
+                    _apply(graph, pending)
+                    pending = []
+                    offset = record[1]
+                    size = pos
+                else:
+                    pending.append(record)
+
+        return graph, offset, size
+
+    @staticmethod
+    def changes(path: str, start=0):
+        """Edges updated after a position of the log, up to its last commit
+
+        Arguments:
+            path {str} -- path to the log file
+
+        Keyword Arguments:
+            start {int} -- position in the log (a log size returned by replay or changes) (default: {0})
+
+        Returns:
+            tuple -- (list of (node1, node2) of the committed edge records, log size at the last commit)
+        """
+        edges = []
+        pending = []
+        size = pos = start
+        with open(path, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                pos += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    break
+                if record[0] == 'c':
+                    edges.extend(pending)
+                    pending = []
+                    size = pos
+                elif record[0] == 'e':
+                    pending.append((record[1], record[2]))
+
+        return edges, size
+
+class LoggedGraph():
+    """Graph wrapper which appends every change of the graph to a checkpoint log
+    """
+
+    def __init__(self, graph: Graph, log: CheckpointLog):
+        self._graph = graph
+        self._log = log
+
+    def add_node(self, node: str, c_type: str) -> bool:
+        changed = self._graph.add_node(node, c_type)
+        if changed:
+            self._log.node(node, c_type)
+        return changed
+
+    def add_edge(self, node1: str, node2: str, weight=1) -> bool:
+        changed = self._graph.add_edge(node1, node2, weight=weight)
+        if changed:
+            self._log.edge(node1, node2, weight)
+        return changed
+
+    @property
+    def graph(self):
+        return self._graph
+
+def _apply(graph: Graph, records: list):
+    for record in records:
+        if record[0] == 'n':
+            graph.add_node(record[1], record[2])
+        else:
+            graph.add_edge(record[1], record[2], weight=record[3])
+
+def compact(log_path: str, graph_path: str, csr=False) -> int:
+    """Turn a checkpoint log into a full graph file
+
+    Arguments:
+        log_path {str} -- path to the log file
+        graph_path {str} -- path to the graph (pickle, or CSR graph directory if csr)
+
+    Keyword Arguments:
+        csr {bool} -- save as a CSRGraph directory (default: {False})
+
+    Returns:
+        int -- input offset of the last commit
+    """
+    graph, offset, _ = CheckpointLog.replay(log_path)
+    if csr:
+        from csr_graph import CSRGraph
+        CSRGraph.from_graph(graph).save(graph_path)
+    else:
+        with open(graph_path, 'wb') as f:
+            pickle.dump(graph, f)
+    return offset
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--logpath', type=str, help='Enter path of the checkpoint log')
+    parser.add_argument('--graphpath', type=str, help='Enter path of the graph to write')
+    parser.add_argument('--csr', action='store_true', help='Write a CSR graph directory instead of a pickle')
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE:
+    # python checkpoint.py --logpath /media/druv022/Data2/Challenge/data/graph_temp.pkl.log --graphpath /media/druv022/Data2/Challenge/data/graph_temp.pkl
+    args = parse_arguments(sys.argv[1:])
+    offset = compact(args.logpath, args.graphpath, csr=args.csr)
+    print('Graph up to input offset {} saved at: {}'.format(offset, args.graphpath))
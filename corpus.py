@@ -0,0 +1,224 @@
+from preprocess import TextPreprocessor
+from read import read_offsets, loads
+import numpy as np
+import argparse
+import json
+import sys
+import os
+
+# bump when the stored fields change (the store is rebuilt)
+FORMAT_VERSION = 1
+
+# columns of the index: posting id, cleaned text [start, end), title [start, end) followed by the description up to
+# desc_end, byte offset in the source file after the posting
+ID, CLEAN_START, CLEAN_END, TITLE_START, TITLE_END, DESC_END, SOURCE_END = range(7)
+N_COLUMNS = 7
+
+
+class CorpusStore():
+    """Persistent store of the postings of a JSON file, keyed by posting id, so the JSON decoding and the text cleaning
+    are paid once instead of on every run:
+        clean.txt   -- cleaned description (TextPreprocessor) of every posting, one per line: a fastText training file
+        postings.bin -- title and description used for skill identification (as parse_posting) of every posting
+        index.bin   -- int64 rows of offsets into both files (see the column constants), memory-mapped
+        meta.json   -- number of committed postings, sizes of the files and position in the source file
+    The store is updated incrementally: only the postings appended to the source file since the last update are read
+    and cleaned. Postings whose id is already stored are skipped.
+    """
+
+    def __init__(self, path: str):
+        """Open (or create) a store. Anything written after the last committed update is discarded.
+
+        Arguments:
+            path {str} -- path to the store directory
+        """
+        self._path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self._meta = {'version': FORMAT_VERSION, 'source': None, 'source_offset': 0, 'count': 0, 'clean_size': 0,
+                      'postings_size': 0}
+        if os.path.exists(self._file('meta.json')):
+            with open(self._file('meta.json')) as f:
+                meta = json.load(f)
+            if meta.get('version') == FORMAT_VERSION:
+                self._meta = meta
+
+        for name, size in [('clean.txt', self._meta['clean_size']), ('postings.bin', self._meta['postings_size']),
+                           ('index.bin', self._meta['count'] * N_COLUMNS * 8)]:
+            with open(self._file(name), 'ab') as f:
+                f.truncate(size)
+        self._index = None
+        self._rows = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self._path, name)
+
+    def __len__(self):
+        return self._meta['count']
+
+    @property
+    def text_path(self) -> str:
+        """Path of the cleaned descriptions, one posting per line (fastText training input)
+        """
+        return self._file('clean.txt')
+
+    @property
+    def index(self):
+        """Memory-mapped index (one row per posting)
+        """
+        if self._index is None:
+            self._index = np.memmap(self._file('index.bin'), dtype=np.int64, mode='r', shape=(len(self), N_COLUMNS)) \
+                if len(self) else np.zeros((0, N_COLUMNS), dtype=np.int64)
+        return self._index
+
+    @property
+    def ids(self):
+        return self.index[:, ID]
+
+    def update(self, json_path: str, n_process=1, batch_size=10000) -> int:
+        """Add the postings appended to the JSON file since the last update (the whole file for a new store, or if
+        the store was built from another file or from a file that has since been truncated)
+
+        Arguments:
+            json_path {str} -- path to JSON file
+
+        Keyword Arguments:
+            n_process {int} -- number of processes cleaning the descriptions (default: {1})
+            batch_size {int} -- number of postings cleaned and committed at once (default: {10000})
+
+        Returns:
+            int -- number of postings added
+        """
+        source = os.path.abspath(json_path)
+        offset = self._meta['source_offset']
+        if self._meta['source'] != source or offset > _source_size(json_path):
+            offset = 0
+        self._meta['source'] = source
+
+        seen = set(self.ids.tolist())
+        cleaner = TextPreprocessor()
+        added = 0
+        batch = []
+        for line, end in read_offsets(json_path, offset):
+            j_data = loads(line)
+            if j_data['id'] not in seen:
+                seen.add(j_data['id'])
+                batch.append((j_data, end))
+            offset = end
+            if len(batch) == batch_size:
+                added += self._append(batch, cleaner, n_process, offset)
+                batch = []
+        added += self._append(batch, cleaner, n_process, offset)
+        return added
+
+    def _append(self, records: list, cleaner: TextPreprocessor, n_process: int, source_offset: int) -> int:
+        """Write a batch of (record, source offset after the record) and commit it along with the position in the
+        source file (data first, then the index, then the metadata)
+        """
+        from methods import parse_posting
+
+        clean_pos = self._meta['clean_size']
+        postings_pos = self._meta['postings_size']
+        rows = np.zeros((len(records), N_COLUMNS), dtype=np.int64)
+        cleaned = cleaner.pre_process_many((j_data['description'] for j_data, _ in records), n_process=n_process)
+        with open(self._file('clean.txt'), 'ab') as clean_file, open(self._file('postings.bin'), 'ab') as postings_file:
+            for row, (j_data, end), text in zip(rows, records, cleaned):
+                title, desc = (part.encode('utf-8') for part in parse_posting(j_data))
+                text = (text or '').encode('utf-8')
+                clean_file.write(text + b'\n')
+                postings_file.write(title + desc)
+                row[:] = [j_data['id'], clean_pos, clean_pos + len(text), postings_pos, postings_pos + len(title),
+                          postings_pos + len(title) + len(desc), end]
+                clean_pos += len(text) + 1
+                postings_pos += len(title) + len(desc)
+
+        with open(self._file('index.bin'), 'ab') as f:
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._meta.update(count=len(self) + len(records), clean_size=clean_pos, postings_size=postings_pos,
+                          source_offset=source_offset)
+        with open(self._file('meta.json.tmp'), 'w') as f:
+            json.dump(self._meta, f)
+        os.replace(self._file('meta.json.tmp'), self._file('meta.json'))
+        self._index = None
+        self._rows = None
+        return len(records)
+
+    def row(self, posting_id: int) -> int:
+        """Row of a posting in the index
+
+        Arguments:
+            posting_id {int} -- id of the posting
+
+        Returns:
+            int -- row, KeyError if the posting is not stored
+        """
+        if self._rows is None:
+            self._rows = {posting_id: row for row, posting_id in enumerate(self.ids.tolist())}
+        return self._rows[posting_id]
+
+    def get(self, posting_id: int):
+        """Stored fields of a posting
+
+        Arguments:
+            posting_id {int} -- id of the posting
+
+        Returns:
+            tuple -- (title, description used for skill identification, cleaned description)
+        """
+        row = self.index[self.row(posting_id)]
+        with open(self._file('postings.bin'), 'rb') as f:
+            f.seek(row[TITLE_START])
+            data = f.read(row[DESC_END] - row[TITLE_START])
+        with open(self._file('clean.txt'), 'rb') as f:
+            f.seek(row[CLEAN_START])
+            text = f.read(row[CLEAN_END] - row[CLEAN_START])
+        split = row[TITLE_END] - row[TITLE_START]
+        return data[:split].decode('utf-8'), data[split:].decode('utf-8'), text.decode('utf-8')
+
+    def postings(self, start=0):
+        """Generator function to read (title, description) of the postings in insertion order from a row on, along with
+        the row after each posting (where reading can be resumed)
+
+        Keyword Arguments:
+            start {int} -- first row (default: {0})
+        """
+        index = self.index
+        with open(self._file('postings.bin'), 'rb') as f:
+            if start < len(self):
+                f.seek(index[start, TITLE_START])
+            for row in range(start, len(self)):
+                title_start, title_end, desc_end = index[row, TITLE_START], index[row, TITLE_END], index[row, DESC_END]
+                data = f.read(desc_end - title_start)
+                split = title_end - title_start
+                yield data[:split].decode('utf-8'), data[split:].decode('utf-8'), row + 1
+
+    def clean_texts(self):
+        """Generator function to read the cleaned descriptions in insertion order
+        """
+        with open(self.text_path, 'rb') as f:
+            for _, line in zip(range(len(self)), f):
+                yield line[:-1].decode('utf-8')
+
+def _source_size(json_path: str) -> int:
+    # the offsets of a compressed file refer to its uncompressed content which cannot be sized without reading it
+    return os.path.getsize(json_path) if not json_path.endswith(('.gz', '.bz2', '.zst')) else float('inf')
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--filepath', type=str, help='Enter full path to JSON file')
+    parser.add_argument('--storepath', type=str, help='Enter path of the corpus store directory')
+    parser.add_argument('--n_process', type=int, help='Number of processes cleaning the descriptions', default=1)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE (creates the store or adds the postings appended since the last run):
+    # python corpus.py --filepath /media/druv022/Data2/Challenge/data/job_descriptions.json/all_en_descriptions.json --storepath /media/druv022/Data2/Challenge/data/corpus
+    args = parse_arguments(sys.argv[1:])
+    store = CorpusStore(args.storepath)
+    added = store.update(args.filepath, n_process=args.n_process)
+    print('{} postings added, {} stored at: {}'.format(added, len(store), args.storepath))
@@ -0,0 +1,282 @@
+import numpy as np
+import argparse
+import pickle
+import json
+import sys
+import os
+
+
+class CSRGraph():
+    """Compact, read-only alternative to Graph for answering queries.
+    Nodes are interned as integers (with a type column) and the adjacency is stored in CSR arrays whose neighbors are
+    kept sorted by decreasing weight, so nearest_neighbor is a slice instead of a sort.
+    Saved as a directory of .npy files which is memory-mapped on load (opens in milliseconds whatever the graph size).
+    """
+
+    def __init__(self, names, name_offsets, name_order, types, type_names, indptr, indices, weights):
+        """
+        Arguments:
+            names {np.ndarray} -- utf-8 encoded node names concatenated (uint8)
+            name_offsets {np.ndarray} -- start of every node name in names (n + 1)
+            name_order {np.ndarray} -- node ids sorted by name (for lookups)
+            types {np.ndarray} -- type id of every node
+            type_names {list} -- name of every type id
+            indptr {np.ndarray} -- start of the neighbors of every node in indices/weights (n + 1)
+            indices {np.ndarray} -- neighbor ids, sorted by decreasing weight per node
+            weights {np.ndarray} -- edge weights
+        """
+        self._names = names
+        self._name_offsets = name_offsets
+        self._name_order = name_order
+        self._types = types
+        self._type_names = type_names
+        self._indptr = indptr
+        self._indices = indices
+        self._weights = weights
+        self._index = None
+
+    def __len__(self):
+        return len(self._types)
+
+    @classmethod
+    def from_graph(cls, graph: 'Graph'):
+        """Convert a Graph (networkx) into a CSRGraph. Neighbors with the same weight keep their order (as in Graph.nearest_neighbor)
+
+        Arguments:
+            graph {Graph} -- graph to convert
+
+        Returns:
+            CSRGraph -- converted graph
+        """
+        nodes = list(graph.nodes)
+        node_id = {node: i for i, node in enumerate(nodes)}
+        type_names = list(dict.fromkeys(c_type for _, c_type in graph.nodes(data='type')))
+        types = np.array([type_names.index(c_type) for _, c_type in graph.nodes(data='type')], dtype=np.uint8)
+
+        indptr = [0]
+        indices = []
+        weights = []
+        for node in nodes:
+            neighbors = sorted(graph.graph[node].items(), key=lambda x: x[1]['weight'], reverse=True)
+            indices.extend(node_id[neighbor] for neighbor, _ in neighbors)
+            weights.extend(data['weight'] for _, data in neighbors)
+            indptr.append(len(indices))
+
+        encoded = [node.encode('utf-8') for node in nodes]
+        name_offsets = np.cumsum([0] + [len(name) for name in encoded]).astype(np.int64)
+        names = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        name_order = np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64)
+
+        return cls(names, name_offsets, name_order, types, type_names, np.array(indptr, dtype=np.int64),
+                   np.array(indices, dtype=np.int64), np.array(weights, dtype=np.float64))
+
+    def to_graph(self) -> 'Graph':
+        """Convert back into a Graph (networkx). Neighbors with the same weight keep their relative order.
+
+        Returns:
+            Graph -- converted graph
+        """
+        # networkx is not needed to query a CSR graph
+        from graph import Graph, _edge_order
+
+        graph = Graph()
+        names = [self.name(i) for i in range(len(self))]
+        for i, name in enumerate(names):
+            graph.add_node(name, self._type_names[self._types[i]])
+
+        # only the order of neighbors with the same weight matters (runs of equal weights within a row)
+        chains = []
+        weight = {}
+        for i in range(len(self)):
+            start, end = self._indptr[i], self._indptr[i + 1]
+            chain = []
+            previous = None
+            for j, w in zip(self._indices[start:end], self._weights[start:end]):
+                if w != previous:
+                    chains.append(chain)
+                    chain = []
+                chain.append((i, int(j)))
+                weight[frozenset((i, int(j)))] = float(w)
+                previous = w
+            chains.append(chain)
+
+        for i, j in _edge_order(chains):
+            graph.add_edge(names[i], names[j], weight=weight[frozenset((i, j))])
+        return graph
+
+    @classmethod
+    def from_pickle(cls, path: str):
+        with open(path, 'rb') as f:
+            return cls.from_graph(pickle.load(f))
+
+    def to_pickle(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self.to_graph(), f)
+
+    def save(self, path: str):
+        """Save the graph as a directory of .npy files, written aside and swapped in atomically (see replace_dir): a
+        service reloading the graph sees the old graph or the new one, never a missing or partial one
+
+        Arguments:
+            path {str} -- path to the directory
+        """
+        from atomic import temp_path, replace_dir
+
+        temp = temp_path(path)
+        self.write(temp)
+        replace_dir(temp, path)
+
+    def write(self, path: str):
+        """Write the .npy files and meta.json of the graph into a (new or existing) directory, in place
+        """
+        os.makedirs(path, exist_ok=True)
+        for key in ['names', 'name_offsets', 'name_order', 'types', 'indptr', 'indices', 'weights']:
+            np.save(os.path.join(path, key + '.npy'), getattr(self, '_' + key))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'type_names': self._type_names}, f)
+
+    @classmethod
+    def load(cls, path: str):
+        """Memory-map a graph saved by save
+
+        Arguments:
+            path {str} -- path to the directory
+
+        Returns:
+            CSRGraph -- graph
+        """
+        # every file is read from the version the path points to when loading starts
+        path = os.path.realpath(path)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {key: np.load(os.path.join(path, key + '.npy'), mmap_mode='r')
+                  for key in ['names', 'name_offsets', 'name_order', 'types', 'indptr', 'indices', 'weights']}
+        return cls(type_names=meta['type_names'], **arrays)
+
+    def name(self, idx: int) -> str:
+        return bytes(self._names[self._name_offsets[idx]:self._name_offsets[idx + 1]]).decode('utf-8')
+
+    def node_id(self, node: str) -> int:
+        """Integer id of a node (binary search over the sorted names)
+
+        Arguments:
+            node {str} -- name of the node
+
+        Returns:
+            int -- id of the node, KeyError if the node does not exist
+        """
+        key = node.encode('utf-8')
+        low, high = 0, len(self._name_order)
+        while low < high:
+            mid = (low + high) // 2
+            idx = self._name_order[mid]
+            if bytes(self._names[self._name_offsets[idx]:self._name_offsets[idx + 1]]) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self._name_order) and self.name(self._name_order[low]) == node:
+            return int(self._name_order[low])
+        raise KeyError(node)
+
+    def adjacency(self):
+        """Weighted adjacency matrix sharing the CSR arrays (neighbors stay sorted by decreasing weight in every row)
+
+        Returns:
+            scipy.sparse.csr_matrix -- adjacency matrix
+        """
+        from scipy import sparse
+        return sparse.csr_matrix((self._weights, self._indices, self._indptr), shape=(len(self), len(self)), copy=False)
+
+    def with_adjacency(self, indptr, indices, weights) -> 'CSRGraph':
+        """Graph over the same nodes with another adjacency (for example a projection: directed top-N rows)
+
+        Arguments:
+            indptr {np.ndarray} -- start of the neighbors of every node in indices/weights (n + 1)
+            indices {np.ndarray} -- neighbor ids, sorted by decreasing weight per node
+            weights {np.ndarray} -- edge weights
+
+        Returns:
+            CSRGraph -- graph
+        """
+        return CSRGraph(self._names, self._name_offsets, self._name_order, self._types, self._type_names, indptr, indices,
+                        weights)
+
+    def node_type(self, node: str) -> str:
+        return self._type_names[self._types[self.node_id(node)]]
+
+    def nearest_neighbor(self, node: str, number=1) -> list:
+        """Find the neighboring nodes of a given node, sorted by edge weight, and return top k (number <= Max neighbors)
+
+        Arguments:
+            node {str} -- name of the node
+
+        Keyword Arguments:
+            number {int} -- number of nodes to return: 0 < number < Max neighbors (default: {1})
+
+        Returns:
+            list -- list of neighbors in string format
+        """
+        idx = self.node_id(node)
+        start, end = self._indptr[idx], self._indptr[idx + 1]
+        if start < end:
+            return [self.name(i) for i in self._indices[start:min(end, start + number)]]
+
+    def next_neighbor(self, node: str, number=1) -> list:
+        """Find the next neighbors (nodes after one hop) excluding itself( no self-loop)
+        Sort the next neighbors accoring to the cummulative edge weights and return top k (same result as Graph.next_neighbor:
+        a node reached through several neighbors appears once, scored by the sum of the cumulative weights of its paths)
+
+        Arguments:
+            node {str} -- name of the node
+
+        Keyword Arguments:
+            number {int} -- number of nodes to return: 0 < number < Max next-neighbors (default: {1})
+
+        Returns:
+            list -- list of neighbors in string format
+        """
+        next_neigh = self.neighbor_index().next_neighbors([node], number)[0]
+        if next_neigh is None:
+            raise KeyError(node)
+        return next_neigh or None
+
+    def neighbor_index(self) -> 'NeighborIndex':
+        """Batch NeighborIndex sharing the CSR arrays, built on first use
+        """
+        if self._index is None:
+            from neighbors import NeighborIndex
+            self._index = NeighborIndex.from_graph(self)
+        return self._index
+
+def load_graph(path: str):
+    """Load a graph saved either as a pickled Graph or as a CSRGraph directory
+
+    Arguments:
+        path {str} -- path to the graph
+
+    Returns:
+        Graph or CSRGraph -- graph
+    """
+    if os.path.isdir(path):
+        return CSRGraph.load(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--graphpath', type=str, help='Enter path of the pickled graph')
+    parser.add_argument('--csrpath', type=str, help='Enter path of the CSR graph directory')
+    parser.add_argument('--export', action='store_true', help='Convert the CSR graph back into a pickled graph')
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE:
+    # python csr_graph.py --graphpath /media/druv022/Data2/Challenge/data/graph_temp.pkl --csrpath /media/druv022/Data2/Challenge/data/graph_temp.csr
+    args = parse_arguments(sys.argv[1:])
+    if args.export:
+        CSRGraph.load(args.csrpath).to_pickle(args.graphpath)
+    else:
+        CSRGraph.from_pickle(args.graphpath).save(args.csrpath)
@@ -0,0 +1,163 @@
+from preprocess import TextPreprocessor
+import numpy as np
+import tempfile
+import pickle
+import zlib
+
+
+class Deduplicator():
+    """Near-duplicate detection of postings with MinHash signatures and locality sensitive hashing (LSH).
+    Job feeds repeat the same boilerplate with a different title or address: a posting whose cleaned description is
+    similar enough (estimated Jaccard similarity of word shingles >= threshold) to one already processed reuses its
+    skills instead of going through spacy and Filter.process again.
+    Signatures are rows of one uint32 matrix (grown by doubling) and the LSH buckets keep row numbers under the hash of
+    every band. Only the skills of postings a near-duplicate was matched to stay in memory, the others are spilled to
+    a temporary file (an offset per row) and read back if a near-duplicate of them comes later.
+    """
+
+    def __init__(self, threshold=0.9, num_perm=128, shingle_size=5, seed=1):
+        """
+        Keyword Arguments:
+            threshold {float} -- minimum estimated Jaccard similarity of two near-duplicates (default: {0.9})
+            num_perm {int} -- number of hash functions of the signatures (default: {128})
+            shingle_size {int} -- number of words per shingle (default: {5})
+            seed {int} -- random seed of the hash functions (default: {1})
+        """
+        self.threshold = threshold
+        self._shingle_size = shingle_size
+        self._cleaner = TextPreprocessor()
+        rng = np.random.RandomState(seed)
+        # multiply-shift hashing: h(x) = (a * x + b) >> 32 over uint64 (a odd)
+        self._a = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64) << np.uint64(32) | \
+            rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64) << np.uint64(32)
+        self._bands, self._rows = _bands(threshold, num_perm)
+        self._buckets = [{} for _ in range(self._bands)]
+        # row of every registered posting in the signature matrix and the spill offsets
+        self._row_of = {}
+        self._keys = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._offsets = np.full(1024, -1, dtype=np.int64)
+        # rows a near-duplicate was matched to, and the skills of those kept in memory
+        self._matched = set()
+        self._results = {}
+        self._spill = None
+        self.checked = 0
+        self.duplicates = 0
+
+    def signature(self, text: str):
+        """MinHash signature of the word shingles of the cleaned text
+
+        Arguments:
+            text {str} -- description
+
+        Returns:
+            np.ndarray -- signature (uint32)
+        """
+        words = (self._cleaner.pre_process(text) or '').split()
+        k = self._shingle_size
+        shingles = {zlib.crc32(' '.join(words[i:i + k]).encode('utf-8')) for i in range(max(len(words) - k + 1, 1))}
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        with np.errstate(over='ignore'):
+            hashes = (self._a[:, None] * x[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashes.min(axis=1).astype(np.uint32)
+
+    def find(self, signature):
+        """Most similar registered posting sharing an LSH bucket with the signature
+
+        Arguments:
+            signature {np.ndarray} -- MinHash signature
+
+        Returns:
+            tuple -- (key of the posting, estimated similarity) or None if no posting reaches the threshold
+        """
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            candidates.update(buckets.get(self._band_hash(signature, band), ()))
+        if not candidates:
+            return None
+        rows = np.array(sorted(candidates), dtype=np.int64)
+        # bands only share a hash: every candidate is compared on the whole signature
+        similarities = np.mean(self._signatures[rows] == signature, axis=1)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._keys[rows[best]], float(similarities[best])
+
+    def add(self, key, signature):
+        """Register a processed posting
+
+        Arguments:
+            key {hashable} -- key of the posting
+            signature {np.ndarray} -- MinHash signature
+        """
+        row = len(self._row_of)
+        if row == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+            self._offsets = np.concatenate([self._offsets, np.full(len(self._offsets), -1, dtype=np.int64)])
+        self._row_of[key] = row
+        self._keys.append(key)
+        self._signatures[row] = signature
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(self._band_hash(signature, band), []).append(row)
+
+    def _band_hash(self, signature, band: int) -> int:
+        return hash(signature[band * self._rows:(band + 1) * self._rows].tobytes())
+
+    def check(self, text: str, key):
+        """Check a posting against the ones registered before. A posting which is not a near-duplicate is registered.
+
+        Arguments:
+            text {str} -- description
+            key {hashable} -- key of the posting
+
+        Returns:
+            hashable -- key of the registered posting it duplicates, None if it is not a near-duplicate
+        """
+        signature = self.signature(text)
+        match = self.find(signature)
+        self.checked += 1
+        if match is None:
+            self.add(key, signature)
+            return None
+        self.duplicates += 1
+        self._matched.add(self._row_of[match[0]])
+        return match[0]
+
+    def store(self, key, result):
+        """Keep the skills of a registered posting for its near-duplicates: in memory if one was already matched to
+        it, spilled otherwise
+
+        Arguments:
+            key {hashable} -- key of the posting
+            result {list} -- skills of the posting
+        """
+        row = self._row_of[key]
+        if row in self._matched:
+            self._results[row] = result
+            return
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile()
+        self._spill.seek(0, 2)
+        self._offsets[row] = self._spill.tell()
+        pickle.dump(result, self._spill)
+
+    def result(self, key):
+        """Skills stored for a registered posting (read back from the spill file the first time it is matched)
+        """
+        row = self._row_of[key]
+        if row not in self._results:
+            self._spill.seek(int(self._offsets[row]))
+            self._results[row] = pickle.load(self._spill)
+        return self._results[row]
+
+    def report(self) -> str:
+        return '{} postings checked, {} near-duplicates ({:.1%}) reused the skills of an earlier posting ' \
+               '(parsing and Filter.process skipped)'.format(self.checked, self.duplicates,
+                                                             self.duplicates / self.checked if self.checked else 0.0)
+
+def _bands(threshold: float, num_perm: int):
+    """Number of bands and rows per band of the LSH whose S-curve (1/bands)^(1/rows) is closest to the threshold
+    """
+    return min(((num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0),
+               key=lambda item: abs((1 / item[0]) ** (1 / item[1]) - threshold))
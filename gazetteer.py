@@ -0,0 +1,277 @@
+import argparse
+import sys
+import os
+import re
+
+# default location of the entity (<LABEL>.txt) and POS (Word_POS.txt) dumps
+DUMPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp')
+
+# words, keeping dotted/joined names (ASP.NET, Node.js, e-mail) and trailing + or # (C++, C#) together
+TOKEN = re.compile(r"\w+(?:[.+#&'-]\w+)*[+#]*")
+SENTENCE = re.compile(r'(?<=[.!?;])\s+')
+# POS tags of function words, never taken as nouns
+CLOSED_CLASS = ('DET', 'ADP', 'PRON', 'AUX', 'CCONJ', 'SCONJ', 'PART')
+
+
+class Token():
+    __slots__ = ('text', 'pos_', 'idx')
+
+    def __init__(self, text: str, pos: str, idx: int):
+        self.text = text
+        self.pos_ = pos
+        self.idx = idx
+
+class Span():
+    __slots__ = ('text', 'label_', 'start_char', 'end_char')
+
+    def __init__(self, text: str, label: str, start_char: int, end_char: int):
+        self.text = text
+        self.label_ = label
+        self.start_char = start_char
+        self.end_char = end_char
+
+class GazetteerDoc():
+    """Minimal stand-in for a spacy Doc (tokens with text/pos_, ents with text/label_) produced by the Gazetteer,
+    so Filter runs on it unchanged
+    """
+
+    def __init__(self, text: str, tokens: list, ents: list):
+        self.text = text
+        self.ents = ents
+        self._tokens = tokens
+
+    @classmethod
+    def from_doc(cls, doc) -> 'GazetteerDoc':
+        """Copy of the attributes of a spacy Doc read by Filter (small and cheap to send to another process)
+        """
+        return cls(doc.text, [Token(token.text, token.pos_, token.idx) for token in doc],
+                   [Span(ent.text, ent.label_, ent.start_char, ent.end_char) for ent in doc.ents])
+
+    def __iter__(self):
+        return iter(self._tokens)
+
+    def __len__(self):
+        return len(self._tokens)
+
+class Gazetteer():
+    """Dictionary based replacement for the spacy tagger and NER, compiled from the entity dumps (temp/<LABEL>.txt: the
+    label on the first line then one entity per line) and the POS dump (temp/Word_POS.txt: word: ['NOUN', ...]).
+    Entities are stored in a token trie and matched leftmost-longest in one pass over the tokens (linear in the length
+    of the text times the length of the longest entity). A word is a NOUN/PROPN if the dump saw it tagged as such in any
+    context; unknown capitalized words are taken as PROPN.
+    """
+
+    def __init__(self, entities: dict, word_pos: dict):
+        """
+        Arguments:
+            entities {dict} -- entity text -> label
+            word_pos {dict} -- word -> POS tag
+        """
+        self._word_pos = word_pos
+        self._trie = {}
+        self._longest = 0
+        for text, label in entities.items():
+            tokens = TOKEN.findall(text)
+            if not tokens:
+                continue
+            node = self._trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(None, label)
+            self._longest = max(self._longest, len(tokens))
+
+    @classmethod
+    def from_dumps(cls, directory=DUMPS, labels=None):
+        """Compile the dumps of a directory
+
+        Keyword Arguments:
+            directory {str} -- directory of the <LABEL>.txt and Word_POS.txt dumps (default: {temp/})
+            labels {list} -- labels to load, an entity listed under several labels keeps the first one (default: {all dumps})
+
+        Returns:
+            Gazetteer -- gazetteer
+        """
+        if labels is None:
+            labels = sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.txt') and name != 'Word_POS.txt')
+
+        word_pos = {}
+        with open(os.path.join(directory, 'Word_POS.txt'), encoding='utf-8') as f:
+            for line in f:
+                word, _, tags = line.rstrip('\n').rpartition(': [')
+                tags = [tag.strip(" '") for tag in tags.rstrip(']').split(',')]
+                word_pos[word] = _noun_tag(tags)
+
+        gazetteer = cls({}, word_pos)
+        entities = {}
+        for label in labels:
+            path = os.path.join(directory, label + '.txt')
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as f:
+                f.readline()
+                for line in f:
+                    text = line.strip()
+                    # the dumps are noisy (common words tagged by the small spacy model): keep the entities with a
+                    # capital letter and at least one noun, as Filter would
+                    if any(c.isupper() for c in text) and \
+                            any(gazetteer.pos(word) in ('NOUN', 'PROPN') for word in TOKEN.findall(text)):
+                        entities.setdefault(text, label)
+
+        return cls(entities, word_pos)
+
+    def pos(self, word: str) -> str:
+        tag = self._word_pos.get(word) or self._word_pos.get(word.lower())
+        if tag is None:
+            return 'PROPN' if word[:1].isupper() else 'X'
+        return tag
+
+    def __call__(self, text: str) -> GazetteerDoc:
+        """Tag and match a text (as nlp(text))
+
+        Arguments:
+            text {str} -- text
+
+        Returns:
+            GazetteerDoc -- tokens and entities
+        """
+        matches = list(TOKEN.finditer(text))
+        tokens = [Token(match.group(), self.pos(match.group()), match.start()) for match in matches]
+        return GazetteerDoc(text, tokens, self._match(text, matches))
+
+    def pipe(self, texts, as_tuples=False):
+        """Tag and match a stream of texts (as nlp.pipe)
+
+        Arguments:
+            texts {iterable} -- texts (or (text, context) tuples if as_tuples)
+
+        Keyword Arguments:
+            as_tuples {bool} -- pass a context object along with each text (default: {False})
+
+        Returns:
+            generator -- GazetteerDoc (or (GazetteerDoc, context) tuples) in input order
+        """
+        for item in texts:
+            if as_tuples:
+                yield self(item[0]), item[1]
+            else:
+                yield self(item)
+
+    def _match(self, text: str, matches: list) -> list:
+        """Leftmost-longest entity matches over the tokens
+        """
+        ents = []
+        i = 0
+        while i < len(matches):
+            node = self._trie
+            found = None
+            for j in range(i, min(i + self._longest, len(matches))):
+                # entities do not span lines (titles and bullet points)
+                if j > i and '\n' in text[matches[j - 1].end():matches[j].start()]:
+                    break
+                node = node.get(matches[j].group())
+                if node is None:
+                    break
+                if None in node:
+                    found = (j, node[None])
+            if found is None:
+                i += 1
+                continue
+            j, label = found
+            start, end = matches[i].start(), matches[j].end()
+            ents.append(Span(text[start:end], label, start, end))
+            i = j + 1
+        return ents
+
+    def reduce(self, text: str) -> str:
+        """Keep only the sentences containing a known entity (pre-filter before spacy)
+
+        Arguments:
+            text {str} -- text
+
+        Returns:
+            str -- sentences with at least one entity match
+        """
+        return ' '.join(sentence for sentence in SENTENCE.split(text) if self._match(sentence, list(TOKEN.finditer(sentence))))
+
+def _noun_tag(tags: list) -> str:
+    """Tag kept for a word seen with several tags: function words keep their closed class tag (The: PROPN, DET is a
+    determiner), then NOUN/PROPN win (the candidate filters look for nouns)
+    """
+    for tag in CLOSED_CLASS + ('NOUN', 'PROPN'):
+        if tag in tags:
+            return tag
+    return tags[0]
+
+def compare(texts: list, gazetteer: Gazetteer, labels: list) -> dict:
+    """Quality and throughput of the gazetteer against spacy on the candidates of Filter (after the POS and NER filters)
+
+    Arguments:
+        texts {list} -- descriptions
+        gazetteer {Gazetteer} -- gazetteer
+        labels {list} -- NER labels kept by the filter
+
+    Returns:
+        dict -- docs/sec of both paths, noun agreement on the tokens and precision/recall of the candidates
+    """
+    from time import perf_counter
+    from methods import Filter, parse
+
+    filter = Filter(None)
+    start = perf_counter()
+    docs = list(parse(texts))
+    spacy_time = perf_counter() - start
+    start = perf_counter()
+    gazetteer_docs = list(gazetteer.pipe(texts))
+    gazetteer_time = perf_counter() - start
+    start = perf_counter()
+    reduced = list(parse(gazetteer.reduce(text) for text in texts))
+    reduced_time = perf_counter() - start
+
+    nouns = ('NOUN', 'PROPN')
+    agree = total = 0
+    counts = {'gazetteer': [0, 0, 0], 'prefilter': [0, 0, 0]}
+    for doc, gazetteer_doc, reduced_doc in zip(docs, gazetteer_docs, reduced):
+        tagged = {token.idx: token.pos_ in nouns for token in doc}
+        for token in gazetteer_doc:
+            if token.idx in tagged:
+                total += 1
+                agree += tagged[token.idx] == (token.pos_ in nouns)
+        reference = set(filter.candidates(doc))
+        for name, other in [('gazetteer', gazetteer_doc), ('prefilter', reduced_doc)]:
+            found = set(filter.candidates(other))
+            counts[name][0] += len(reference & found)
+            counts[name][1] += len(found)
+            counts[name][2] += len(reference)
+
+    report = {'docs': len(texts), 'spacy_docs_per_sec': len(texts) / spacy_time,
+              'gazetteer_docs_per_sec': len(texts) / gazetteer_time,
+              'prefilter_docs_per_sec': len(texts) / (reduced_time + gazetteer_time),
+              'noun_agreement': agree / total if total else None}
+    for name, (common, found, reference) in counts.items():
+        report[name + '_precision'] = common / found if found else None
+        report[name + '_recall'] = common / reference if reference else None
+    return report
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--filepath', type=str, help='Enter full path to JSON file')
+    parser.add_argument('--dumps', type=str, help='Directory of the entity and POS dumps', default=DUMPS)
+    parser.add_argument('--n_docs', type=int, help='Number of postings compared', default=1000)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE (compares the gazetteer with spacy on the first postings):
+    # python gazetteer.py --filepath /media/druv022/Data2/Challenge/data/job_descriptions.json/all_en_descriptions.json
+    from methods import Filter, parse_posting
+    from read import read
+    from itertools import islice
+
+    args = parse_arguments(sys.argv[1:])
+    labels = Filter(None)._NER_labels
+    gazetteer = Gazetteer.from_dumps(args.dumps, labels=labels)
+    texts = [parse_posting(line)[1] for line in islice(read(args.filepath), args.n_docs)]
+    for key, value in compare(texts, gazetteer, labels).items():
+        print('{:<26} {}'.format(key, value))
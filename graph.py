@@ -1,5 +1,6 @@
 import networkx as nx
 import pickle
+from collections import deque
 
 class Graph():
     """Class used for building graph using networkx.
@@ -8,15 +9,29 @@ class Graph():
 
     def __init__(self):
         self._graph = nx.Graph()
+        self._index = None
 
-    def add_node(self, node: str, c_type: str):
+    def __getstate__(self):
+        # the neighbor index is rebuilt on demand, it is not pickled with the graph
+        state = self.__dict__.copy()
+        state.pop('_index', None)
+        return state
+
+    def add_node(self, node: str, c_type: str) -> bool:
         """Add a node to the graph of an attribute type (binary: for example (title, skill))
         
         Arguments:
             node {str} -- name of the node
             c_type {str} -- type of the node (atrribute)
+        
+        Returns:
+            bool -- True if the node is new or its type changed
         """
+        changed = node not in self._graph or self._graph.nodes[node].get('type') != c_type
         self._graph.add_node(node, type=c_type)
+        if changed:
+            self._index = None
+        return changed
 
     def add_nodes(self, nodes: list, c_types: str):
         """Add nodes to the graph of an(or different) attribute type (binary: for example (title, skill))
@@ -25,6 +40,7 @@ class Graph():
             nodes {list} -- list of nodes in string format
             c_types {str} -- Either a string to denote every node of same type OR list of string for each node
         """
+        self._index = None
         # decide to assign same type or different based of datatype
         if not isinstance(c_types, list):
             self._graph.add_nodes_from(nodes, type=c_types)
@@ -33,7 +49,7 @@ class Graph():
             for i,key in enumerate(nodes):
                 self._graph.nodes[key]['type'] = c_types[i]
 
-    def add_edge(self, node1: str, node2: str, weight=1):
+    def add_edge(self, node1: str, node2: str, weight=1) -> bool:
         """Add edges between nodes
         
         Arguments:
@@ -42,14 +58,38 @@ class Graph():
         
         Keyword Arguments:
             weight {int} -- weight of the edge (default: {1})
+        
+        Returns:
+            bool -- True if the edge is new or its weight increased
         """
         if not self._graph.has_edge(node1, node2):
             self._graph.add_edge(node1, node2, weight=weight)
+            self._index = None
+            return True
         else:
             # TODO: update the heuristic. Currently assign weights based on pre-defined heuristics
             old_weight = self._graph[node1][node2]['weight']
             if old_weight < weight:
                 self._graph[node1][node2]['weight'] = weight
+                self._index = None
+                return True
+        return False
+
+    def merge(self, other):
+        """Merge another graph into this one. Node types are overwritten by the other graph (as a later add_node would)
+        and edge weights are updated with the same rule as add_edge (higher weight wins).
+        Edges are replayed in an order consistent with the neighbor order of every node, so merging partial graphs
+        built over consecutive parts of the data gives the same graph as building it in one go.
+        
+        Arguments:
+            other {Graph} -- graph to merge into this one
+        """
+        for node, c_type in other.graph.nodes(data='type'):
+            self.add_node(node, c_type)
+
+        chains = ([(node, neighbor) for neighbor in other.graph[node]] for node in other.graph.nodes)
+        for node1, node2 in _edge_order(chains):
+            self.add_edge(node1, node2, weight=other.graph[node1][node2]['weight'])
 
     def nearest_neighbor(self, node: str, number=1) -> list:
         """Find the neighboring nodes of a given node. Sort the neighbors accoring to the edge weights and return top k (number <= Max neighbors)
@@ -75,7 +115,9 @@ class Graph():
 
     def next_neighbor(self, node: str, number=1) -> list:
         """Find the next neighbors (nodes after one hop) excluding itself( no self-loop)
-        Sort the next neighbors accoring to the cummulative edge weights and return top k (number <= Max next-neighbors)
+        Sort the next neighbors accoring to the cummulative edge weights and return top k (number <= Max next-neighbors).
+        A node reached through several neighbors appears once, scored by the sum of the cumulative weights of its paths
+        (answered by the neighbor index, as get_item and the query service)
         
         Arguments:
             node {str} -- name of the node
@@ -86,28 +128,19 @@ class Graph():
         Returns:
             list -- list of neighbors in string format
         """
-        neighbors = self.nearest_neighbor(node,number=len(self._graph.nodes))
-        if neighbors:
-            next_neigh = []
-            weights_2 = []
-            for v in neighbors:
-                weight_1 = self._graph[node][v]['weight']
-                nx_n = self.nearest_neighbor(v, number=len(self._graph.nodes))
-                # remove query node
-                if node in nx_n:
-                    nx_n.remove(node)
-                if nx_n:
-                    next_neigh.extend(nx_n)
-                    # add first hop edge weight
-                    weights_2.extend([self._graph[i][v]['weight']+weight_1 for i in nx_n])
-
-            if len(next_neigh) > 0:
-                sorted_next_neigh = [x for _,x in sorted(zip(weights_2, next_neigh), key=lambda pair: pair[0], reverse=True)]
-                # return top k 
-                if number < len(sorted_next_neigh):
-                    return sorted_next_neigh[0:number]
-                else:
-                    return sorted_next_neigh
+        next_neigh = self.neighbor_index().next_neighbors([node], number)[0]
+        if next_neigh is None:
+            raise KeyError(node)
+        return next_neigh or None
+
+    def neighbor_index(self) -> 'NeighborIndex':
+        """Batch NeighborIndex of the graph, built on first use and kept until the graph changes
+        """
+        # graphs pickled before the index existed have no _index attribute
+        if getattr(self, '_index', None) is None:
+            from neighbors import NeighborIndex
+            self._index = NeighborIndex.from_graph(self)
+        return self._index
     
     @property
     def graph(self):
@@ -118,6 +151,41 @@ class Graph():
         return self._graph.nodes
 
 
+def _edge_order(chains) -> list:
+    """Recover an edge insertion order which respects a set of ordered chains of edges
+    (for example the insertion ordered adjacency of every node)
+    
+    Arguments:
+        chains {iterable} -- lists of edges (node1, node2) that must be inserted in that order
+    
+    Returns:
+        list -- list of edges (node1, node2)
+    """
+    # in every chain edge i must come before edge i+1
+    indegree = {}
+    successors = {}
+    for chain in chains:
+        previous = None
+        for node1, node2 in chain:
+            edge = frozenset((node1, node2))
+            indegree.setdefault(edge, 0)
+            if previous is not None:
+                successors.setdefault(previous, []).append(edge)
+                indegree[edge] += 1
+            previous = edge
+
+    queue = deque([edge for edge, degree in indegree.items() if degree == 0])
+    order = []
+    while queue:
+        edge = queue.popleft()
+        order.append(tuple(edge) if len(edge) == 2 else (next(iter(edge)),)*2)
+        for item in successors.get(edge, []):
+            indegree[item] -= 1
+            if indegree[item] == 0:
+                queue.append(item)
+
+    return order
+
 if __name__ == "__main__":
     
     G = Graph()
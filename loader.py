@@ -0,0 +1,37 @@
+# Heavy models are loaded lazily: on first use and only once per process.
+
+_nlp = None
+
+def get_nlp():
+    """Load the spacy model on first use. Only the components read by Filter and the statistics helpers are loaded:
+    POS tags (tagger) and entities (ner), the dependency parser is never used. The tagger and ner of the spacy 2 models do
+    not read the parse, so the tags and entities are those of the full pipeline (tests/test_loader.py compares both,
+    batched without the parser and document by document with it, on the sample data of data/README.MD).
+    
+    Returns:
+        Language -- spacy model
+    """
+    global _nlp
+    if _nlp is None:
+        import spacy
+        _nlp = spacy.load("en_core_web_sm", disable=['parser'])
+    return _nlp
+
+_gazetteers = {}
+
+def get_gazetteer(directory=None, labels=None):
+    """Compile the gazetteer of the entity and POS dumps of a directory on first use (once per directory)
+    
+    Keyword Arguments:
+        directory {str} -- directory of the dumps (default: {temp/})
+        labels {list} -- NER labels to load, in priority order (default: {all dumps})
+    
+    Returns:
+        Gazetteer -- gazetteer
+    """
+    from gazetteer import Gazetteer, DUMPS
+    directory = directory or DUMPS
+    key = (directory, tuple(labels) if labels else None)
+    if key not in _gazetteers:
+        _gazetteers[key] = Gazetteer.from_dumps(directory, labels=labels)
+    return _gazetteers[key]
@@ -1,21 +1,36 @@
-from read import read
 from collections import Counter
-from graph import Graph
-from utils import Vocabulary
-from preprocess import TextPreprocessor
-from gensim.models.wrappers import FastText
-import json
-from tqdm import tqdm
-import spacy
+from csr_graph import load_graph
+from loader import get_nlp, get_gazetteer
+from metrics import Metrics
+from time import perf_counter
 import pickle
 import os
-import fasttext
-from datetime import datetime
 import argparse
 import sys
+from multiprocessing import Pool
 
+# Only what graph queries need is imported here. Training dependencies (spacy, gensim, fasttext, tqdm, networkx, ...)
+# are imported by the functions using them, so a query on a prebuilt graph starts fast.
 
-nlp = spacy.load("en_core_web_sm")
+def parse(texts, batch_size=256, n_process=1, as_tuples=False):
+    """Parse a stream of texts with spacy in batches (nlp.pipe) instead of one document at a time
+    
+    Arguments:
+        texts {iterable} -- texts to parse (or (text, context) tuples if as_tuples)
+    
+    Keyword Arguments:
+        batch_size {int} -- number of texts buffered per batch (default: {256})
+        n_process {int} -- number of processes used by spacy (default: {1})
+        as_tuples {bool} -- pass a context object along with each text (default: {False})
+    
+    Returns:
+        generator -- parsed spacy Doc (or (Doc, context) tuples) in input order
+    """
+    nlp = get_nlp()
+    if n_process > 1:
+        # multi-process parsing is only available from spacy 2.2.2 onwards
+        return nlp.pipe(texts, batch_size=batch_size, n_process=n_process, as_tuples=as_tuples)
+    return nlp.pipe(texts, batch_size=batch_size, as_tuples=as_tuples)
 
 class Filter():
     """This class identifies skills in a given text based on the following heuristics.
@@ -35,8 +50,14 @@ class Filter():
                         6) Sort the candidate list of step 2 based on score of step 5 and select top k.
                         7) Associate a weight to each node based on predefined set(visual inspection)
     """
-    def __init__(self, emb_model, topk=10):
+    def __init__(self, emb_model, topk=10, scorer=None, cache=None, metrics=None):
         self._model = emb_model
+        # optional VectorScorer: evaluate neighbors and similarities of a document in bulk
+        self._scorer = scorer
+        # optional NeighborCache: most similar words shared across documents
+        self._cache = cache
+        # stage timers, candidate counts and lookup failures (Metrics)
+        self._metrics = metrics if metrics is not None else Metrics()
         self._desc = None
         self._doc = None
         self._candidates = None
@@ -45,11 +66,16 @@ class Filter():
         self._scale = [0.8, 0.7,0.7, 0.7, 0.7, 0.6, 0.6, 0.5, 0.3]
         self._NER_labels = ['PRODUCT','PERSON', 'ORG', 'NORP', 'LANGUAGE', 'GPE', 'FAC','WORK_OF_ART','EVENT']
         self.topk = topk
+        # 'mapped' when emb_model is the memory-mapped export (unknown words are not composed from n-grams)
+        self.vectors = None
 
 
     def reset(self, doc):
         self._desc = None
-        self._doc = nlp(doc)
+        if isinstance(doc, str):
+            with self._metrics.timer('filter.parse'):
+                doc = get_nlp()(doc)
+        self._doc = doc
         self._candidates = None
         self._weight = []
         self._counter = Counter()
@@ -83,44 +109,82 @@ class Filter():
         self._candidates = candidates    
         return candidates
 
+    def __most_similar(self, words: list) -> list:
+        """ Most similar neighboring words of every word (empty if unknown to the model), served from the cache when possible
+        """
+        topn = self.topk*2 if self.topk < 10 else self.topk
+        cached = [self._cache.get((word, topn)) if self._cache is not None else None for word in words]
+        missing = list(dict.fromkeys([word for word, neighbors in zip(words, cached) if neighbors is None]))
+
+        if self._scorer is not None:
+            computed = self._scorer.most_similar(missing, topn=topn)
+        else:
+            computed = []
+            for word in missing:
+                try:
+                    computed.append(self._model.most_similar(word, topn=topn))
+                except KeyError:
+                    # out of vocabulary (no known n-gram)
+                    computed.append(None)
+                except Exception:
+                    self._metrics.inc('filter.errors')
+                    computed.append(None)
+
+        lookup = {word: neighbors or [] for word, neighbors in zip(missing, computed)}
+        if self._cache is not None:
+            for word, neighbors in lookup.items():
+                self._cache.put((word, topn), neighbors)
+
+        result = [neighbors if neighbors is not None else lookup[word] for word, neighbors in zip(words, cached)]
+        self._metrics.inc('embedding.lookups', len(words))
+        self._metrics.inc('embedding.computed', len(missing))
+        self._metrics.inc('embedding.oov', sum(1 for neighbors in result if not neighbors))
+        return result
+
     def __eval_neighbor(self):
         """ Evaluate top m(2topk if topk < 10 else topk) most similar neighboring words and store it counter
         """
+        words = []
         for item in self._candidates:
-            if len(item.split()) > 1:
-                for word in item.split():
-                    try:
-                        self._counter.update(self._model.most_similar(word.lower(), topn= self.topk*2 if self.topk < 10 else self.topk))
-                    except:
-                        pass
-            else:
-                try:
-                    self._counter.update(self._model.most_similar(item.lower(), topn=self.topk*2 if self.topk < 10 else self.topk))
-                except:
-                    pass
+            words.extend([word.lower() for word in item.split()] if len(item.split()) > 1 else [item.lower()])
+
+        for neighbors in self.__most_similar(words):
+            self._counter.update(neighbors)
 
     def __eval_similar(self):
         """Sort the candidate list based on similarity score between top count of most similar neighboring words and candidates and return topk
         """
         top_words = self._counter.most_common(10)
-        score = []
-        for words in self._candidates:
-            words_split = words.split()
-            if len(words_split) > 1:
-                temp_score = []
-                for word in words_split:
+        if self._scorer is not None:
+            score = self._scorer.candidate_scores(self._candidates, [i[0][0] for i in top_words])
+        else:
+            score = []
+            for words in self._candidates:
+                words_split = words.split()
+                if len(words_split) > 1:
+                    temp_score = []
+                    for word in words_split:
+                        try:
+                            temp_score.append(sum([self._model.similarity(word.lower(),i[0][0]) for i in top_words]))
+                        except KeyError:
+                            # out of vocabulary words count as 0 (already counted by the neighbor lookup)
+                            pass
+                        except Exception:
+                            self._metrics.inc('filter.errors')
+                    score.append(sum(temp_score)/len(words_split))
+                else:
                     try:
-                        temp_score.append(sum([self._model.similarity(word.lower(),i[0][0]) for i in top_words]))
-                    except:
-                        pass
-                score.append(sum(temp_score)/len(words_split))
-            else:
-                try:
-                    score.append(sum([self._model.similarity(words.lower(),i[0][0]) for i in top_words]))
-                except:
-                    pass
-
-        sorted_candidates = [(x,y) for x,y,_ in sorted(zip(self._candidates, self._weight, score), key=lambda items: items[2], reverse=True)]
+                        score.append(sum([self._model.similarity(words.lower(),i[0][0]) for i in top_words]))
+                    except KeyError:
+                        # a single word unknown to the model gets no score
+                        score.append(None)
+                    except Exception:
+                        self._metrics.inc('filter.errors')
+                        score.append(None)
+
+        # candidates without a score are dropped along with their weight
+        scored = [(x,y,z) for x,y,z in zip(self._candidates, self._weight, score) if z is not None]
+        sorted_candidates = [(x,y) for x,y,_ in sorted(scored, key=lambda items: items[2], reverse=True)]
         if self.topk < len(sorted_candidates):
             self._candidates = sorted_candidates[0:self.topk]
         else:
@@ -130,115 +194,694 @@ class Filter():
         """ Excute the huristics one by one 
         
         Arguments:
-            text {str} -- description as string
+            text {str} -- description as string (or an already parsed spacy Doc)
         
         Returns:
             list -- list of candiate skills
         """
+        metrics = self._metrics
         # begin by reseting previous state
         self.reset(text)
-        self._desc = text
+        self._desc = self._doc.text
+        metrics.inc('filter.docs')
+        metrics.inc('filter.tokens', len(self._doc))
+
+        with metrics.timer('filter.pos'):
+            self.__filter_POS()
+        metrics.inc('filter.candidates.pos', len(self._candidates))
+        with metrics.timer('filter.ner'):
+            self.__filter_NER()
+        metrics.inc('filter.candidates.ner', len(self._candidates))
+        with metrics.timer('filter.neighbor'):
+            self.__eval_neighbor()
+        with metrics.timer('filter.similar'):
+            self.__eval_similar()
+        metrics.inc('filter.candidates.out', len(self._candidates))
+
+        return self._candidates
 
+    def candidates(self, doc) -> list:
+        """ Candidate skills of a description after the POS and NER filters only (steps 1 and 2, no embedding needed)
+        
+        Arguments:
+            doc {Doc} -- parsed description (spacy Doc or GazetteerDoc)
+        
+        Returns:
+            list -- candidate entities
+        """
+        self.reset(doc)
         self.__filter_POS()
-        self.__filter_NER()
-        self.__eval_neighbor()
-        self.__eval_similar()
+        return self.__filter_NER()
 
-        return self._candidates
+    def pipe(self, texts, batch_size=256, n_process=1):
+        """ Excute the huristics on a stream of descriptions, parsed with spacy in batches
+        
+        Arguments:
+            texts {iterable} -- descriptions as string
+        
+        Keyword Arguments:
+            batch_size {int} -- number of descriptions parsed per batch (default: {256})
+            n_process {int} -- number of processes used by spacy (default: {1})
+        
+        Returns:
+            generator -- list of candidate skills for each description (in input order)
+        """
+        for doc in parse(texts, batch_size=batch_size, n_process=n_process):
+            yield self.process(doc)
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    def config(self) -> dict:
+        """Settings which change the skills returned by process (everything but the embedding model itself)
+        """
+        scorer = None
+        if self._scorer is not None:
+            scorer = 'ann{}'.format(self._scorer.index.nprobe) if self._scorer.index is not None else 'vectorized'
+        config = {'topk': self.topk, 'ner_labels': self._NER_labels, 'scale': self._scale, 'scorer': scorer}
+        if self.vectors is not None:
+            config['vectors'] = self.vectors
+        if self._scorer is not None and self._scorer.quantized is not None:
+            config['quantized'] = self._scorer.quantized.dtype
+        return config
+
+def parse_posting(line: str):
+    """Parse a JSON line and return the title and the part of the description used for skill identification
+    
+    Arguments:
+        line {str} -- one line of the JSON file (or the already decoded record)
+    
+    Returns:
+        tuple -- (title, description) where description starts from the first 'require' (if any)
+    """
+    from read import loads
+
+    j_data = line if isinstance(line, dict) else loads(line)
 
-def train_fasttext(filepath) -> str:
+    title = j_data['title']
+    description = j_data['description'].replace('\n',' ')
+    reqd_pos = description.find('require')
+    desc = description[reqd_pos:] if reqd_pos > 0 else description
+
+    return title, desc
+
+def train_fasttext(filepath, store_path=None) -> str:
     """ Train FASTTEXT by first creating a temporary document of description in txt format for processing by the package.
+    With a corpus store, the cleaned descriptions of the store are used instead (only new postings are cleaned).
     
     Arguments:
         filepath {[type]} -- path to JSON file
     
+    Keyword Arguments:
+        store_path {str} -- path to the corpus store directory, updated from the JSON file first (default: {None})
+    
     Returns:
         str -- path to the location of the stored model
     """
-    data = read(filepath)
-    # create temp txt file for writing the description
-    temp_file = os.path.join(os.path.dirname(filepath), 'temp_file.txt')
-    
+    from read import read, loads
+    from preprocess import TextPreprocessor
+    from tqdm import tqdm
+    import fasttext
+
     model_folder = os.path.join(os.path.dirname(filepath),'models')
     if not os.path.exists(model_folder):       
         os.makedirs(model_folder)
     model_file = os.path.join(model_folder, 'fasttext_model.bin')
 
-    cleaner = TextPreprocessor()
-    with open(temp_file, 'w') as f:
-        for item in tqdm(data):
-            j_data = json.loads(item)
-            text = cleaner.pre_process(j_data['description'])
-            f.write(text+'\n')
-    
-    model = fasttext.train_unsupervised(temp_file, dim=100, epoch=2, thread=12)
-    model.save_model(model_file)
+    if store_path:
+        store = open_store(store_path, filepath)
+        model = fasttext.train_unsupervised(store.text_path, dim=100, epoch=2, thread=12)
+    else:
+        data = read(filepath)
+        # create temp txt file for writing the description
+        temp_file = os.path.join(os.path.dirname(filepath), 'temp_file.txt')
+
+        cleaner = TextPreprocessor()
+        descriptions = (loads(item)['description'] for item in data)
+        with open(temp_file, 'w') as f:
+            for text in tqdm(cleaner.pre_process_many(descriptions, n_process=os.cpu_count())):
+                f.write(text+'\n')
 
-    os.remove(temp_file)
+        model = fasttext.train_unsupervised(temp_file, dim=100, epoch=2, thread=12)
+        os.remove(temp_file)
+
+    model.save_model(model_file)
     print('Trained model saved at: ', model_file)
     return model_file
 
-def learn_graph(filepath: str, model_path: str, graph_path: str):
+def open_store(store_path: str, filepath: str) -> 'CorpusStore':
+    """Open a corpus store and add the postings appended to the JSON file since its last update
+    
+    Arguments:
+        store_path {str} -- path to the corpus store directory
+        filepath {str} -- path to JSON file
+    
+    Returns:
+        CorpusStore -- up to date store
+    """
+    from corpus import CorpusStore
+
+    store = CorpusStore(store_path)
+    added = store.update(filepath, n_process=os.cpu_count())
+    print('CORPUS STORE: {} postings added, {} stored'.format(added, len(store)))
+    return store
+
+def load_filter(model_path: str, vectorized=False, cache_path=None, nprobe=None, mapped=False, quantize=None,
+                metrics=None) -> Filter:
+    """Load the word embedding model and create a Filter on top of it
+    
+    Arguments:
+        model_path {str} -- path to word embedding model file in gensim keyvector formate
+    
+    Keyword Arguments:
+        vectorized {bool} -- score candidates in bulk with numpy (VectorScorer) (default: {False})
+        cache_path {str} -- path to a neighbor cache saved by a previous run (default: {None})
+        nprobe {int} -- search neighbors with the ANN index stored next to the model, scanning nprobe clusters (implies vectorized) (default: {None})
+        mapped {bool} -- memory-map the vectors exported next to the model (exported first if needed) instead of loading the model (default: {False})
+        quantize {str} -- score with the 'float16' or 'int8' store kept next to the model (implies vectorized) (default: {None, float32})
+        metrics {Metrics} -- metrics updated by the filter (default: {new Metrics})
+    
+    Returns:
+        Filter -- filter with its (shared) neighbor cache
+    """
+    from scoring import VectorScorer
+    from cache import NeighborCache, model_tag
+    from ann import load_index
+
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.timer('load.model'):
+        if mapped:
+            from vectors import load_vectors
+            model = load_vectors(model_path)
+        else:
+            from gensim.models.wrappers import FastText
+            model = FastText.load_fasttext_format(model_path)
+    # approximate neighbors are not interchangeable with exact ones, the mapped vectors have no n-grams for unknown words
+    tag = model_tag(model_path) + (':ann{}'.format(nprobe) if nprobe else '') + (':mapped' if mapped else '') + \
+        (':' + quantize if quantize else '')
+    cache = NeighborCache.load(cache_path, tag=tag)
+
+    scorer = None
+    if vectorized or nprobe or quantize:
+        scorer = VectorScorer(model.wv)
+        if nprobe:
+            scorer.index = load_index(model_path, model.wv.vectors_norm, nprobe=nprobe)
+        if quantize:
+            from quantize import load_quantized
+            scorer.quantized = load_quantized(model_path, model.wv.vectors_norm, quantize)
+
+    filter = Filter(model, scorer=scorer, cache=cache, metrics=metrics)
+    if mapped:
+        filter.vectors = 'mapped'
+    return filter
+
+def filter_config(vectorized=False, nprobe=None, mapped=False, quantize=None) -> dict:
+    """Configuration (Filter.config) of the filter load_filter creates, without loading the model
+    """
+    filter = Filter(None)
+    if mapped:
+        filter.vectors = 'mapped'
+    config = filter.config()
+    if nprobe:
+        config['scorer'] = 'ann{}'.format(nprobe)
+    elif vectorized or quantize:
+        config['scorer'] = 'vectorized'
+    if quantize:
+        config['quantized'] = quantize
+    return config
+
+def learn_graph(filepath: str, model_path: str, graph_path: str, batch_size=256, n_process=1, vectorized=False,
+                cache_path=None, nprobe=None, resume=False, metrics_path=None, metrics_interval=10.0, store_path=None,
+                dedup_threshold=None, skill_cache_path=None, gazetteer_mode=None, gazetteer_path=None, read_workers=1,
+                nlp_workers=0, score_workers=0, queue_size=None, mapped=False, quantize=None, memory_budget=None):
     """Learn the graph by first reading each entry in the JSON file, processing it get the probable skills.
     Approach(after skill identification): 1) Add the title as a node to a Graph
                 2) Add the sorted skills identified in step 5 as nodes.
                 3) Join edges between title and edges based on step 7
                 4) Update the edge weight if new weight evaluated for any other doc is more than current weight
+    Changes to the graph are appended to a checkpoint log (graph_path + '.log') committed every 100 documents along with the
+    input position, the full graph is saved at the end.
+    Stage timers (parsing, each Filter stage, graph writes, checkpoints) and counters are exported to metrics_path
+    every metrics_interval seconds (at checkpoints) and at the end.
+    With a corpus store, the postings are read from the store instead of the JSON file (the checkpoint position is then
+    a row of the store).
+    With a dedup threshold, a posting whose description is a near-duplicate of one already processed reuses its skills
+    (it is neither parsed nor filtered). With a skill cache, postings whose description was processed by an earlier run
+    (with the same models and Filter configuration) reuse the cached skills, so a rebuild only processes new or changed
+    postings.
+    With a gazetteer mode, the entity and POS dumps (temp/*.txt) are matched in linear time: 'replace' tags and matches
+    every description with the gazetteer instead of spacy, 'prefilter' only parses with spacy the sentences containing
+    a known entity.
+    With NLP or scoring workers, reading, parsing, scoring and graph writes run as a pipeline of stages connected by
+    bounded queues (see Pipeline); the graph is the same.
+    With a memory budget, edges are spilled to sorted files merged at the end (see SpillGraph) and the graph is saved as
+    a CSRGraph directory at graph_path, for corpora whose graph does not fit in memory (no checkpoint log, no resume).
     
     Arguments:
         filepath {str} -- path to JSON file
         model_path {str} -- path to word embedding model file in gensim keyvector formate
         graph_path {str} -- path to graph
+    
+    Keyword Arguments:
+        batch_size {int} -- number of descriptions parsed by spacy per batch (default: {256})
+        n_process {int} -- number of processes used by spacy (default: {1})
+        vectorized {bool} -- score candidates in bulk with numpy (VectorScorer) (default: {False})
+        cache_path {str} -- load the neighbor cache from this file and save it back at the end (with workers, the caches of the scoring processes merged) (default: {None})
+        nprobe {int} -- search neighbors with the ANN index, scanning nprobe clusters (default: {None})
+        resume {bool} -- replay the checkpoint log and continue from its last committed input position (default: {False})
+        metrics_path {str} -- metrics file, Prometheus text format if it ends with .prom, JSON otherwise (default: {None})
+        metrics_interval {float} -- minimum number of seconds between two metrics exports (default: {10.0})
+        store_path {str} -- path to the corpus store directory, updated from the JSON file first (default: {None})
+        dedup_threshold {float} -- minimum similarity (estimated Jaccard of word shingles) of near-duplicates (default: {None, no dedup})
+        skill_cache_path {str} -- SQLite file caching the skills of every processed description (default: {None})
+        gazetteer_mode {str} -- 'replace' or 'prefilter' spacy with the gazetteer (default: {None, spacy only})
+        gazetteer_path {str} -- directory of the entity and POS dumps (default: {None, temp/})
+        read_workers {int} -- pipeline: number of threads decoding the postings (default: {1})
+        nlp_workers {int} -- pipeline: number of processes parsing the descriptions (default: {0, no pipeline})
+        score_workers {int} -- pipeline: number of processes scoring the candidates, each loads the model (default: {0, no pipeline})
+        queue_size {int} -- pipeline: maximum number of batches in flight (default: {None, 2 per process})
+        mapped {bool} -- memory-map the vectors exported next to the model, shared by the scoring processes (default: {False})
+        quantize {str} -- score with the 'float16' or 'int8' vectors (see quantize.py) (default: {None, float32})
+        memory_budget {int} -- build the graph out of memory with this budget for the edges, in MB (default: {None, in memory})
     """
-    data = read(filepath)
-    model = FastText.load_fasttext_format(model_path)
-    graph = Graph()
-
-    filter = Filter(model)
-    for i, d in tqdm(enumerate(data)):
-        j_data = json.loads(d)
-
-        title = j_data['title']
-        description = j_data['description'].replace('\n',' ')
-        reqd_pos = description.find('require')
-        desc = description[reqd_pos:] if reqd_pos > 0 else description
-
-        # add graph node
-        graph.add_node(title.lower(), 'title')
-
-        skills = filter.process(desc)
-        
-        for item in skills:
-            skill = item[0].strip()
-            graph.add_node(skill.lower(),'skill')
-            graph.add_edge(title.lower(), skill.lower(), weight=item[1])
+    from read import read_offsets
+    from dedup import Deduplicator
+    from graph import Graph
+    from checkpoint import CheckpointLog, LoggedGraph
+    from tqdm import tqdm
+
+    log_path = graph_path + '.log'
+    graph, offset, log_size = Graph(), 0, 0
+    if memory_budget:
+        from spill import SpillGraph
+        if resume:
+            raise ValueError('resume is not supported when building the graph with a memory budget')
+        # nodes stay in memory, edges go to spill files next to the graph
+        log = None
+        logged_graph = SpillGraph(graph_path.rstrip(os.sep) + '.spill', memory_budget=memory_budget)
+    else:
+        if resume and os.path.exists(log_path):
+            graph, offset, log_size = CheckpointLog.replay(log_path)
+            print('RESUMED AT OFFSET: ', offset)
+        log = CheckpointLog(log_path, resume_at=log_size)
+        logged_graph = LoggedGraph(graph, log)
+
+    if store_path:
+        items, decode = open_store(store_path, filepath).postings(offset), _store_posting
+    else:
+        items, decode = read_offsets(filepath, offset), _decode_posting
+
+    metrics = Metrics(metrics_path, interval=metrics_interval)
+    pipelined = nlp_workers > 0 or score_workers > 0
+    # in a pipeline the model is loaded by the scoring processes only (their neighbor caches are merged and saved at the end)
+    if pipelined and (mapped or quantize):
+        # export and quantize once here rather than in every scoring process
+        load_filter(model_path, mapped=mapped, quantize=quantize)
+    filter = None if pipelined else load_filter(model_path, vectorized=vectorized, cache_path=cache_path, nprobe=nprobe,
+                                                mapped=mapped, quantize=quantize, metrics=metrics)
+    cache = filter.cache if filter is not None else None
+    dedup = Deduplicator(threshold=dedup_threshold) if dedup_threshold else None
+    config = filter.config() if filter is not None else filter_config(vectorized, nprobe, mapped, quantize)
+    skill_cache = open_skill_cache(skill_cache_path, model_path, config, gazetteer_mode, gazetteer_path) \
+        if skill_cache_path else None
+    if pipelined:
+        from pipeline import Pipeline
+        pipeline = Pipeline(model_path, read_workers=read_workers, nlp_workers=nlp_workers, score_workers=score_workers,
+                            batch_size=batch_size, queue_size=queue_size, vectorized=vectorized, cache_path=cache_path,
+                            nprobe=nprobe, gazetteer_mode=gazetteer_mode, gazetteer_path=gazetteer_path, mapped=mapped,
+                            quantize=quantize, metrics=metrics)
+        results = pipeline.run(items, decode, dedup, skill_cache)
+    else:
+        # every stage only counts its own time: 'read' the reading and decoding, 'mark' the lookups, 'parse' spacy
+        postings = metrics.timed(mark_postings(metrics.timed(map(decode, items), 'read'), dedup, skill_cache), 'mark')
+        # descriptions are parsed in batches, the title (and input position) travels along as context
+        docs = metrics.timed(parse_postings(postings, filter, batch_size=batch_size, n_process=n_process,
+                                            gazetteer_mode=gazetteer_mode, gazetteer_path=gazetteer_path), 'parse')
+        results = extract_skills(docs, filter, dedup, skill_cache)
+    start = perf_counter()
+    n_docs = 0
+    for i, ((title, offset), skills) in tqdm(enumerate(results)):
+        n_docs = i + 1
+        with metrics.timer('graph.write'):
+            # add graph node
+            logged_graph.add_node(title.lower(), 'title')
+            add_skills(logged_graph, title, skills)
 
         if i % 100 == 0:
             print('DUPMED: ',i)
+            with metrics.timer('graph.commit'):
+                if log is not None:
+                    log.commit(offset)
+                if skill_cache is not None:
+                    skill_cache.commit()
+            metrics.set('learn_graph.docs_per_sec', (i + 1) / (perf_counter() - start))
+            if cache is not None:
+                metrics.set('cache.hit_rate', cache.hit_rate())
+            metrics.maybe_export()
+
+    if log is not None:
+        with metrics.timer('graph.commit'):
+            log.commit(offset)
+        log.close()
+    with metrics.timer('graph.save'):
+        if log is None:
+            logged_graph.save(graph_path)
+            metrics.set('graph.spill_runs', len(logged_graph.runs))
+        else:
             with open(graph_path, 'wb') as f:
                 pickle.dump(graph, f)
 
-def get_item(node, number, graph, next_n = False):
+    metrics.set('learn_graph.docs_per_sec', n_docs / (perf_counter() - start))
+    if pipelined:
+        cache = pipeline.cache
+    if cache is not None:
+        metrics.set('cache.hit_rate', cache.hit_rate())
+        print('NEIGHBOR CACHE: {} entries, {} hits, {} misses ({:.1%} hit rate)'.format(len(cache), cache.hits,
+                                                                                        cache.misses, cache.hit_rate()))
+    metrics.export()
+    if dedup is not None:
+        print('DEDUP: ', dedup.report())
+    if skill_cache is not None:
+        print('SKILL CACHE: {} entries, {} hits, {} misses ({:.1%} hit rate)'.format(
+            len(skill_cache), skill_cache.hits, skill_cache.misses, skill_cache.hit_rate()))
+        skill_cache.close()
+    if cache_path and cache is not None:
+        cache.save(cache_path)
+
+def _decode_posting(item):
+    """(description, (title, offset)) of a (line, offset) of the JSON file
+    """
+    line, offset = item
+    title, desc = parse_posting(line)
+    return desc, (title, offset)
+
+def _store_posting(item):
+    title, desc, row = item
+    return desc, (title, row)
+
+def parse_postings(postings, filter: Filter, batch_size=256, n_process=1, gazetteer_mode=None, gazetteer_path=None):
+    """Parse (description, context) tuples with spacy, the gazetteer ('replace') or spacy on the sentences the gazetteer
+    matched ('prefilter')
+    
+    Arguments:
+        postings {iterable} -- (description, context) tuples
+        filter {Filter} -- filter the docs are parsed for (its NER labels are loaded from the dumps)
+    
+    Keyword Arguments:
+        batch_size {int} -- number of descriptions parsed by spacy per batch (default: {256})
+        n_process {int} -- number of processes used by spacy (default: {1})
+        gazetteer_mode {str} -- 'replace' or 'prefilter' (default: {None, spacy only})
+        gazetteer_path {str} -- directory of the entity and POS dumps (default: {None, temp/})
+    
+    Returns:
+        generator -- (Doc, context) tuples in input order
+    """
+    if gazetteer_mode is None:
+        return parse(postings, batch_size=batch_size, n_process=n_process, as_tuples=True)
+    gazetteer = get_gazetteer(gazetteer_path, labels=filter.config()['ner_labels'])
+    if gazetteer_mode == 'replace':
+        return gazetteer.pipe(postings, as_tuples=True)
+    postings = ((gazetteer.reduce(text), context) for text, context in postings)
+    return parse(postings, batch_size=batch_size, n_process=n_process, as_tuples=True)
+
+def open_skill_cache(path: str, model_path: str, config: dict, gazetteer_mode=None, gazetteer_path=None) -> 'SkillCache':
+    """Open the skill cache for a model and a filter: entries extracted with another embedding model, spacy model,
+    gazetteer or Filter configuration are dropped
+    
+    Arguments:
+        path {str} -- path to the SQLite file
+        model_path {str} -- path to word embedding model file
+        config {dict} -- configuration of the filter the skills are extracted with (Filter.config)
+    
+    Keyword Arguments:
+        gazetteer_mode {str} -- 'replace' or 'prefilter' (default: {None, spacy only})
+        gazetteer_path {str} -- directory of the entity and POS dumps (default: {None, temp/})
+    
+    Returns:
+        SkillCache -- cache
+    """
+    from cache import SkillCache, model_tag
+    from gazetteer import DUMPS
+    import json
+
+    config = {'model': model_tag(model_path), 'filter': config, 'gazetteer': gazetteer_mode}
+    if gazetteer_mode != 'replace':
+        nlp = get_nlp()
+        config['spacy'] = '{}-{}'.format(nlp.meta['name'], nlp.meta['version'])
+    if gazetteer_mode is not None:
+        directory = gazetteer_path or DUMPS
+        config['dumps'] = [model_tag(os.path.join(directory, name)) for name in sorted(os.listdir(directory))
+                           if name.endswith('.txt')]
+    tag = json.dumps(config, sort_keys=True)
+    skill_cache = SkillCache(path, tag)
+    if skill_cache.invalidated:
+        print('SKILL CACHE: configuration changed, cache cleared')
+    return skill_cache
+
+def mark_postings(postings, dedup=None, skill_cache=None):
+    """Decide, before parsing, which postings need Filter.process: postings found in the skill cache and near-duplicates
+    of an earlier posting do not (their description is replaced by an empty string so it costs nothing to parse)
+    
+    Arguments:
+        postings {iterable} -- (description, context) tuples
+    
+    Keyword Arguments:
+        dedup {Deduplicator} -- near-duplicate detection (default: {None})
+        skill_cache {SkillCache} -- skills of previously processed descriptions (default: {None})
+    
+    Returns:
+        generator -- (description or '', (context, key, description, cached skills or None, key of the original or None))
+    """
+    for key, (text, context) in enumerate(postings):
+        skills = skill_cache.get(text) if skill_cache is not None else None
+        original = None
+        if dedup is not None and skills is None:
+            original = dedup.check(text, key)
+        elif dedup is not None:
+            # cached postings are still candidate originals for the near-duplicates that follow
+            dedup.add(key, dedup.signature(text))
+        yield ('' if skills is not None or original is not None else text), (context, key, text, skills, original)
+
+def extract_skills(docs, filter: Filter, dedup=None, skill_cache=None):
+    """Run Filter.process over the parsed postings marked by mark_postings, reusing cached skills and the skills of the
+    original of near-duplicates
+    
+    Arguments:
+        docs {iterable} -- (Doc, context) tuples
+        filter {Filter} -- filter
+    
+    Keyword Arguments:
+        dedup {Deduplicator} -- near-duplicate detection used by mark_postings (default: {None})
+        skill_cache {SkillCache} -- skill cache used by mark_postings, new results are added to it (default: {None})
+    
+    Returns:
+        generator -- (context, skills) in input order
+    """
+    for doc, marked in docs:
+        _, _, _, skills, original = marked
+        computed = filter.process(doc) if skills is None and original is None else None
+        yield resolve_skills(marked, computed, filter.metrics, dedup, skill_cache)
+
+def resolve_skills(marked: tuple, computed: list, metrics: Metrics, dedup=None, skill_cache=None):
+    """Skills of a posting marked by mark_postings: cached, those of its original or computed by Filter.process
+    (postings must be resolved in input order, an original before its near-duplicates)
+    
+    Arguments:
+        marked {tuple} -- (context, key, description, cached skills or None, key of the original or None)
+        computed {list} -- skills returned by Filter.process (None if the posting was not processed)
+        metrics {Metrics} -- metrics
+    
+    Keyword Arguments:
+        dedup {Deduplicator} -- near-duplicate detection used by mark_postings (default: {None})
+        skill_cache {SkillCache} -- skill cache used by mark_postings, new results are added to it (default: {None})
+    
+    Returns:
+        tuple -- (context, skills)
+    """
+    context, key, text, skills, original = marked
+    if skills is not None:
+        metrics.inc('skill_cache.hits')
+        if dedup is not None:
+            dedup.store(key, skills)
+    elif original is not None:
+        skills = dedup.result(original)
+        metrics.inc('dedup.skipped')
+    else:
+        skills = computed
+        if dedup is not None:
+            dedup.store(key, skills)
+        if skill_cache is not None:
+            skill_cache.put(text, skills)
+    return context, skills
+
+def add_skills(graph: 'Graph', title: str, skills: list):
+    """Add the skills identified for a title as nodes and join them to the title node
+    
+    Arguments:
+        graph {Graph} -- graph to update
+        title {str} -- title of the posting (its node is expected to exist)
+        skills {list} -- list of (skill, weight) returned by Filter.process
+    """
+    for item in skills:
+        skill = item[0].strip()
+        graph.add_node(skill.lower(),'skill')
+        graph.add_edge(title.lower(), skill.lower(), weight=item[1])
+
+def learn_shard(filepath: str, model_path: str, start: int, end: int, batch_size=256, vectorized=False,
+                cache_path=None, nprobe=None, dedup_threshold=None, skill_cache_path=None, gazetteer_mode=None,
+                gazetteer_path=None, mapped=False, quantize=None) -> 'Graph':
+    """Learn a partial graph over the postings starting within the byte range [start, end) of the JSON file
+    
+    Arguments:
+        filepath {str} -- path to JSON file
+        model_path {str} -- path to word embedding model file in gensim keyvector formate
+        start {int} -- byte offset of the first posting
+        end {int} -- byte offset after which no posting is started
+    
+    Keyword Arguments:
+        batch_size {int} -- number of descriptions parsed by spacy per batch (default: {256})
+        vectorized {bool} -- score candidates in bulk with numpy (VectorScorer) (default: {False})
+        cache_path {str} -- warm start the neighbor cache from this file (read only) (default: {None})
+        nprobe {int} -- search neighbors with the ANN index, scanning nprobe clusters (default: {None})
+        dedup_threshold {float} -- reuse the skills of near-duplicates within the shard (default: {None, no dedup})
+        skill_cache_path {str} -- SQLite file caching the skills of every processed description (shared by the shards) (default: {None})
+        gazetteer_mode {str} -- 'replace' or 'prefilter' spacy with the gazetteer (default: {None, spacy only})
+        gazetteer_path {str} -- directory of the entity and POS dumps (default: {None, temp/})
+        mapped {bool} -- memory-map the vectors exported next to the model (default: {False})
+        quantize {str} -- score with the 'float16' or 'int8' vectors (default: {None, float32})
+    
+    Returns:
+        Graph -- partial graph
+    """
+    from read import read_range
+    from graph import Graph
+    from dedup import Deduplicator
+
+    graph = Graph()
+
+    filter = load_filter(model_path, vectorized=vectorized, cache_path=cache_path, nprobe=nprobe, mapped=mapped,
+                         quantize=quantize)
+    postings = ((desc, title) for title, desc in map(parse_posting, read_range(filepath, start, end)))
+    dedup = Deduplicator(threshold=dedup_threshold) if dedup_threshold else None
+    skill_cache = open_skill_cache(skill_cache_path, model_path, filter.config(), gazetteer_mode, gazetteer_path) \
+        if skill_cache_path else None
+    docs = parse_postings(mark_postings(postings, dedup, skill_cache), filter, batch_size=batch_size,
+                          gazetteer_mode=gazetteer_mode, gazetteer_path=gazetteer_path)
+    for title, skills in extract_skills(docs, filter, dedup, skill_cache):
+        graph.add_node(title.lower(), 'title')
+        add_skills(graph, title, skills)
+
+    if dedup is not None:
+        print('DEDUP: ', dedup.report())
+    if skill_cache is not None:
+        skill_cache.close()
+    return graph
+
+def _learn_shard(args) -> 'Graph':
+    return learn_shard(*args)
+
+def learn_graph_sharded(filepath: str, model_path: str, graph_path: str, n_shards=None, batch_size=256, vectorized=False,
+                        cache_path=None, nprobe=None, dedup_threshold=None, skill_cache_path=None, gazetteer_mode=None,
+                        gazetteer_path=None, mapped=False, quantize=None):
+    """Learn the graph in parallel: the JSON file is split into byte ranges, every worker process learns a partial graph
+    over its range and the partial graphs are merged in input order (higher weight wins, as in Graph.add_edge).
+    Without dedup, the merged graph is the same as the one learned by learn_graph (tests/test_sharded.py). With dedup,
+    near-duplicates are only detected within a shard: a posting whose original is in an earlier shard is processed
+    instead of reusing the original's skills, so its edges (weights, neighbor order) may differ from learn_graph.
+    Every worker has its own neighbor cache, warm started from cache_path and not saved back (more misses, same results).
+    
+    Arguments:
+        filepath {str} -- path to JSON file
+        model_path {str} -- path to word embedding model file in gensim keyvector formate
+        graph_path {str} -- path to graph
+    
+    Keyword Arguments:
+        n_shards {int} -- number of shards/worker processes (default: {number of CPUs})
+        batch_size {int} -- number of descriptions parsed by spacy per batch (default: {256})
+        vectorized {bool} -- score candidates in bulk with numpy (VectorScorer) (default: {False})
+        cache_path {str} -- warm start the neighbor cache of every worker from this file (read only) (default: {None})
+        nprobe {int} -- search neighbors with the ANN index, scanning nprobe clusters (default: {None})
+        dedup_threshold {float} -- reuse the skills of near-duplicates within each shard (default: {None, no dedup})
+        skill_cache_path {str} -- SQLite file caching the skills of every processed description (default: {None})
+        gazetteer_mode {str} -- 'replace' or 'prefilter' spacy with the gazetteer (default: {None, spacy only})
+        gazetteer_path {str} -- directory of the entity and POS dumps (default: {None, temp/})
+        mapped {bool} -- memory-map the vectors exported next to the model, one copy shared by the workers (default: {False})
+        quantize {str} -- score with the 'float16' or 'int8' vectors (default: {None, float32})
+    """
+    from read import split_ranges
+    from graph import Graph
+
+    n_shards = n_shards or os.cpu_count()
+    if nprobe or mapped or quantize:
+        # build the index, the export and the quantized store once instead of in every worker
+        load_filter(model_path, nprobe=nprobe, mapped=mapped, quantize=quantize)
+    tasks = [(filepath, model_path, start, end, batch_size, vectorized, cache_path, nprobe, dedup_threshold, skill_cache_path,
+              gazetteer_mode, gazetteer_path, mapped, quantize) for start, end in split_ranges(filepath, n_shards)]
+
+    graph = Graph()
+    with Pool(max(len(tasks), 1)) as pool:
+        # imap keeps the shards in input order which makes the merge deterministic
+        for i, partial in enumerate(pool.imap(_learn_shard, tasks)):
+            graph.merge(partial)
+            print('MERGED SHARD: ', i)
+
+    with open(graph_path, 'wb') as f:
+        pickle.dump(graph, f)
+
+def get_item(node, number, graph, next_n = False, projection=None):
+    """Nearest or next neighbors of one node, answered by the NeighborIndex of the graph (built once per graph; next
+    neighbors are looked up in the materialized projection when given and it holds enough neighbors per node)
+    """
     node = node.lower()
+    if next_n and projection is not None:
+        item = projection.lookup(node, number)
+        if item is not None:
+            return item
+    index = graph.neighbor_index()
     if next_n:
-        return graph.next_neighbor(node, number)
+        item = index.next_neighbors([node], number)[0]
     else:
-        return graph.nearest_neighbor(node, number)
+        item = index.nearest_neighbors([node], number)[0]
+    if item is None:
+        raise KeyError(node)
+    return item
 
 def main(args):
-    if not args.modelpath:
-        model_path = train_fasttext(args.filepath)
-    else:
-        model_path = args.modelpath
-
     if args.train:
-        learn_graph(args.filepath, model_path, args.graphpath)
-
-    with open(args.graphpath, 'rb') as f:
-        graph = pickle.load(f)
+        # train the word embedding first if no pre-trained model is given
+        model_path = args.modelpath or train_fasttext(args.filepath, store_path=args.storepath)
+
+    if args.train and args.n_shards > 1:
+        learn_graph_sharded(args.filepath, model_path, args.graphpath, n_shards=args.n_shards, batch_size=args.batch_size,
+                            vectorized=args.vectorized, cache_path=args.cachepath, nprobe=args.nprobe, dedup_threshold=args.dedup,
+                            skill_cache_path=args.skillcachepath, gazetteer_mode=args.gazetteer,
+                            gazetteer_path=args.gazetteerpath, mapped=args.mapped, quantize=args.quantize)
+    elif args.train:
+        learn_graph(args.filepath, model_path, args.graphpath, batch_size=args.batch_size, n_process=args.n_process,
+                    vectorized=args.vectorized, cache_path=args.cachepath, nprobe=args.nprobe, resume=args.resume,
+                    metrics_path=args.metricspath, metrics_interval=args.metrics_interval, store_path=args.storepath,
+                    dedup_threshold=args.dedup, skill_cache_path=args.skillcachepath, gazetteer_mode=args.gazetteer,
+                    gazetteer_path=args.gazetteerpath, read_workers=args.read_workers, nlp_workers=args.nlp_workers,
+                    score_workers=args.score_workers, queue_size=args.queue_size, mapped=args.mapped,
+                    quantize=args.quantize, memory_budget=args.memory_budget)
+
+    if args.train and args.projectionpath:
+        from projection import update_projection
+        update_projection(args.graphpath, args.projectionpath, number=args.projection_n, refresh=args.resume)
+
+    graph = load_graph(args.graphpath)
 
     if args.t == args.neighbor:
-        item = get_item(args.name, args.n, graph, next_n = True)
+        projection = None
+        if args.projectionpath:
+            from projection import Projection
+            projection = Projection.load(args.projectionpath)
+        item = get_item(args.name, args.n, graph, next_n = True, projection=projection)
     else:
         item = get_item(args.name, args.n, graph, next_n = False)
 
@@ -250,6 +893,7 @@ def parse_arguments(argv):
     parser = argparse.ArgumentParser()
 
     parser.add_argument('--train', action='store_true', help='Start training from scratch!')
+    parser.add_argument('--resume', action='store_true', help='Resume training from the checkpoint log of the graph')
     parser.add_argument('--filepath', type=str, help='Enter full path to JSON file')
     parser.add_argument('--modelpath', type=str, help='Enter path of pre-trained word embedding model in gensim keywordvector format' )
 
@@ -258,7 +902,30 @@ def parse_arguments(argv):
     parser.add_argument('--neighbor', type=str, choices=['skill','title'],
                         help='What do you want to identify? skill or title', default='skill')
     parser.add_argument('--n', type=int, help='How many skill/title do you want ?', default=5)
-    parser.add_argument('--graphpath', type=str, help='Enter trained path:')
+    parser.add_argument('--graphpath', type=str, help='Enter trained path (pickled graph or CSR graph directory):')
+    parser.add_argument('--batch_size', type=int, help='Number of descriptions parsed by spacy per batch', default=256)
+    parser.add_argument('--n_process', type=int, help='Number of processes used by spacy for parsing', default=1)
+    parser.add_argument('--vectorized', action='store_true', help='Score candidate skills in bulk with numpy')
+    parser.add_argument('--cachepath', type=str, help='File to load/save the cache of most similar words across runs')
+    parser.add_argument('--nprobe', type=int, help='Search neighbors with the ANN index (built next to the model), scanning this many clusters')
+    parser.add_argument('--mapped', action='store_true', help='Memory-map the normalized vectors exported next to the model (see vectors.py) instead of loading the .bin in every process')
+    parser.add_argument('--quantize', type=str, choices=['float16', 'int8'], help='Score candidate skills with quantized vectors (stored next to the model, see quantize.py)')
+    parser.add_argument('--metricspath', type=str, help='Export stage timers and counters of the training to this file (.prom for Prometheus text format, JSON otherwise)')
+    parser.add_argument('--metrics_interval', type=float, help='Seconds between two exports of the metrics', default=10.0)
+    parser.add_argument('--storepath', type=str, help='Corpus store of cleaned postings (created or updated from the JSON file) used for training')
+    parser.add_argument('--dedup', type=float, help='Reuse the skills of near-duplicate postings (similarity threshold, e.g. 0.9)')
+    parser.add_argument('--skillcachepath', type=str, help='SQLite file caching the extracted skills of every description across runs')
+    parser.add_argument('--gazetteer', type=str, choices=['replace', 'prefilter'],
+                        help='Match the entity/POS dumps instead of running spacy (replace) or to select the sentences spacy parses (prefilter)')
+    parser.add_argument('--gazetteerpath', type=str, help='Directory of the entity and POS dumps used by --gazetteer (default: temp/)')
+    parser.add_argument('--read_workers', type=int, help='Pipeline: threads decoding the postings', default=1)
+    parser.add_argument('--nlp_workers', type=int, help='Pipeline: processes parsing the descriptions (0 for no pipeline)', default=0)
+    parser.add_argument('--score_workers', type=int, help='Pipeline: processes scoring the candidate skills (0 for no pipeline)', default=0)
+    parser.add_argument('--queue_size', type=int, help='Pipeline: maximum number of batches in flight between the stages')
+    parser.add_argument('--projectionpath', type=str, help='Materialized skill-skill/title-title projection (built after --train, refreshed with --resume) answering next neighbor queries')
+    parser.add_argument('--projection_n', type=int, help='Number of related skills/titles kept per node in the projection', default=50)
+    parser.add_argument('--memory_budget', type=int, help='Build the graph out of memory: edges are spilled to sorted files (MB of memory for the edges), saved as a CSR graph directory')
+    parser.add_argument('--n_shards', type=int, help='Learn the graph in parallel over this many shards of the JSON file', default=1)
 
     return parser.parse_args(argv)
 
@@ -0,0 +1,166 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+import json
+import os
+import re
+
+
+class Metrics():
+    """Counters, gauges and stage timers of a run, exported as JSON or in the Prometheus text format.
+    Cheap enough to be always on: a timer costs two perf_counter calls.
+    """
+
+    def __init__(self, path=None, interval=10.0):
+        """
+        Keyword Arguments:
+            path {str} -- file written by export, Prometheus text format if it ends with .prom, JSON otherwise (default: {None})
+            interval {float} -- minimum number of seconds between two exports of maybe_export (default: {10.0})
+        """
+        self.path = path
+        self.interval = interval
+        self._counters = defaultdict(int)
+        self._gauges = {}
+        # stage -> [calls, total seconds]
+        self._timers = defaultdict(lambda: [0, 0.0])
+        # seconds spent in nested timed steps, one entry per timed step running
+        self._inner = []
+        self._start = perf_counter()
+        self._exported = self._start
+
+    def inc(self, name: str, value=1):
+        self._counters[name] += value
+
+    def set(self, name: str, value):
+        self._gauges[name] = value
+
+    def observe(self, stage: str, seconds: float):
+        timer = self._timers[stage]
+        timer[0] += 1
+        timer[1] += seconds
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time a block of code
+
+        Arguments:
+            stage {str} -- name of the stage
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, perf_counter() - start)
+
+    def timed(self, iterable, stage: str):
+        """Iterate while timing every step of the iterator (for example the batches parsed by nlp.pipe). The time spent
+        in the steps of other timed iterables it consumes is excluded (not thread safe)
+
+        Arguments:
+            iterable {iterable} -- iterable to time
+            stage {str} -- name of the stage
+
+        Returns:
+            generator -- items of the iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            # a step of a timed iterable feeding this one (parse pulling marked postings) is counted in its own stage
+            self._inner.append(0.0)
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds = perf_counter() - start
+                self.observe(stage, seconds - self._inner.pop())
+                if self._inner:
+                    self._inner[-1] += seconds
+            yield item
+
+    def merge(self, snapshot: dict):
+        """Add the counters and timers of a snapshot taken by another process (gauges are overwritten)
+
+        Arguments:
+            snapshot {dict} -- snapshot of another Metrics
+        """
+        for name, value in snapshot['counters'].items():
+            self._counters[name] += value
+        self._gauges.update(snapshot['gauges'])
+        for stage, timer in snapshot['timers'].items():
+            total = self._timers[stage]
+            total[0] += timer['calls']
+            total[1] += timer['total_s']
+
+    def reset(self):
+        """Clear the counters, gauges and timers (for example after shipping a snapshot to merge)
+        """
+        self._counters.clear()
+        self._gauges.clear()
+        self._timers.clear()
+
+    def snapshot(self) -> dict:
+        """Current values
+
+        Returns:
+            dict -- uptime, counters, gauges and per stage calls/total seconds/mean milliseconds
+        """
+        return {'uptime_s': perf_counter() - self._start,
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'timers': {stage: {'calls': calls, 'total_s': total, 'mean_ms': total * 1000 / calls if calls else 0.0}
+                           for stage, (calls, total) in self._timers.items()}}
+
+    def to_prometheus(self, prefix='skillgraph') -> str:
+        """Prometheus text exposition format of the current values
+
+        Keyword Arguments:
+            prefix {str} -- prefix of every metric name (default: {'skillgraph'})
+
+        Returns:
+            str -- metrics
+        """
+        snapshot = self.snapshot()
+        lines = ['# TYPE {}_uptime_seconds gauge'.format(prefix), '{}_uptime_seconds {}'.format(prefix, snapshot['uptime_s'])]
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = '{}_{}_total'.format(prefix, _metric_name(name))
+            lines.extend(['# TYPE {} counter'.format(metric), '{} {}'.format(metric, value)])
+        for name, value in sorted(snapshot['gauges'].items()):
+            metric = '{}_{}'.format(prefix, _metric_name(name))
+            lines.extend(['# TYPE {} gauge'.format(metric), '{} {}'.format(metric, value)])
+        if snapshot['timers']:
+            lines.append('# TYPE {}_stage_seconds_total counter'.format(prefix))
+            lines.extend('{}_stage_seconds_total{{stage="{}"}} {}'.format(prefix, stage, timer['total_s'])
+                         for stage, timer in sorted(snapshot['timers'].items()))
+            lines.append('# TYPE {}_stage_calls_total counter'.format(prefix))
+            lines.extend('{}_stage_calls_total{{stage="{}"}} {}'.format(prefix, stage, timer['calls'])
+                         for stage, timer in sorted(snapshot['timers'].items()))
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path=None):
+        """Write the current values (atomically: readers never see a partial file)
+
+        Keyword Arguments:
+            path {str} -- file to write, Prometheus text format if it ends with .prom, JSON otherwise (default: {self.path})
+        """
+        path = path or self.path
+        if path is None:
+            return
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+        os.replace(temp_path, path)
+        self._exported = perf_counter()
+
+    def maybe_export(self):
+        """Export if at least interval seconds passed since the last export
+        """
+        if self.path is not None and perf_counter() - self._exported >= self.interval:
+            self.export()
+
+def _metric_name(name: str) -> str:
+    return re.sub('[^a-zA-Z0-9_]', '_', name)
@@ -0,0 +1,182 @@
+from csr_graph import CSRGraph, load_graph
+from scipy import sparse
+import numpy as np
+import argparse
+import sys
+
+
+class NeighborIndex():
+    """Sparse adjacency matrix (scipy CSR) of a bipartite Graph or CSRGraph answering neighbor queries for many nodes at
+    once: the next neighbors of a batch of query nodes are a product of sparse matrices instead of one sort per
+    neighbor. With A the weighted adjacency and B its binary pattern, the score of a next neighbor u of q is the sum over
+    the paths q - v - u of the cumulative weights w(q, v) + w(v, u):
+        S[q] = A[q] @ B + B[q] @ A          (the query node itself excluded)
+    so a node reached through several neighbors appears once, ranked by its aggregated score.
+    """
+
+    def __init__(self, adjacency, name, node_id):
+        """
+        Arguments:
+            adjacency {sparse.csr_matrix} -- symmetric weighted adjacency matrix
+            name {callable} -- node id -> name
+            node_id {callable} -- name -> node id (KeyError if the node does not exist)
+        """
+        self._adjacency = adjacency
+        self._pattern = sparse.csr_matrix((np.ones(len(adjacency.data)), adjacency.indices, adjacency.indptr),
+                                          shape=adjacency.shape)
+        self._name = name
+        self._node_id = node_id
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Index a Graph (networkx) or a CSRGraph (sharing its arrays)
+
+        Arguments:
+            graph {Graph or CSRGraph} -- graph
+
+        Returns:
+            NeighborIndex -- index
+        """
+        if isinstance(graph, CSRGraph):
+            return cls(graph.adjacency(), graph.name, graph.node_id)
+
+        nodes = list(graph.nodes)
+        ids = {node: i for i, node in enumerate(nodes)}
+        # rows keep the neighbor (insertion) order of networkx, which decides the ties of nearest_neighbor
+        indptr, indices, weights = [0], [], []
+        for node in nodes:
+            for neighbor, data in graph.graph[node].items():
+                indices.append(ids[neighbor])
+                weights.append(data['weight'])
+            indptr.append(len(indices))
+        adjacency = sparse.csr_matrix((np.array(weights, dtype=np.float64), np.array(indices, dtype=np.int64),
+                                       np.array(indptr, dtype=np.int64)), shape=(len(nodes), len(nodes)))
+        return cls(adjacency, nodes.__getitem__, ids.__getitem__)
+
+    def __len__(self):
+        return self._adjacency.shape[0]
+
+    def ids(self, nodes: list) -> np.ndarray:
+        """Node ids of names, -1 for unknown nodes
+        """
+        ids = np.empty(len(nodes), dtype=np.int64)
+        for i, node in enumerate(nodes):
+            try:
+                ids[i] = self._node_id(node)
+            except KeyError:
+                ids[i] = -1
+        return ids
+
+    def nearest_neighbors(self, nodes: list, number=1) -> list:
+        """Neighbors of every node sorted by edge weight (ties keep the stored order), top k
+
+        Arguments:
+            nodes {list} -- names of the query nodes
+
+        Keyword Arguments:
+            number {int} -- number of nodes to return per query (default: {1})
+
+        Returns:
+            list -- list of neighbors of every query (None for unknown nodes)
+        """
+        ids = self.ids(nodes)
+        rows = self._adjacency[np.maximum(ids, 0)]
+        return self._results(ids, [neighbors for neighbors, _ in _top(rows, number)])
+
+    def next_neighbors(self, nodes: list, number=1, batch_size=1024) -> list:
+        """Next neighbors (nodes after one hop, excluding the query node) of every node sorted by aggregated cumulative
+        edge weight (ties by node id), top k
+
+        Arguments:
+            nodes {list} -- names of the query nodes
+
+        Keyword Arguments:
+            number {int} -- number of nodes to return per query (default: {1})
+            batch_size {int} -- number of queries scored per matrix product, bounds the memory (default: {1024})
+
+        Returns:
+            list -- list of next neighbors of every query (None for unknown nodes)
+        """
+        ids = self.ids(nodes)
+        top = self.next_scores(np.maximum(ids, 0), number, batch_size=batch_size)
+        return self._results(ids, [neighbors for neighbors, _ in top])
+
+    def next_scores(self, ids: np.ndarray, number=1, batch_size=1024) -> list:
+        """Top k next neighbors of node ids with their aggregated scores
+
+        Arguments:
+            ids {np.ndarray} -- node ids of the queries
+
+        Keyword Arguments:
+            number {int} -- number of nodes to return per query (default: {1})
+            batch_size {int} -- number of queries scored per matrix product, bounds the memory (default: {1024})
+
+        Returns:
+            list -- (node ids, scores) of every query
+        """
+        top = []
+        for start in range(0, len(ids), batch_size):
+            batch = np.asarray(ids[start:start + batch_size], dtype=np.int64)
+            scores = (self._adjacency[batch] @ self._pattern + self._pattern[batch] @ self._adjacency).tocsr()
+            scores.sort_indices()
+            top.extend(_top(scores, number, exclude=batch))
+        return top
+
+    def _results(self, ids: np.ndarray, top: list) -> list:
+        return [[self._name(int(i)) for i in neighbors] if idx >= 0 else None for idx, neighbors in zip(ids, top)]
+
+def _top(rows, number: int, exclude=None) -> list:
+    """Top k values of every row of a CSR matrix with their column ids (stable: ties keep the column order of the row)
+
+    Arguments:
+        rows {sparse.csr_matrix} -- scores
+        number {int} -- k
+
+    Keyword Arguments:
+        exclude {np.ndarray} -- column excluded from every row (default: {None})
+
+    Returns:
+        list -- (column ids, values) per row
+    """
+    counts = np.diff(rows.indptr)
+    row = np.repeat(np.arange(rows.shape[0]), counts)
+    indices, data = rows.indices, rows.data
+    if exclude is not None:
+        keep = indices != exclude[row]
+        row, indices, data = row[keep], indices[keep], data[keep]
+    order = np.lexsort((-data, row))
+    row, indices, data = row[order], indices[order], data[order]
+    starts = np.searchsorted(row, np.arange(rows.shape[0] + 1))
+    return [(indices[start:min(end, start + number)], data[start:min(end, start + number)])
+            for start, end in zip(starts[:-1], starts[1:])]
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--graphpath', type=str, help='Enter trained path (pickled graph or CSR graph directory):')
+    parser.add_argument('--nodespath', type=str, help='File of query nodes, one per line')
+    parser.add_argument('--n', type=int, help='How many skill/title per query ?', default=5)
+    parser.add_argument('--nearest', action='store_true', help='Nearest neighbors (skill -> titles) instead of next neighbors (skill -> skills)')
+    parser.add_argument('--batch_size', type=int, help='Number of queries scored per matrix product', default=1024)
+    parser.add_argument('--output', type=str, help='Tab separated output file (query then neighbors)')
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE (related skills of every skill listed in skills.txt):
+    # python neighbors.py --graphpath /media/druv022/Data2/Challenge/data/graph_temp.csr --nodespath skills.txt --n 10 --output related_skills.tsv
+    args = parse_arguments(sys.argv[1:])
+    index = NeighborIndex.from_graph(load_graph(args.graphpath))
+    with open(args.nodespath, encoding='utf-8') as f:
+        nodes = [line.strip().lower() for line in f if line.strip()]
+
+    if args.nearest:
+        results = index.nearest_neighbors(nodes, args.n)
+    else:
+        results = index.next_neighbors(nodes, args.n, batch_size=args.batch_size)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for node, result in zip(nodes, results):
+            if result is not None:
+                f.write('\t'.join([node] + result) + '\n')
+    print('{} queries, {} unknown nodes, saved at: {}'.format(len(nodes), sum(r is None for r in results), args.output))
@@ -0,0 +1,265 @@
+from metrics import Metrics
+from collections import deque
+from queue import Queue, Empty
+import multiprocessing as mp
+import traceback
+import threading
+
+# end of stream marker sent to every worker of a stage
+END = None
+
+
+class Pipeline():
+    """Staged streaming skill extraction for learn_graph: reading and decoding, marking (skill cache and near-duplicates),
+    NLP (spacy or gazetteer), scoring (Filter.process) and the graph writer overlap instead of running back to back.
+
+        reader thread -> decoder threads -> main: mark -> NLP processes -> scoring processes -> main: resolve/write
+
+    Postings travel in batches numbered in input order. At most queue_size batches are in flight between the mark and
+    the write steps (backpressure: reading stops while the slowest stage catches up) and every queue is bounded by it,
+    so memory stays flat whatever the input size. Batches are reordered before being resolved, so the single graph
+    writer applies add_node/add_edge in input order and the graph is identical to the one of the sequential path.
+    NLP processes send the parsed documents to the scoring processes as GazetteerDoc (tokens and entities only).
+    """
+
+    def __init__(self, model_path: str, read_workers=1, nlp_workers=1, score_workers=1, batch_size=256, queue_size=None,
+                 vectorized=False, cache_path=None, nprobe=None, gazetteer_mode=None, gazetteer_path=None, mapped=False,
+                 quantize=None, metrics=None):
+        """
+        Arguments:
+            model_path {str} -- path to word embedding model file (loaded by every scoring process)
+
+        Keyword Arguments:
+            read_workers {int} -- number of threads decoding the postings (default: {1})
+            nlp_workers {int} -- number of processes parsing the descriptions (default: {1})
+            score_workers {int} -- number of processes running Filter.process (default: {1})
+            batch_size {int} -- number of postings per batch (default: {256})
+            queue_size {int} -- maximum number of batches in flight (default: {2 batches per NLP/scoring process})
+            vectorized {bool} -- score candidates in bulk with numpy (VectorScorer) (default: {False})
+            cache_path {str} -- warm start the neighbor cache of every scoring process from this file, the caches are
+                                merged into Pipeline.cache at the end (default: {None})
+            nprobe {int} -- search neighbors with the ANN index, scanning nprobe clusters (default: {None})
+            gazetteer_mode {str} -- 'replace' or 'prefilter' spacy with the gazetteer (default: {None, spacy only})
+            gazetteer_path {str} -- directory of the entity and POS dumps (default: {None, temp/})
+            mapped {bool} -- scoring processes memory-map the exported vectors (one copy in the page cache) (default: {False})
+            quantize {str} -- scoring processes score with the 'float16' or 'int8' vectors (default: {None, float32})
+            metrics {Metrics} -- metrics the stages of every process are merged into (default: {new Metrics})
+        """
+        self.read_workers = max(read_workers, 1)
+        self.nlp_workers = max(nlp_workers, 1)
+        self.score_workers = max(score_workers, 1)
+        self.batch_size = batch_size
+        self.queue_size = queue_size or 2 * (self.nlp_workers + self.score_workers)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._nlp_args = (batch_size, gazetteer_mode, gazetteer_path)
+        self._score_args = (model_path, vectorized, cache_path, nprobe, mapped, quantize)
+        # neighbor caches of the scoring processes, merged once they are done (None before)
+        self.cache = None
+
+    def run(self, items, decode, dedup=None, skill_cache=None):
+        """Extract the skills of a stream of postings
+
+        Arguments:
+            items {iterable} -- raw postings (for example (line, offset) of the JSON file)
+            decode {callable} -- raw posting -> (description, context), run by the decoder threads
+
+        Keyword Arguments:
+            dedup {Deduplicator} -- near-duplicate detection (default: {None})
+            skill_cache {SkillCache} -- skills of previously processed descriptions, new results are added to it (default: {None})
+
+        Returns:
+            generator -- (context, skills) in input order
+        """
+        from methods import mark_postings, resolve_skills
+
+        metrics = self.metrics
+        size = self.queue_size
+        context = mp.get_context()
+        texts, docs, results = context.Queue(size), context.Queue(size), context.Queue(size)
+        processes = [context.Process(target=_nlp_worker, args=(texts, docs) + self._nlp_args, daemon=True)
+                     for _ in range(self.nlp_workers)]
+        processes += [context.Process(target=_score_worker, args=(docs, results) + self._score_args, daemon=True)
+                      for _ in range(self.score_workers)]
+        raw, decoded = Queue(size), Queue(size)
+        threads = [threading.Thread(target=_read, args=(items, raw, self.read_workers, self.batch_size), daemon=True)]
+        threads += [threading.Thread(target=_decode, args=(raw, decoded, decode), daemon=True)
+                    for _ in range(self.read_workers)]
+        for worker in processes + threads:
+            worker.start()
+
+        # postings are marked in input order by a single mark_postings generator fed batch by batch
+        feed = deque()
+        marker = mark_postings(iter(feed.popleft, END), dedup, skill_cache)
+        buffered, marked, computed = {}, {}, {}
+        next_dispatch = next_write = ends = 0
+        completed = False
+        try:
+            while True:
+                # send the decoded batches to the NLP stage, in order, as long as the window allows
+                while next_dispatch - next_write < size and next_dispatch in buffered:
+                    batch = buffered.pop(next_dispatch)
+                    with metrics.timer('pipeline.mark'):
+                        feed.extend(batch)
+                        marks = [next(marker) for _ in batch]
+                    marked[next_dispatch] = [item for _, item in marks]
+                    # postings with cached or duplicated skills are not parsed (None), empty descriptions are (as in
+                    # the sequential path, Filter.process gives them no skills rather than None)
+                    texts.put((next_dispatch, [None if item[3] is not None or item[4] is not None else text
+                                               for text, item in marks]))
+                    next_dispatch += 1
+                in_flight = next_dispatch - next_write
+
+                if in_flight < size and ends < self.read_workers:
+                    try:
+                        item = decoded.get(block=in_flight == 0)
+                    except Empty:
+                        item = ()
+                    if item is END:
+                        ends += 1
+                        continue
+                    if item:
+                        _check(item)
+                        buffered[item[0]] = item[1]
+                        continue
+                if in_flight == 0:
+                    if ends == self.read_workers and not buffered:
+                        break
+                    continue
+
+                with metrics.timer('pipeline.wait'):
+                    item = _get(results, processes)
+                _check(item)
+                seq, skills, snapshot = item
+                metrics.merge(snapshot)
+                computed[seq] = skills
+                metrics.set('pipeline.in_flight', in_flight)
+                # the graph writer consumes the batches in input order
+                while next_write in computed:
+                    for marked_item, skills in zip(marked.pop(next_write), computed.pop(next_write)):
+                        yield resolve_skills(marked_item, skills, metrics, dedup, skill_cache)
+                    next_write += 1
+            completed = True
+        finally:
+            if completed:
+                for _ in range(self.nlp_workers):
+                    texts.put(END)
+                for _ in range(self.score_workers):
+                    docs.put(END)
+                # every scoring process sends its neighbor cache back before exiting
+                for _ in range(self.score_workers):
+                    item = _get(results, processes)
+                    _check(item)
+                    if self.cache is None:
+                        self.cache = item[1]
+                    else:
+                        self.cache.merge(item[1])
+                for process in processes:
+                    process.join()
+            else:
+                for process in processes:
+                    process.terminate()
+
+def _get(results, processes: list):
+    """Next result, failing instead of waiting forever if a worker process died
+    """
+    while True:
+        try:
+            return results.get(timeout=1.0)
+        except Empty:
+            dead = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError('pipeline worker process died (exit code {})'.format(dead[0]))
+
+def _check(item: tuple):
+    if item[0] == 'error':
+        raise RuntimeError('pipeline stage failed:\n' + item[1])
+
+def _read(items, raw: Queue, n_decoders: int, batch_size: int):
+    """Reader thread: batches of raw postings, numbered in input order
+    """
+    try:
+        batch = []
+        seq = 0
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                raw.put((seq, batch))
+                seq += 1
+                batch = []
+        if batch:
+            raw.put((seq, batch))
+    except Exception:
+        raw.put(('error', traceback.format_exc()))
+    for _ in range(n_decoders):
+        raw.put(END)
+
+def _decode(raw: Queue, decoded: Queue, decode):
+    """Decoder thread: (description, context) of every raw posting of a batch
+    """
+    while True:
+        item = raw.get()
+        if item is END or item[0] == 'error':
+            decoded.put(item)
+            if item is END:
+                return
+            continue
+        seq, batch = item
+        try:
+            decoded.put((seq, [decode(posting) for posting in batch]))
+        except Exception:
+            decoded.put(('error', traceback.format_exc()))
+
+def _nlp_worker(texts, docs, batch_size: int, gazetteer_mode: str, gazetteer_path: str):
+    """NLP process: parse the descriptions of a batch (postings marked as not needing processing are None and stay None)
+    """
+    from methods import Filter, parse_postings
+    from gazetteer import GazetteerDoc
+
+    filter = Filter(None)
+    metrics = Metrics()
+    while True:
+        item = texts.get()
+        if item is END:
+            return
+        seq, batch = item
+        try:
+            parsed = [None] * len(batch)
+            with metrics.timer('parse'):
+                todo = [(text, i) for i, text in enumerate(batch) if text is not None]
+                for doc, i in parse_postings(todo, filter, batch_size=batch_size, gazetteer_mode=gazetteer_mode,
+                                             gazetteer_path=gazetteer_path):
+                    parsed[i] = doc if isinstance(doc, GazetteerDoc) else GazetteerDoc.from_doc(doc)
+            docs.put((seq, parsed, metrics.snapshot()))
+            metrics.reset()
+        except Exception:
+            docs.put(('error', traceback.format_exc(), None))
+
+def _score_worker(docs, results, model_path: str, vectorized: bool, cache_path: str, nprobe: int, mapped: bool,
+                  quantize: str):
+    """Scoring process: Filter.process on the parsed documents of a batch
+    """
+    from methods import load_filter
+
+    metrics = Metrics()
+    try:
+        filter = load_filter(model_path, vectorized=vectorized, cache_path=cache_path, nprobe=nprobe, mapped=mapped,
+                             quantize=quantize, metrics=metrics)
+    except Exception:
+        results.put(('error', traceback.format_exc(), None))
+        return
+    while True:
+        item = docs.get()
+        if item is END:
+            results.put(('cache', filter.cache, None))
+            return
+        if item[0] == 'error':
+            results.put(item)
+            continue
+        seq, parsed, snapshot = item
+        try:
+            skills = [filter.process(doc) if doc is not None else None for doc in parsed]
+            metrics.merge(snapshot)
+            results.put((seq, skills, metrics.snapshot()))
+            metrics.reset()
+        except Exception:
+            results.put(('error', traceback.format_exc(), None))
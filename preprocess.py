@@ -1,38 +1,60 @@
-import spacy
 import re
 import regex
 import string
+import sys
+from collections import Counter
+from functools import lru_cache
+from multiprocessing import Pool
 
-nlp = spacy.load("en_core_web_sm")
-
-def get_entity(docs, words_dict={}):
+def get_entity(docs, words_dict=None):
     """Methods used for keeping record of entity and words
+
+    Arguments:
+        docs {Doc} -- parsed document
+
+    Keyword Arguments:
+        words_dict {dict} -- label -> Counter of entity texts (first seen first) to update (default: {None, new dict})
+
+    Returns:
+        dict -- label -> Counter of entity texts
     """
+    words_dict = {} if words_dict is None else words_dict
     for ent in docs.ents:
-        if ent.label_ in words_dict:
-            value = words_dict[ent.label_]
-            if ent.text not in value:
-                value.append(ent.text)
-                words_dict[ent.label_] = value
-        else:
-            words_dict[ent.label_] = [ent.text]
+        words_dict.setdefault(ent.label_, Counter())[ent.text] += 1
 
     return words_dict
 
-def get_pos(docs, words_dict={}):
+def get_pos(docs, words_dict=None):
     """Method used for keeping record of POS and words
+
+    Arguments:
+        docs {Doc} -- parsed document
+
+    Keyword Arguments:
+        words_dict {dict} -- POS tag -> Counter of words (first seen first) to update (default: {None, new dict})
+
+    Returns:
+        dict -- POS tag -> Counter of words
     """
+    words_dict = {} if words_dict is None else words_dict
     for token in docs:
-        if token.pos_ in words_dict:
-            value = words_dict[token.pos_]
-            if token.text not in value:
-                value.append(token.text)
-                words_dict[token.pos_] = value
-        else:
-            words_dict[token.pos_] = [token.text]
+        words_dict.setdefault(token.pos_, Counter())[token.text] += 1
 
     return words_dict
 
+# characters replaced by a space (besides whitespace, digits and quotes)
+SPACED = "-`\\,/<>+():"
+
+@lru_cache(maxsize=1)
+def _translation_table() -> dict:
+    """Translation table mapping whitespace, decimal digits (as matched by \\s and \\d), quotes and SPACED to a space
+    """
+    table = {ord(c): " " for c in SPACED + "“”’"}
+    for i in range(sys.maxunicode + 1):
+        if chr(i).isspace() or chr(i).isdecimal():
+            table[i] = " "
+    return table
+
 class TextPreprocessor:
     """Helps tokenization select out the right words. Ref https://fasttext.cc/docs/en/supervised-tutorial.html
     """
@@ -46,8 +68,46 @@ class TextPreprocessor:
         self.normalizeDashesRegex = regex.compile("\p{Pd}");  # replace weird unicode dashes with the standard one
         self.filter = ''.join([chr(i) for i in range(1, 32)])
         self.cleanr = re.compile('<.*?>|&([a-z0-9]+|[0-9]{1,6}|#x[0-9a-f]{1,6});')
-        
+
+        # compiled cleaner: same output as pre_process_reference in two passes (one regex, one translation table)
+        self.translation = _translation_table()
+        # '..' followed by whitespace/quote, '.' followed by anything that becomes a space, "â€'" and "'s"
+        self.combinedRegex = re.compile("\\.\\.(?=[\\s“”’])|\\.(?=\\.\\.[\\s“”’]|[\\s\\d“”’" + re.escape(SPACED) + "]|â€'|'s)|â€'|'s")
+
     def pre_process(self, text):
+        """Normalize a description: lowercase, replace punctuation, digits and quotes by spaces, normalize whitespace.
+        Produces exactly the output of pre_process_reference.
+        """
+        if text == "" or text is None:
+            return text
+        cleaned_text = self.combinedRegex.sub(" ", text.lower())
+        cleaned_text = " ".join(cleaned_text.translate(self.translation).split())
+        return cleaned_text.rstrip(string.punctuation)
+
+    def pre_process_many(self, texts, n_process=1, chunksize=256):
+        """Normalize many descriptions, optionally over a pool of processes
+        
+        Arguments:
+            texts {iterable} -- descriptions
+        
+        Keyword Arguments:
+            n_process {int} -- number of processes (default: {1})
+            chunksize {int} -- number of descriptions sent to a process at once (default: {256})
+        
+        Returns:
+            generator -- normalized descriptions in input order
+        """
+        if n_process > 1:
+            with Pool(n_process) as pool:
+                for text in pool.imap(self.pre_process, texts, chunksize=chunksize):
+                    yield text
+        else:
+            for text in texts:
+                yield self.pre_process(text)
+
+    def pre_process_reference(self, text):
+        """Reference (multi-pass) implementation of pre_process, kept to verify the compiled one
+        """
         if text == "" or text is None:
             return text
         cleaned_text = text.lower()
@@ -76,4 +136,20 @@ class TextPreprocessor:
         cleaned_text = self.whitespaceRegex.sub(" ", cleaned_text)
         cleaned_text=cleaned_text.strip()
         cleaned_text=cleaned_text.rstrip(string.punctuation)
-        return cleaned_text
\ No newline at end of file
+        return cleaned_text
+
+
+if __name__ == "__main__":
+    # Golden output check: the compiled cleaner must give byte-identical output to the reference implementation.
+    # python preprocess.py [path to JSON file] (defaults to the sample data in data/README.MD)
+    import json
+    import os
+
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'README.MD')
+    with open(path) as f:
+        descriptions = [json.loads(line)['description'] for line in f if line.startswith('{')]
+
+    cleaner = TextPreprocessor()
+    mismatches = [text for text in descriptions if cleaner.pre_process(text) != cleaner.pre_process_reference(text)]
+    print('{} descriptions, {} mismatches'.format(len(descriptions), len(mismatches)))
+    assert not mismatches
@@ -0,0 +1,215 @@
+from csr_graph import CSRGraph, load_graph
+from neighbors import NeighborIndex
+import numpy as np
+import argparse
+import json
+import zlib
+import sys
+import os
+
+
+class Projection():
+    """Materialized skill -> skill and title -> title projections of the bipartite graph: the top N next neighbors of
+    every node with their aggregated two-hop scores (as NeighborIndex.next_neighbors), computed offline with sparse
+    matrix products. The table is a CSRGraph over the nodes of the graph whose rows hold the top N neighbors sorted by
+    decreasing score (directed), so a "related skills/titles" query is a slice of a memory-mapped array.
+    Rows can be refreshed for the nodes touched by edges added to the graph since the projection was built.
+    """
+
+    def __init__(self, table: CSRGraph, number: int, log_size=0, log_crc=0):
+        """
+        Arguments:
+            table {CSRGraph} -- top N table
+            number {int} -- N, number of neighbors kept per node
+
+        Keyword Arguments:
+            log_size {int} -- size of the checkpoint log of the graph the projection is up to date with (default: {0})
+            log_crc {int} -- checksum of the log up to log_size (detects a restarted log) (default: {0})
+        """
+        self.table = table
+        self.number = number
+        self.log_size = log_size
+        self.log_crc = log_crc
+
+    @classmethod
+    def build(cls, graph, number=50, batch_size=1024, log_size=0, log_crc=0):
+        """Project a graph
+
+        Arguments:
+            graph {Graph or CSRGraph} -- bipartite graph
+
+        Keyword Arguments:
+            number {int} -- number of neighbors kept per node (default: {50})
+            batch_size {int} -- number of nodes scored per matrix product (default: {1024})
+            log_size {int} -- size of the checkpoint log the graph was built from (default: {0})
+            log_crc {int} -- checksum of the log up to log_size (default: {0})
+
+        Returns:
+            Projection -- projection
+        """
+        graph = graph if isinstance(graph, CSRGraph) else CSRGraph.from_graph(graph)
+        index = NeighborIndex.from_graph(graph)
+        rows = index.next_scores(np.arange(len(graph)), number, batch_size=batch_size)
+        return cls(_table(graph, rows), number, log_size=log_size, log_crc=log_crc)
+
+    def refresh(self, graph, edges: list, batch_size=1024, log_size=None, log_crc=None) -> 'Projection':
+        """Update the projection for edges added to (or whose weight increased in) the graph: only the rows of the
+        nodes whose two-hop scores changed are recomputed, the endpoints of the edges and their neighbors
+
+        Arguments:
+            graph {Graph or CSRGraph} -- updated graph (a superset of the projected one)
+            edges {list} -- (node1, node2) of the updated edges
+
+        Keyword Arguments:
+            batch_size {int} -- number of nodes scored per matrix product (default: {1024})
+            log_size {int} -- size of the checkpoint log the updated graph was built from (default: {unchanged})
+            log_crc {int} -- checksum of the log up to log_size (default: {unchanged})
+
+        Returns:
+            Projection -- updated projection (over the nodes of the updated graph)
+        """
+        graph = graph if isinstance(graph, CSRGraph) else CSRGraph.from_graph(graph)
+        index = NeighborIndex.from_graph(graph)
+        touched = set()
+        for node1, node2 in edges:
+            for node in (node1, node2):
+                touched.add(node)
+                touched.update(graph.nearest_neighbor(node, len(graph)) or [])
+        touched = np.unique(index.ids(sorted(touched)))
+        touched = touched[touched >= 0]
+
+        # rows of the untouched nodes are copied, with their ids translated into the ids of the updated graph
+        old = self.table
+        old_ids = index.ids([old.name(i) for i in range(len(old))])
+        new_ids = np.full(len(graph), -1, dtype=np.int64)
+        new_ids[old_ids[old_ids >= 0]] = np.flatnonzero(old_ids >= 0)
+        adjacency = old.adjacency()
+        rows = []
+        for i in range(len(graph)):
+            j = new_ids[i]
+            if j < 0:
+                rows.append((np.zeros(0, dtype=np.int64), np.zeros(0)))
+            else:
+                start, end = adjacency.indptr[j], adjacency.indptr[j + 1]
+                rows.append((old_ids[adjacency.indices[start:end]], adjacency.data[start:end]))
+        for i, row in zip(touched, index.next_scores(touched, self.number, batch_size=batch_size)):
+            rows[i] = row
+
+        print('PROJECTION: {} of {} rows refreshed'.format(len(touched), len(graph)))
+        return Projection(_table(graph, rows), self.number, log_size=self.log_size if log_size is None else log_size,
+                          log_crc=self.log_crc if log_crc is None else log_crc)
+
+    def lookup(self, node: str, number: int) -> list:
+        """Related nodes of a node (same type): a slice of the table
+
+        Arguments:
+            node {str} -- name of the node
+            number {int} -- number of nodes to return
+
+        Returns:
+            list -- list of nodes (empty if none), None if more than N nodes are asked, KeyError if the node does not exist
+        """
+        if number > self.number:
+            return None
+        return self.table.nearest_neighbor(node, number) or []
+
+    def save(self, path: str):
+        """Save the projection as a CSR graph directory, written aside and swapped in atomically (see replace_dir): a
+        service refreshing its projection sees the old one or the new one
+        """
+        from atomic import temp_path, replace_dir
+
+        temp = temp_path(path)
+        self.table.write(temp)
+        with open(os.path.join(temp, 'projection.json'), 'w') as f:
+            json.dump({'number': self.number, 'log_size': self.log_size, 'log_crc': self.log_crc}, f)
+        replace_dir(temp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Memory-map a projection saved by save
+        """
+        # every file is read from the version the path points to when loading starts
+        path = os.path.realpath(path)
+        with open(os.path.join(path, 'projection.json')) as f:
+            meta = json.load(f)
+        return cls(CSRGraph.load(path), meta['number'], log_size=meta['log_size'], log_crc=meta['log_crc'])
+
+def _table(graph: CSRGraph, rows: list) -> CSRGraph:
+    """CSRGraph over the nodes of a graph from (neighbor ids, scores) rows sorted by decreasing score
+    """
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(neighbors) for neighbors, _ in rows])
+    indices = np.concatenate([neighbors for neighbors, _ in rows] + [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+    weights = np.concatenate([scores for _, scores in rows] + [np.zeros(0)]).astype(np.float64)
+    return graph.with_adjacency(indptr, indices, weights)
+
+def update_projection(graph_path: str, projection_path: str, number=50, batch_size=1024, log_path=None, refresh=False):
+    """Build the projection of a graph or, with refresh, update an existing projection from the edges committed to the
+    checkpoint log of the graph since it was built (rebuilt if the log was restarted since)
+
+    Arguments:
+        graph_path {str} -- path to graph (pickled graph or CSR graph directory)
+        projection_path {str} -- path to the projection directory
+
+    Keyword Arguments:
+        number {int} -- number of neighbors kept per node (default: {50})
+        batch_size {int} -- number of nodes scored per matrix product (default: {1024})
+        log_path {str} -- checkpoint log of the graph (default: {graph_path + '.log'})
+        refresh {bool} -- refresh the rows touched since the last update instead of rebuilding (default: {False})
+
+    Returns:
+        Projection -- projection
+    """
+    from checkpoint import CheckpointLog
+
+    log_path = log_path or graph_path + '.log'
+    graph = load_graph(graph_path)
+    projection = Projection.load(projection_path) if refresh and os.path.exists(projection_path) else None
+    # the log must still start with the part the projection was built from
+    if projection is not None and os.path.exists(log_path) and projection.number == number and \
+            os.path.getsize(log_path) >= projection.log_size and \
+            _log_crc(log_path, projection.log_size) == projection.log_crc:
+        edges, log_size = CheckpointLog.changes(log_path, projection.log_size)
+        projection = projection.refresh(graph, edges, batch_size=batch_size, log_size=log_size,
+                                        log_crc=_log_crc(log_path, log_size))
+    else:
+        log_size = CheckpointLog.changes(log_path)[1] if os.path.exists(log_path) else 0
+        projection = Projection.build(graph, number, batch_size=batch_size, log_size=log_size,
+                                      log_crc=_log_crc(log_path, log_size) if log_size else 0)
+
+    # written next to the old projection, which may still be memory-mapped, then swapped in
+    projection.save(projection_path)
+    return projection
+
+def _log_crc(path: str, size: int) -> int:
+    crc = 0
+    with open(path, 'rb') as f:
+        while size > 0:
+            chunk = f.read(min(size, 1 << 20))
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size -= len(chunk)
+    return crc
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--graphpath', type=str, help='Enter trained path (pickled graph or CSR graph directory):')
+    parser.add_argument('--projectionpath', type=str, help='Enter path of the projection directory')
+    parser.add_argument('--n', type=int, help='Number of related skills/titles kept per node', default=50)
+    parser.add_argument('--batch_size', type=int, help='Number of nodes scored per matrix product', default=1024)
+    parser.add_argument('--logpath', type=str, help='Checkpoint log of the graph (default: <graphpath>.log)')
+    parser.add_argument('--refresh', action='store_true', help='Only recompute the rows touched by the edges logged since the last update')
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE:
+    # python projection.py --graphpath /media/druv022/Data2/Challenge/data/graph_temp.pkl --projectionpath /media/druv022/Data2/Challenge/data/graph_temp.proj --n 50
+    args = parse_arguments(sys.argv[1:])
+    projection = update_projection(args.graphpath, args.projectionpath, number=args.n, batch_size=args.batch_size,
+                                   log_path=args.logpath, refresh=args.refresh)
+    print('Top {} table of {} nodes saved at: {}'.format(projection.number, len(projection.table), args.projectionpath))
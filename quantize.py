@@ -0,0 +1,279 @@
+import numpy as np
+from scoring import top_k
+from cache import model_tag
+from time import time
+import argparse
+import json
+import os
+import sys
+
+DTYPES = ('float16', 'int8')
+
+
+def quantized_path(model_path: str, dtype: str) -> str:
+    """Directory of a quantized store next to a model file (models/fasttext_model.bin -> models/fasttext_model.int8)
+
+    Arguments:
+        model_path {str} -- path to the model file
+        dtype {str} -- 'float16' or 'int8'
+    """
+    return os.path.splitext(model_path)[0] + '.' + dtype
+
+class QuantizedVectors():
+    """Normalized vocabulary matrix stored in float16 (2 bytes per value) or int8 with one float32 scale per row
+    (1 byte per value, row = scale * codes), so neighbor scans read 2 or 4 times less memory than with float32.
+    Scores are computed block by block: a block of rows is widened to float32 (small enough to stay in cache) and
+    multiplied with the float32 queries; int8 scales are applied to the scores instead of the rows.
+    """
+
+    def __init__(self, codes, scales=None, block_size=1024):
+        """
+        Arguments:
+            codes {np.ndarray} -- quantized rows (float16 or int8)
+
+        Keyword Arguments:
+            scales {np.ndarray} -- scale of every row (int8 only) (default: {None})
+            block_size {int} -- number of rows widened to float32 at once (default: {1024})
+        """
+        self.codes = codes
+        self.scales = scales
+        self.block_size = block_size
+
+    @classmethod
+    def quantize(cls, vectors, dtype='int8'):
+        """Quantize a normalized vocabulary matrix
+
+        Arguments:
+            vectors {np.ndarray} -- normalized vocabulary matrix
+
+        Keyword Arguments:
+            dtype {str} -- 'float16' or 'int8' (default: {'int8'})
+
+        Returns:
+            QuantizedVectors -- quantized vectors
+        """
+        if dtype not in DTYPES:
+            raise ValueError('unknown quantization {}, expected one of {}'.format(dtype, DTYPES))
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if dtype == 'float16':
+            return cls(vectors.astype(np.float16))
+        # symmetric per row scaling: the largest absolute value of a row maps to 127
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return cls(codes, scales.astype(np.float32))
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, ids):
+        """Dequantized rows (float32)
+
+        Arguments:
+            ids {np.ndarray} -- row ids
+
+        Returns:
+            np.ndarray -- matrix of rows
+        """
+        rows = self.codes[ids].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[ids][:, None]
+        return rows
+
+    def dot(self, queries):
+        """Dot products of float32 queries with every row, as queries @ vectors.T
+
+        Arguments:
+            queries {np.ndarray} -- matrix of query vectors
+
+        Returns:
+            np.ndarray -- scores (queries x rows, float32)
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for begin in range(0, len(self), self.block_size):
+            end = begin + self.block_size
+            scores[:, begin:end] = queries @ self.codes[begin:end].astype(np.float32).T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def save(self, path: str, tag=''):
+        """Save the store as a directory: codes.npy, scales.npy (int8) and meta.json, written aside and swapped in
+        atomically (see replace_dir): other processes loading the store see the old one or the new one
+
+        Arguments:
+            path {str} -- path to the directory
+
+        Keyword Arguments:
+            tag {str} -- identifies the model the vectors were quantized from (see model_tag) (default: {''})
+        """
+        from atomic import temp_path, replace_dir
+
+        temp = temp_path(path)
+        self.write(temp, tag=tag)
+        replace_dir(temp, path)
+
+    def write(self, path: str, tag=''):
+        """Write the files of the store into a (new or existing) directory, in place
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'codes.npy'), self.codes)
+        if self.scales is not None:
+            np.save(os.path.join(path, 'scales.npy'), self.scales)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'model': tag, 'dtype': self.dtype, 'shape': list(self.codes.shape)}, f)
+
+    @classmethod
+    def load(cls, path: str, block_size=1024):
+        """Memory-map a store saved by save (read only)
+        """
+        # every file is read from the version the path points to when loading starts
+        path = os.path.realpath(path)
+        codes = np.load(os.path.join(path, 'codes.npy'), mmap_mode='r')
+        scales_path = os.path.join(path, 'scales.npy')
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        return cls(codes, scales, block_size=block_size)
+
+def load_quantized(model_path: str, vectors, dtype='int8') -> QuantizedVectors:
+    """Load the quantized store next to the model, building (and saving) it first if it does not exist or was built
+    from another model file (its model_tag is stored in meta.json) or another vocabulary
+
+    Arguments:
+        model_path {str} -- path to the model file
+        vectors {np.ndarray} -- normalized vocabulary matrix of the model
+
+    Keyword Arguments:
+        dtype {str} -- 'float16' or 'int8' (default: {'int8'})
+
+    Returns:
+        QuantizedVectors -- quantized vectors
+    """
+    path = quantized_path(model_path, dtype)
+    tag = model_tag(model_path)
+    # the meta file and the arrays are read from the same version of the store
+    real_path = os.path.realpath(path)
+    meta_path = os.path.join(real_path, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('model') == tag and meta.get('dtype') == dtype and meta.get('shape') == list(vectors.shape):
+            quantized = QuantizedVectors.load(real_path)
+            if quantized.dtype == dtype and quantized.codes.shape == vectors.shape:
+                return quantized
+
+    quantized = QuantizedVectors.quantize(vectors, dtype)
+    quantized.save(path, tag=tag)
+    print('Quantized vectors saved at: ', path)
+    return quantized
+
+def neighbor_report(vectors, quantized: QuantizedVectors, n_queries=1000, topn=10, seed=0) -> dict:
+    """Compare the neighbors found with the quantized vectors with the float32 ones on random vocabulary words
+
+    Arguments:
+        vectors {np.ndarray} -- normalized vocabulary matrix
+        quantized {QuantizedVectors} -- quantized vectors
+
+    Keyword Arguments:
+        n_queries {int} -- number of query words (default: {1000})
+        topn {int} -- number of neighbors (default: {10})
+        seed {int} -- random seed (default: {0})
+
+    Returns:
+        dict -- recall@topn, mean latency per query (ms) of both scans and memory of both matrices (MB)
+    """
+    rng = np.random.RandomState(seed)
+    queries = np.asarray(vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)], dtype=np.float32)
+
+    start = time()
+    exact = [set(row) for row in top_k(queries @ vectors.T, topn)]
+    exact_ms = (time() - start) * 1000 / len(queries)
+    start = time()
+    found = top_k(quantized.dot(queries), topn)
+    quantized_ms = (time() - start) * 1000 / len(queries)
+
+    recall = np.mean([len(truth.intersection(ids)) / len(truth) for truth, ids in zip(exact, found)])
+    return {'dtype': quantized.dtype, 'recall': float(recall), 'exact_ms': exact_ms, 'quantized_ms': quantized_ms,
+            'float32_mb': vectors.nbytes / 2**20, 'quantized_mb': quantized.nbytes / 2**20}
+
+def skill_report(docs: list, keyed_vectors, quantized: QuantizedVectors, topk=10) -> dict:
+    """How much the skills extracted by Filter change when scoring with the quantized vectors instead of float32
+
+    Arguments:
+        docs {list} -- parsed descriptions (spacy Doc or GazetteerDoc)
+        keyed_vectors {KeyedVectors} -- word vectors (model.wv or MappedVectors)
+        quantized {QuantizedVectors} -- quantized vectors
+
+    Keyword Arguments:
+        topk {int} -- number of skills per document (default: {10})
+
+    Returns:
+        dict -- share of documents with the same skill list (same order), mean overlap of the top k skills and docs/sec
+    """
+    from methods import Filter
+    from scoring import VectorScorer
+
+    results = {}
+    for name, store in [('float32', None), (quantized.dtype, quantized)]:
+        filter = Filter(keyed_vectors, topk=topk, scorer=VectorScorer(keyed_vectors, quantized=store))
+        start = time()
+        results[name] = [[skill for skill, _ in filter.process(doc)] for doc in docs]
+        results[name + '_docs_per_sec'] = len(docs) / (time() - start)
+
+    reference, other = results['float32'], results[quantized.dtype]
+    overlap = [len(set(a) & set(b)) / len(a) for a, b in zip(reference, other) if a]
+    return {'dtype': quantized.dtype, 'docs': len(docs),
+            'identical': float(np.mean([a == b for a, b in zip(reference, other)])) if docs else None,
+            'overlap': float(np.mean(overlap)) if overlap else None,
+            'float32_docs_per_sec': results['float32_docs_per_sec'],
+            'quantized_docs_per_sec': results[quantized.dtype + '_docs_per_sec']}
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--modelpath', type=str, help='Enter path of pre-trained word embedding model in gensim keywordvector format')
+    parser.add_argument('--filepath', type=str, help='JSON file of postings for the skill list report (neighbors only if not given)')
+    parser.add_argument('--n_docs', type=int, help='Number of postings of the skill list report', default=500)
+    parser.add_argument('--n_queries', type=int, help='Number of query words for the neighbor report', default=1000)
+    parser.add_argument('--topn', type=int, help='Number of neighbors per query', default=10)
+    parser.add_argument('--mapped', action='store_true', help='Use the memory-mapped export of the model (see vectors.py)')
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE (builds the float16 and int8 stores next to the model if needed and prints the reports):
+    # python quantize.py --modelpath /media/druv022/Data2/Challenge/models/fasttext_model.bin --filepath /media/druv022/Data2/Challenge/data/job_descriptions.json/all_en_descriptions.json
+    args = parse_arguments(sys.argv[1:])
+    if args.mapped:
+        from vectors import load_vectors
+        keyed_vectors = load_vectors(args.modelpath)
+    else:
+        from gensim.models.wrappers import FastText
+        keyed_vectors = FastText.load_fasttext_format(args.modelpath).wv
+    keyed_vectors.init_sims()
+
+    docs = None
+    if args.filepath:
+        from methods import parse, parse_posting
+        from read import read
+        from itertools import islice
+        docs = list(parse(parse_posting(line)[1] for line in islice(read(args.filepath), args.n_docs)))
+
+    for dtype in DTYPES:
+        quantized = load_quantized(args.modelpath, keyed_vectors.vectors_norm, dtype)
+        print('{dtype:<8} recall@{topn}: {recall:.3f}  float32: {exact_ms:.2f} ms  quantized: {quantized_ms:.2f} ms  '
+              'memory: {float32_mb:.1f} -> {quantized_mb:.1f} MB'.format(
+                  topn=args.topn, **neighbor_report(keyed_vectors.vectors_norm, quantized, args.n_queries, args.topn)))
+        if docs is not None:
+            print('{dtype:<8} identical skill lists: {identical:.3f}  top k overlap: {overlap:.3f}  '
+                  'docs/sec: {float32_docs_per_sec:.1f} -> {quantized_docs_per_sec:.1f}'.format(
+                      **skill_report(docs, keyed_vectors, quantized)))
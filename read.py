@@ -1,38 +1,171 @@
 import json
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.stem import WordNetLemmatizer, PorterStemmer
 from  preprocess import TextPreprocessor
 import pickle
+import bz2
+import gzip
+import io
+import os
 
-stop_words = set(stopwords.words('english'))
+# use a faster JSON decoder when one is installed
+try:
+    import orjson as fast_json
+except ImportError:
+    try:
+        import ujson as fast_json
+    except ImportError:
+        fast_json = json
+
+BUFFER_SIZE = 1 << 20
+COMPRESSED = ('.gz', '.bz2', '.zst')
+
+def loads(line):
+    """Decode one JSON line (str or bytes) with the fastest available decoder, falling back to the json module for
+    the lines it rejects (orjson refuses lone surrogates such as "\\ud800", which json accepts)
+    """
+    try:
+        return fast_json.loads(line)
+    except ValueError:
+        if fast_json is json:
+            raise
+        return json.loads(line)
+
+def open_file(file_path: str):
+    """Open a (possibly compressed: .gz, .bz2, .zst) file for buffered binary reading
+    
+    Arguments:
+        file_path {str} -- path to the file
+    
+    Returns:
+        file -- binary file object of the uncompressed content
+    """
+    if file_path.endswith('.gz'):
+        return io.BufferedReader(gzip.open(file_path, 'rb'), BUFFER_SIZE)
+    if file_path.endswith('.bz2'):
+        return io.BufferedReader(bz2.open(file_path, 'rb'), BUFFER_SIZE)
+    if file_path.endswith('.zst'):
+        import zstandard
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb')), BUFFER_SIZE)
+    return open(file_path, 'rb', buffering=BUFFER_SIZE)
 
 def read(file_path: str):
-    """Generator function to read JSON file
+    """Generator function to read JSON file (one line at a time, compressed files are decompressed on the fly)
+    
+    Arguments:
+        file_path {str} -- path to JSON file
+    """
+    with open_file(file_path) as f:
+        for line in f:
+            yield(line.decode('utf-8'))
+
+def read_json(file_path: str):
+    """Generator function to read the records of a JSON file
+    
+    Arguments:
+        file_path {str} -- path to JSON file
+    """
+    with open_file(file_path) as f:
+        for line in f:
+            yield(loads(line))
+
+def split_ranges(file_path: str, n: int) -> list:
+    """Split a file into (at most) n byte ranges aligned to line boundaries
     
     Arguments:
         file_path {str} -- path to JSON file
+        n {int} -- number of ranges
+    
+    Returns:
+        list -- list of (start, end) byte offsets covering the whole file
+    """
+    if file_path.endswith(COMPRESSED):
+        raise ValueError('Byte ranges require an uncompressed file: {}'.format(file_path))
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, 'rb') as f:
+        for k in range(1, n):
+            pos = max(size * k // n, 1)
+            # move to the start of the next line
+            f.seek(pos - 1)
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
+
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+def read_offsets(file_path: str, start=0, end=None):
+    """Generator function to read the lines of a JSON file starting within the byte range [start, end) along with
+    the byte offset right after each line (where reading can be resumed). Offsets of compressed files refer to the
+    uncompressed content (seeking into them means decompressing up to the offset).
+    
+    Arguments:
+        file_path {str} -- path to JSON file
+    
+    Keyword Arguments:
+        start {int} -- byte offset of the first line (default: {0})
+        end {int} -- byte offset after which no line is started (default: {None, end of file})
+    """
+    with open_file(file_path) as f:
+        if start:
+            _skip(f, start)
+        pos = start
+        while end is None or pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield(line.decode('utf-8'), pos)
+
+def _skip(f, offset: int):
+    """Move a file object to an offset, reading forward if the stream is not seekable (zstd)
     """
-    with open(file_path, 'r') as f:
-        for i in f.readlines():
-            yield(i)
+    if f.seekable():
+        f.seek(offset)
+        return
+    while offset > 0:
+        chunk = f.read(min(offset, BUFFER_SIZE))
+        if not chunk:
+            break
+        offset -= len(chunk)
 
-def get_desc(file_path):
+def read_range(file_path: str, start: int, end: int):
+    """Generator function to read the lines of a JSON file starting within the byte range [start, end)
+    
+    Arguments:
+        file_path {str} -- path to JSON file
+        start {int} -- byte offset of the first line
+        end {int} -- byte offset after which no line is started
+    """
+    for line, _ in read_offsets(file_path, start, end):
+        yield(line)
+
+def get_desc(file_path, store_path=None):
     """Generator function to return 'description' from JSON file
     
     Arguments:
         file_path {[type]} -- path to JSON file
+    
+    Keyword Arguments:
+        store_path {str} -- read the cleaned descriptions from this corpus store (updated from the JSON file first) (default: {None})
     """
-    cleaner = TextPreprocessor()
-    with open(file_path, 'r') as f:
-        for i in f.readlines():
-            j_data = json.loads(i)
-            text = cleaner.pre_process(j_data['description'])
-            word_tokens = [word_tokenize(i) for i in sent_tokenize(text)]
-            for sent in word_tokens:
-                filtered_sent = sent
-                # [filtered_sent.append(i) for i in sent if i not in stop_words]
-                yield(filtered_sent)
+    # nltk is only needed here, import it lazily
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize, sent_tokenize
+
+    stop_words = set(stopwords.words('english'))
+    if store_path:
+        from corpus import CorpusStore
+        store = CorpusStore(store_path)
+        store.update(file_path)
+        texts = store.clean_texts()
+    else:
+        cleaner = TextPreprocessor()
+        texts = (cleaner.pre_process(loads(i)['description']) for i in read(file_path))
+    for text in texts:
+        word_tokens = [word_tokenize(i) for i in sent_tokenize(text)]
+        for sent in word_tokens:
+            filtered_sent = sent
+            # [filtered_sent.append(i) for i in sent if i not in stop_words]
+            yield(filtered_sent)
 
 def get_docs(file_path):
     """ return document dump for temporary usage. DO NOT USE!
@@ -47,7 +180,7 @@ if __name__ == '__main__':
     # data = read('/media/druv022/Data2/Challenge/data/job_descriptions.json/all_en_descriptions.json')
 
     for i, item in enumerate(data):
-        j_data = json.loads(item)
+        j_data = loads(item)
         print(j_data['company'])
 
         if i == 100:
@@ -0,0 +1,165 @@
+import numpy as np
+
+
+def unitvec(matrix):
+    """Scale the rows of a matrix (or a vector) to unit length, leaving zero rows untouched
+
+    Arguments:
+        matrix {np.ndarray} -- vector or matrix
+
+    Returns:
+        np.ndarray -- normalized vector or matrix (float32)
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norm = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norm[norm == 0] = 1
+    return matrix / norm
+
+def top_k(dists, k: int):
+    """Indices of the k largest values of every row, sorted by decreasing value (argpartition followed by a small sort)
+
+    Arguments:
+        dists {np.ndarray} -- 2D array of scores
+        k {int} -- number of indices to keep per row
+
+    Returns:
+        np.ndarray -- 2D array of indices
+    """
+    k = min(k, dists.shape[1])
+    if k < dists.shape[1]:
+        best = np.argpartition(-dists, k - 1, axis=1)[:, :k]
+    else:
+        best = np.tile(np.arange(dists.shape[1]), (dists.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(dists, best, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1)
+
+class VectorScorer():
+    """Vectorized replacement for the per word most_similar/similarity calls of Filter.
+    All candidate words of a document are gathered in one matrix: neighbors are found with a single matrix product against
+    the pre-normalized vocabulary matrix and the candidate scores are computed with array operations.
+    Results are the same as gensim's KeyedVectors.most_similar/similarity (up to float tolerance).
+    """
+
+    def __init__(self, keyed_vectors, batch_size=32, index=None, quantized=None):
+        """
+        Arguments:
+            keyed_vectors {KeyedVectors} -- gensim keyed vectors (model.wv)
+
+        Keyword Arguments:
+            batch_size {int} -- number of query words multiplied with the vocabulary matrix at once (bounds memory) (default: {32})
+            index {IVFIndex} -- approximate nearest neighbor index used instead of the exact search (default: {None})
+            quantized {QuantizedVectors} -- float16/int8 copy of the vocabulary matrix used for the scans and the vectors of known words (default: {None})
+        """
+        keyed_vectors.init_sims()
+        self._kv = keyed_vectors
+        self._vectors = keyed_vectors.vectors_norm
+        self._vocab = keyed_vectors.vocab
+        self._index2word = keyed_vectors.index2word
+        self.batch_size = batch_size
+        self.index = index
+        self.quantized = quantized
+
+    def query_vectors(self, words: list, use_norm=True):
+        """Gather the unit vectors of the words in a matrix. Out of vocabulary words are composed from their n-grams (fastText),
+        words without any known n-gram are marked as missing.
+
+        Arguments:
+            words {list} -- list of words
+
+        Keyword Arguments:
+            use_norm {bool} -- compose vectors from normalized (most_similar) or raw (similarity) vectors (default: {True})
+
+        Returns:
+            tuple -- (matrix of unit vectors, boolean mask of found words)
+        """
+        matrix = np.zeros((len(words), self._vectors.shape[1]), dtype=np.float32)
+        found = np.zeros(len(words), dtype=bool)
+        for i, word in enumerate(words):
+            try:
+                if self.quantized is not None and word in self._vocab:
+                    matrix[i] = self.quantized.rows([self._vocab[word].index])[0]
+                    found[i] = True
+                    continue
+                matrix[i] = self._kv.word_vec(word, use_norm=use_norm)
+                found[i] = True
+            except KeyError:
+                pass
+        return unitvec(matrix), found
+
+    def neighbors(self, matrix, exclude, topn: int) -> list:
+        """Find the topn nearest vocabulary words of every (unit) query vector
+
+        Arguments:
+            matrix {np.ndarray} -- matrix of query unit vectors
+            exclude {list} -- vocabulary index to exclude for each query (or None)
+            topn {int} -- number of neighbors
+
+        Returns:
+            list -- list of [(word, similarity)] for every query
+        """
+        result = []
+        if self.index is not None:
+            for (indices, dists), skip in zip(self.index.search(matrix, topn + 1), exclude):
+                result.append([(self._index2word[idx], float(dist)) for idx, dist in zip(indices, dists) if idx != skip][:topn])
+            return result
+
+        for begin in range(0, matrix.shape[0], self.batch_size):
+            batch = matrix[begin:begin + self.batch_size]
+            dists = self.quantized.dot(batch) if self.quantized is not None else batch @ self._vectors.T
+            best = top_k(dists, topn + 1)
+            for row, indices in enumerate(best):
+                skip = exclude[begin + row]
+                result.append([(self._index2word[idx], float(dists[row, idx])) for idx in indices if idx != skip][:topn])
+        return result
+
+    def most_similar(self, words: list, topn: int) -> list:
+        """Bulk equivalent of [model.most_similar(word, topn=topn) for word in words]
+
+        Arguments:
+            words {list} -- list of words
+            topn {int} -- number of neighbors per word
+
+        Returns:
+            list -- list of [(word, similarity)] for every word or None if the word is unknown
+        """
+        unique = list(dict.fromkeys(words))
+        matrix, found = self.query_vectors(unique)
+        known = [word for word, flag in zip(unique, found) if flag]
+        exclude = [self._vocab[word].index if word in self._vocab else None for word in known]
+        lookup = dict(zip(known, self.neighbors(matrix[found], exclude, topn)))
+
+        return [lookup.get(word) for word in words]
+
+    def candidate_scores(self, candidates: list, top_words: list) -> list:
+        """Score candidates against the top words: sum of similarities for single words, averaged over the words of a
+        multiword candidate (unknown words count as 0). As in Filter, single word candidates unknown to the model get no score (None).
+
+        Arguments:
+            candidates {list} -- list of candidate strings
+            top_words {list} -- list of words
+
+        Returns:
+            list -- score of every candidate (None for unknown single words)
+        """
+        split = [words.split() for words in candidates]
+        # single word candidates are looked up as is, multiword candidates word by word
+        tokens = [[word.lower() for word in words] if len(words) > 1 else [item.lower()] for item, words in zip(candidates, split)]
+        owner = np.repeat(np.arange(len(tokens)), [len(words) for words in tokens])
+        unique = list(dict.fromkeys(word for words in tokens for word in words))
+        position = {word: i for i, word in enumerate(unique)}
+
+        matrix, found = self.query_vectors(unique, use_norm=False)
+        top, _ = self.query_vectors(top_words, use_norm=False)
+        sums = (matrix @ top.T).sum(axis=1) if len(top_words) else np.zeros(len(unique), dtype=np.float32)
+        if len(top_words) == 0:
+            # nothing is looked up when there is nothing to compare with
+            found[:] = True
+
+        index = np.array([position[word] for words in tokens for word in words], dtype=np.int64)
+        token_scores = np.where(found[index], sums[index], 0)
+        totals = np.bincount(owner, weights=token_scores, minlength=len(tokens))
+        lengths = np.array([max(len(words), 1) for words in split])
+        single_known = np.array([len(words) > 1 or bool(found[position[words[0]]]) for words in tokens], dtype=bool)
+
+        scores = totals / lengths
+        return [float(score) if keep else None for score, keep in zip(scores, single_known)]
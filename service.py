@@ -0,0 +1,226 @@
+from csr_graph import load_graph
+from cache import NeighborCache
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from time import perf_counter
+import asyncio
+import argparse
+import json
+import sys
+import os
+
+
+class QueryService():
+    """Long running query service: the graph is loaded once and nearest_neighbor/next_neighbor requests are answered from
+    memory (with an LRU result cache). The graph is reloaded when its file changes.
+
+    HTTP endpoints (GET parameters or JSON body):
+        /nearest?name=ASP.NET&n=5           -- nearest neighbors (skill -> titles, title -> skills)
+        /next?name=ASP.NET&n=5              -- next neighbors (skill -> skills, title -> titles)
+        /batch  {"queries": [{"name": ..., "n": 5, "next": false}, ...]}
+        /stats                              -- request count, p50/p99 latency, cache hit rate
+    """
+
+    def __init__(self, graph_path: str, cache_size=100000, reload_interval=5.0, window=10000):
+        """
+        Arguments:
+            graph_path {str} -- path to graph (pickled graph or CSR graph directory)
+
+        Keyword Arguments:
+            cache_size {int} -- maximum number of cached results (default: {100000})
+            reload_interval {float} -- seconds between checks of the graph file (default: {5.0})
+            window {int} -- number of recent requests used for the latency percentiles (default: {10000})
+        """
+        self._graph_path = graph_path
+        self._cache_size = cache_size
+        self._reload_interval = reload_interval
+        self._latencies = deque(maxlen=window)
+        self._requests = 0
+        self._graph = None
+        self._mtime = None
+        self._cache = None
+        self.reload()
+
+    def _graph_mtime(self):
+        # a CSR graph is a directory, its meta.json is written last
+        path = os.path.join(self._graph_path, 'meta.json') if os.path.isdir(self._graph_path) else self._graph_path
+        return os.path.getmtime(path)
+
+    def reload(self):
+        """(Re)load the graph and reset the result cache
+        """
+        mtime = self._graph_mtime()
+        graph = load_graph(self._graph_path)
+        # next neighbors are answered by the neighbor index of the graph (as get_item), built before the swap
+        graph.neighbor_index()
+        self._graph = graph
+        self._mtime = mtime
+        self._cache = NeighborCache(max_size=self._cache_size)
+        print('Graph loaded from: ', self._graph_path)
+
+    async def watch(self):
+        """Reload the graph whenever its file changes
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._reload_interval)
+            try:
+                if self._graph_mtime() != self._mtime:
+                    await loop.run_in_executor(None, self.reload)
+            except Exception as e:
+                # the file may be in the middle of being rewritten (or unreadable): keep serving the loaded graph and
+                # try again later
+                print('Graph reload failed: ', repr(e))
+
+    def query(self, name: str, number=5, next_n=False) -> list:
+        """Neighbors of a node (cached)
+
+        Arguments:
+            name {str} -- name of the skill/title
+
+        Keyword Arguments:
+            number {int} -- number of nodes to return (default: {5})
+            next_n {bool} -- next neighbors instead of nearest neighbors (default: {False})
+
+        Returns:
+            list -- list of neighbors (None if the node has none), KeyError if the node does not exist
+        """
+        key = (name.lower(), number, next_n)
+        result = self._cache.get(key)
+        if result is None:
+            node = name.lower()
+            result = self._graph.next_neighbor(node, number) if next_n else self._graph.nearest_neighbor(node, number)
+            # cache "no neighbors" as an empty list
+            result = result or []
+            self._cache.put(key, result)
+        return result
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000 if latencies else None
+
+        return {'requests': self._requests, 'p50_ms': percentile(0.5), 'p99_ms': percentile(0.99),
+                'cache_entries': len(self._cache), 'cache_hit_rate': self._cache.hit_rate(), 'graph_mtime': self._mtime}
+
+    def handle(self, path: str, body: bytes):
+        """Answer one request
+
+        Arguments:
+            path {str} -- request path with query string
+            body {bytes} -- request body (JSON)
+
+        Returns:
+            tuple -- (HTTP status, JSON serializable response)
+        """
+        url = urlsplit(path)
+        params = {key: value[-1] for key, value in parse_qs(url.query).items()}
+        if body:
+            params.update(json.loads(body.decode('utf-8')))
+
+        if url.path == '/stats':
+            return 200, self.stats()
+
+        start = perf_counter()
+        if url.path in ('/nearest', '/next'):
+            if not params.get('name'):
+                return 400, {'error': 'missing parameter: name'}
+            try:
+                response = {'name': params['name'], 'result': self.query(params['name'], int(params.get('n', 5)),
+                                                                         next_n=url.path == '/next')}
+            except KeyError:
+                return 404, {'error': 'unknown node: {}'.format(params.get('name'))}
+        elif url.path == '/batch':
+            results = []
+            for item in params.get('queries', []):
+                try:
+                    results.append(self.query(item['name'], int(item.get('n', 5)), next_n=bool(item.get('next', False))))
+                except KeyError:
+                    results.append(None)
+            response = {'results': results}
+        else:
+            return 404, {'error': 'unknown endpoint: {}'.format(url.path)}
+
+        self._requests += 1
+        self._latencies.append(perf_counter() - start)
+        return 200, response
+
+    async def serve_client(self, reader, writer):
+        """Minimal HTTP/1.1 handler (keep-alive, Content-Length bodies)
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, response = self.handle(path, body)
+                except ValueError as e:
+                    status, response = 400, {'error': str(e)}
+
+                payload = json.dumps(response).encode('utf-8')
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(
+                    status, 'OK' if status == 200 else 'Error', len(payload)).encode('latin-1') + payload)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(service: QueryService, host='127.0.0.1', port=8765, socket_path=None):
+    """Serve the graph on localhost (TCP) or on a Unix socket
+
+    Arguments:
+        service {QueryService} -- query service
+
+    Keyword Arguments:
+        host {str} -- host to bind (default: {'127.0.0.1'})
+        port {int} -- port to bind (default: {8765})
+        socket_path {str} -- serve on this Unix socket instead of TCP (default: {None})
+    """
+    if socket_path:
+        server = await asyncio.start_unix_server(service.serve_client, path=socket_path)
+    else:
+        server = await asyncio.start_server(service.serve_client, host=host, port=port)
+    print('Serving on: ', socket_path or '{}:{}'.format(host, port))
+
+    watcher = asyncio.ensure_future(service.watch())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--graphpath', type=str, help='Enter trained path (pickled graph or CSR graph directory):')
+    parser.add_argument('--host', type=str, help='Host to bind', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='Port to bind', default=8765)
+    parser.add_argument('--socket', type=str, help='Serve on a Unix socket instead of TCP')
+    parser.add_argument('--cache_size', type=int, help='Maximum number of cached results', default=100000)
+    parser.add_argument('--reload_interval', type=float, help='Seconds between checks of the graph file', default=5.0)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE:
+    # python service.py --graphpath /media/druv022/Data2/Challenge/data/graph_temp.csr
+    # curl 'http://127.0.0.1:8765/nearest?name=ASP.NET&n=5'
+    args = parse_arguments(sys.argv[1:])
+    service = QueryService(args.graphpath, cache_size=args.cache_size, reload_interval=args.reload_interval)
+    asyncio.run(serve(service, host=args.host, port=args.port, socket_path=args.socket))
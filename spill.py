@@ -0,0 +1,206 @@
+from numpy.lib.format import open_memmap
+from atomic import temp_path, replace_dir
+import numpy as np
+import shutil
+import json
+import os
+
+# spilled edge: both node ids in one key (smaller id in the high 32 bits), first insertion and weight
+EDGE = np.dtype([('key', '<i8'), ('seq', '<i8'), ('weight', '<f8')])
+
+
+class SpillGraph():
+    """Bounded memory graph writer for corpora whose edges do not fit in memory, used by learn_graph in place of Graph.
+    Nodes are kept in memory (name -> id and type); edges are appended to a fixed size buffer which is aggregated and
+    written to a sorted spill file (run) whenever it is full. save merges the runs (k-way, block by block) applying the
+    rule of Graph.add_edge (higher weight wins, an edge keeps the position of its first insertion) and writes the
+    CSRGraph directory directly, identical to CSRGraph.from_graph of the graph learn_graph builds in memory.
+    """
+
+    def __init__(self, path: str, memory_budget=1024):
+        """
+        Arguments:
+            path {str} -- directory of the spill files (created, removed by save)
+
+        Keyword Arguments:
+            memory_budget {int} -- memory used for the edges (buffer, merge and final sort), in MB (default: {1024})
+        """
+        self.path = path
+        # a block of records is sorted with a few copies alive at once
+        self.block = max(memory_budget * 2**20 // (4 * EDGE.itemsize), 1024)
+        self._ids = {}
+        self._types = []
+        self._buffer = np.empty(self.block, dtype=EDGE)
+        self._size = 0
+        self._seq = 0
+        self.runs = []
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+
+    def __len__(self):
+        return len(self._types)
+
+    def add_node(self, node: str, c_type: str) -> bool:
+        """Add a node of an attribute type (a later type replaces the earlier one, as in Graph)
+
+        Returns:
+            bool -- True if the node is new or its type changed
+        """
+        idx = self._ids.get(node)
+        if idx is None:
+            self._ids[node] = len(self._types)
+            self._types.append(c_type)
+            return True
+        changed = self._types[idx] != c_type
+        self._types[idx] = c_type
+        return changed
+
+    def add_edge(self, node1: str, node2: str, weight=1) -> bool:
+        """Record an edge (missing nodes are added without type, as networkx does). Weights are only compared when
+        the runs are merged
+
+        Returns:
+            bool -- always True
+        """
+        ids = []
+        for node in (node1, node2):
+            if node not in self._ids:
+                self.add_node(node, None)
+            ids.append(self._ids[node])
+        low, high = min(ids), max(ids)
+        self._buffer[self._size] = ((low << 32) | high, self._seq, weight)
+        self._size += 1
+        self._seq += 1
+        if self._size == self.block:
+            self._spill()
+        return True
+
+    def _spill(self):
+        """Aggregate the buffer and write it as a run sorted by key
+        """
+        if self._size == 0:
+            return
+        path = os.path.join(self.path, 'run{:05d}.npy'.format(len(self.runs)))
+        np.save(path, _aggregate(self._buffer[:self._size]))
+        self.runs.append(path)
+        self._size = 0
+
+    def edges(self):
+        """Merge the runs: the edges sorted by key, one record per edge with its maximum weight and first insertion
+
+        Returns:
+            generator -- blocks of records (EDGE)
+        """
+        self._spill()
+        runs = [np.load(path, mmap_mode='r') for path in self.runs]
+        # every run contributes a slice of a block at a time
+        step = max(self.block // max(len(runs), 1), 1)
+        positions = [0] * len(runs)
+        carry = np.empty(0, dtype=EDGE)
+        while True:
+            loaded, bound = [carry], None
+            for i, run in enumerate(runs):
+                if positions[i] < len(run):
+                    chunk = run[positions[i]:positions[i] + step]
+                    positions[i] += len(chunk)
+                    loaded.append(chunk)
+                    # keys after the last loaded one may still come from this run
+                    if positions[i] < len(run):
+                        bound = chunk['key'][-1] if bound is None else min(bound, chunk['key'][-1])
+            merged = _aggregate(np.concatenate(loaded))
+            if bound is None:
+                if len(merged):
+                    yield merged
+                return
+            split = np.searchsorted(merged['key'], bound, side='right')
+            if split:
+                yield merged[:split]
+            carry = merged[split:]
+
+    def save(self, path: str):
+        """Merge the runs and write the graph as a CSRGraph directory (see CSRGraph.save, published atomically with
+        replace_dir), then remove the spill files. Neighbors are sorted by decreasing weight, ties in insertion order
+
+        Arguments:
+            path {str} -- path to the CSR graph directory (an existing graph is replaced)
+        """
+        n = len(self._types)
+        merged_path = os.path.join(self.path, 'merged.bin')
+        degrees = np.zeros(n, dtype=np.int64)
+        with open(merged_path, 'wb') as f:
+            for records in self.edges():
+                records.tofile(f)
+                low, high = records['key'] >> 32, records['key'] & 0xffffffff
+                degrees += np.bincount(low, minlength=n) + np.bincount(high[high != low], minlength=n)
+        merged = np.memmap(merged_path, dtype=EDGE, mode='r') if os.path.getsize(merged_path) else np.empty(0, dtype=EDGE)
+
+        # written aside and swapped in atomically, as CSRGraph.save
+        temp = temp_path(path)
+        os.makedirs(temp)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        total = int(indptr[-1])
+        indices = open_memmap(os.path.join(temp, 'indices.npy'), mode='w+', dtype=np.int64, shape=(total,))
+        weights = open_memmap(os.path.join(temp, 'weights.npy'), mode='w+', dtype=np.float64, shape=(total,))
+        seqs = open_memmap(os.path.join(self.path, 'seqs.npy'), mode='w+', dtype=np.int64, shape=(total,))
+
+        # scatter both directions of every edge into the rows of its nodes (a self loop once)
+        cursor = indptr[:-1].copy()
+        for start in range(0, len(merged), self.block):
+            records = merged[start:start + self.block]
+            low, high = records['key'] >> 32, records['key'] & 0xffffffff
+            loop = high == low
+            rows = np.concatenate([low, high[~loop]])
+            order = np.argsort(rows, kind='stable')
+            rows = rows[order]
+            first = np.searchsorted(rows, rows)
+            positions = cursor[rows] + np.arange(len(rows)) - first
+            indices[positions] = np.concatenate([high, low[~loop]])[order]
+            weights[positions] = np.concatenate([records['weight'], records['weight'][~loop]])[order]
+            seqs[positions] = np.concatenate([records['seq'], records['seq'][~loop]])[order]
+            cursor += np.bincount(rows, minlength=n)
+
+        # sort every row by decreasing weight then insertion, a block of rows at a time
+        row = 0
+        while row < n:
+            end = max(int(np.searchsorted(indptr, indptr[row] + self.block, side='right')) - 1, row + 1)
+            end = min(end, n)
+            begin, stop = indptr[row], indptr[end]
+            owner = np.repeat(np.arange(row, end), degrees[row:end])
+            order = np.lexsort((seqs[begin:stop], -weights[begin:stop], owner))
+            indices[begin:stop] = indices[begin:stop][order]
+            weights[begin:stop] = weights[begin:stop][order]
+            row = end
+        indices.flush()
+        weights.flush()
+        del indices, weights, seqs, merged
+
+        nodes = sorted(self._ids, key=self._ids.get)
+        encoded = [node.encode('utf-8') for node in nodes]
+        type_names = list(dict.fromkeys(self._types))
+        arrays = {'names': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                  'name_offsets': np.cumsum([0] + [len(name) for name in encoded]).astype(np.int64),
+                  'name_order': np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64),
+                  'types': np.array([type_names.index(c_type) for c_type in self._types], dtype=np.uint8),
+                  'indptr': indptr}
+        for key, array in arrays.items():
+            np.save(os.path.join(temp, key + '.npy'), array)
+        with open(os.path.join(temp, 'meta.json'), 'w') as f:
+            json.dump({'type_names': type_names}, f)
+
+        replace_dir(temp, path)
+        shutil.rmtree(self.path)
+
+def _aggregate(records):
+    """Sort records by key and keep one per key: maximum weight, first insertion
+    """
+    records = records[np.argsort(records['key'], kind='stable')]
+    if len(records) == 0:
+        return records
+    starts = np.flatnonzero(np.r_[True, records['key'][1:] != records['key'][:-1]])
+    result = np.empty(len(starts), dtype=EDGE)
+    result['key'] = records['key'][starts]
+    result['seq'] = np.minimum.reduceat(records['seq'], starts)
+    result['weight'] = np.maximum.reduceat(records['weight'], starts)
+    return result
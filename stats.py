@@ -0,0 +1,140 @@
+from collections import Counter
+from gazetteer import DUMPS
+from multiprocessing import Pool
+import argparse
+import json
+import sys
+import os
+
+
+def count_postings(lines, batch_size=256) -> tuple:
+    """Entities per NER label and words per POS tag of the descriptions of postings (the part Filter reads, from
+    'require' on), parsed by spacy in batches
+
+    Arguments:
+        lines {iterable} -- lines of the JSON file
+
+    Keyword Arguments:
+        batch_size {int} -- number of descriptions parsed by spacy per batch (default: {256})
+
+    Returns:
+        tuple -- (label -> Counter of entities, POS tag -> Counter of words, number of postings)
+    """
+    from preprocess import get_entity, get_pos
+    from methods import parse, parse_posting
+
+    entities, pos = {}, {}
+    n_docs = 0
+    for doc in parse((parse_posting(line)[1] for line in lines), batch_size=batch_size):
+        get_entity(doc, entities)
+        get_pos(doc, pos)
+        n_docs += 1
+    return entities, pos, n_docs
+
+def _count_range(args) -> tuple:
+    from read import read_range
+
+    filepath, start, end, batch_size = args
+    return count_postings(read_range(filepath, start, end), batch_size=batch_size)
+
+def merge_counts(total: dict, counts: dict) -> dict:
+    """Add the counters of a part of the corpus to the totals (keys first seen in an earlier part stay first)
+    """
+    for key, counter in counts.items():
+        total.setdefault(key, Counter()).update(counter)
+    return total
+
+def corpus_stats(filepath: str, n_process=None, batch_size=256) -> tuple:
+    """Entity and POS statistics of a corpus: the file is split into byte ranges, every worker process parses its
+    range with spacy and counts into its own counters, which are merged in input order (same result as one process)
+
+    Arguments:
+        filepath {str} -- path to JSON file
+
+    Keyword Arguments:
+        n_process {int} -- number of worker processes (default: {number of CPUs})
+        batch_size {int} -- number of descriptions parsed by spacy per batch (default: {256})
+
+    Returns:
+        tuple -- (label -> Counter of entities, POS tag -> Counter of words, number of postings)
+    """
+    from read import read, split_ranges, COMPRESSED
+
+    n_process = n_process or os.cpu_count()
+    if n_process <= 1 or filepath.endswith(COMPRESSED):
+        return count_postings(read(filepath), batch_size=batch_size)
+
+    entities, pos = {}, {}
+    n_docs = 0
+    tasks = [(filepath, start, end, batch_size) for start, end in split_ranges(filepath, n_process)]
+    with Pool(max(len(tasks), 1)) as pool:
+        # imap keeps the ranges in input order: words keep the order in which the corpus introduces them
+        for part_entities, part_pos, part_docs in pool.imap(_count_range, tasks):
+            merge_counts(entities, part_entities)
+            merge_counts(pos, part_pos)
+            n_docs += part_docs
+    return entities, pos, n_docs
+
+def write_dumps(entities: dict, pos: dict, directory=DUMPS, min_count=1, n_docs=None):
+    """Write the dumps read by the gazetteer: <LABEL>.txt (the label on the first line then one entity per line) and
+    Word_POS.txt (word: ['TAG', ...]), in first seen order, along with the frequencies in counts.json
+
+    Arguments:
+        entities {dict} -- label -> Counter of entities
+        pos {dict} -- POS tag -> Counter of words
+
+    Keyword Arguments:
+        directory {str} -- directory of the dumps (default: {temp/})
+        min_count {int} -- minimum frequency of an entity or a (word, tag) pair to be written (default: {1})
+        n_docs {int} -- number of postings counted, saved with the frequencies (default: {None})
+    """
+    os.makedirs(directory, exist_ok=True)
+    for label, counter in entities.items():
+        _write(os.path.join(directory, label + '.txt'),
+               [label] + [text for text, count in counter.items() if count >= min_count])
+
+    word_pos = {}
+    for tag, counter in pos.items():
+        for word, count in counter.items():
+            if count >= min_count:
+                word_pos.setdefault(word, []).append(tag)
+    _write(os.path.join(directory, 'Word_POS.txt'), ['{}: {}'.format(word, tags) for word, tags in word_pos.items()])
+
+    counts = {'docs': n_docs, 'min_count': min_count,
+              'entities': {label: dict(counter.most_common()) for label, counter in entities.items()},
+              'pos': {tag: dict(counter.most_common()) for tag, counter in pos.items()}}
+    with open(os.path.join(directory, 'counts.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(counts, f, ensure_ascii=False)
+    os.replace(os.path.join(directory, 'counts.json.tmp'), os.path.join(directory, 'counts.json'))
+
+def _write(path: str, lines: list):
+    # written aside then renamed, the gazetteer may be reading the previous dump
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+    os.replace(path + '.tmp', path)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--filepath', type=str, help='Enter full path to JSON file')
+    parser.add_argument('--dumps', type=str, help='Directory of the entity and POS dumps to regenerate', default=DUMPS)
+    parser.add_argument('--n_process', type=int, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--batch_size', type=int, help='Number of descriptions parsed by spacy per batch', default=256)
+    parser.add_argument('--min_count', type=int, help='Minimum frequency of an entity or a word/POS pair to be written', default=1)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE (regenerates temp/*.txt and temp/counts.json):
+    # python stats.py --filepath /media/druv022/Data2/Challenge/data/job_descriptions.json/all_en_descriptions.json --n_process 8
+    from time import time
+
+    args = parse_arguments(sys.argv[1:])
+    start = time()
+    entities, pos, n_docs = corpus_stats(args.filepath, n_process=args.n_process, batch_size=args.batch_size)
+    write_dumps(entities, pos, args.dumps, min_count=args.min_count, n_docs=n_docs)
+    print('{} postings, {} entities, {} words in {:.0f} s, saved at: {}'.format(
+        n_docs, sum(len(counter) for counter in entities.values()),
+        len(set(word for counter in pos.values() for word in counter)), time() - start, args.dumps))
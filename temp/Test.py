@@ -32,9 +32,8 @@ data = read(path)
 # with open(file0,'wb+') as f:
 #     pickle.dump(doc_id, f)
 
-# file1 = '/media/druv022/Data2/Challenge/data/vocab.pkl'
-# with open(file1,'wb+') as f:
-#     pickle.dump(vocab, f)
+# file1 = '/media/druv022/Data2/Challenge/data/vocab'
+# vocab.save(file1)
 #-------------------------------------------------------------------------------------------------
 # file0= '/media/druv022/Data2/Challenge/data/read_data.pkl'
 # doc_id = get_docs(file0)
@@ -45,9 +44,8 @@ data = read(path)
 #         text = doc_id[key][1]
 #         text = cleaner.pre_process(text)
 #         f.write(text+'\n')
-# file1 = '/media/druv022/Data2/Challenge/data/vocab.pkl'
-# with open(file1,'rb') as f:
-#     vocab = pickle.load(f)
+# file1 = '/media/druv022/Data2/Challenge/data/vocab'
+# vocab = Vocabulary.load(file1)
 
 #-----------------------------------------------------------------------
 # # desc = SentencesIterator(get_desc(path))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import json
+import sys
+import os
+import re
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from synthetic import write_postings
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory) -> str:
+    """Small synthetic corpus, with a posting without description and an exact duplicate
+    """
+    path = str(tmp_path_factory.mktemp('corpus') / 'postings.json')
+    write_postings(path, 120, n_titles=20, n_skills=40, seed=3)
+    with open(path) as f:
+        lines = f.readlines()
+    lines.insert(10, json.dumps({'company': 'Initech', 'description': '', 'id': 120, 'title': 'Line Cook'}) + '\n')
+    lines.insert(30, lines[20])
+    with open(path, 'w') as f:
+        f.writelines(lines)
+    return path
+
+@pytest.fixture(scope='session')
+def mapped_model(tmp_path_factory, corpus) -> str:
+    """Model file with a memory-mapped export (random unit vectors for the words of the corpus), so the filter runs
+    without gensim
+    """
+    from vectors import write_vectors
+
+    with open(corpus) as f:
+        words = sorted(set(re.findall(r"\w+(?:[.+#&'-]\w+)*[+#]*", f.read().lower())))
+    model_path = str(tmp_path_factory.mktemp('model') / 'model.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'test')
+    vectors = np.random.RandomState(0).randn(len(words), 16)
+    write_vectors(model_path, words, vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+    return model_path
+
+def graph_items(graph) -> tuple:
+    """Nodes, edges and neighbor order of a Graph, for comparisons
+    """
+    return (list(graph.graph.nodes(data=True)), list(graph.graph.edges(data=True)),
+            [list(graph.graph[node]) for node in graph.graph])
@@ -0,0 +1,23 @@
+from ann import load_index, index_path, IVFIndex
+from cache import model_tag
+import numpy as np
+
+
+def test_index_is_rebuilt_for_another_model(tmp_path):
+    model_path = str(tmp_path / 'model.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'first model')
+    vectors = np.random.RandomState(0).randn(500, 8)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    built = load_index(model_path, vectors, nlist=10)
+    loaded = load_index(model_path, vectors)
+    assert loaded.nlist == built.nlist == 10
+
+    # same vocabulary size, another model file: the stale index is not reused
+    with open(model_path, 'wb') as f:
+        f.write(b'second model, retrained')
+    rebuilt = load_index(model_path, vectors, nlist=20)
+    assert rebuilt.nlist == 20
+    assert str(np.load(index_path(model_path))['model']) == model_tag(model_path)
+    assert IVFIndex.load(index_path(model_path), vectors, tag=model_tag(model_path)).nlist == 20
@@ -0,0 +1,65 @@
+from atomic import temp_path, replace_dir
+from multiprocessing import Pool
+from csr_graph import CSRGraph, load_graph
+from test_service import small_graph
+import threading
+import os
+
+
+def write(args):
+    path, i = args
+    temp = temp_path(path)
+    os.makedirs(temp)
+    for _ in range(20):
+        with open(os.path.join(temp, 'value'), 'w') as f:
+            f.write(str(i))
+        replace_dir(temp, path)
+        os.makedirs(temp)
+    os.rmdir(temp)
+    return i
+
+def test_concurrent_writers(tmp_path):
+    path = str(tmp_path / 'store')
+    with Pool(4) as pool:
+        assert sorted(pool.map(write, [(path, i) for i in range(4)])) == [0, 1, 2, 3]
+    with open(os.path.join(path, 'value')) as f:
+        assert f.read() in ('0', '1', '2', '3')
+    assert not [entry for entry in os.listdir(str(tmp_path)) if '.tmp' in entry or '.link' in entry]
+
+def test_replaced_versions_are_removed(tmp_path):
+    path = str(tmp_path / 'store')
+    for i in range(5):
+        temp = temp_path(path)
+        os.makedirs(temp)
+        replace_dir(temp, path, keep_seconds=0)
+    # the current version and the one it replaced
+    versions = sorted(entry for entry in os.listdir(str(tmp_path)) if entry.startswith('store.v'))
+    assert len(versions) == 2
+    assert os.path.realpath(path) == os.path.realpath(str(tmp_path / versions[-1]))
+
+def test_readers_never_see_a_missing_graph(tmp_path):
+    path = str(tmp_path / 'graph.csr')
+    # a directory saved before the swap used links is moved aside by the first save (the one step with a moment
+    # where the path is missing), the reader starts after it
+    CSRGraph.from_graph(small_graph()).write(path)
+    graph = CSRGraph.from_graph(small_graph())
+    graph.save(path)
+    assert os.path.islink(path)
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                assert load_graph(path).nearest_neighbor('python', 1) == ['developer']
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(50):
+            graph.save(path)
+    finally:
+        done.set()
+        reader.join()
+    assert errors == []
@@ -0,0 +1,33 @@
+from cache import SkillCache
+import sqlite3
+
+
+def test_skill_cache_does_not_lock_out_other_handles(tmp_path):
+    path = str(tmp_path / 'skills.sqlite')
+    first = SkillCache(path, 'tag')
+    # a handle that waits for the lock at most 100 ms
+    second = SkillCache(path, 'tag')
+    second._db.execute('PRAGMA busy_timeout = 100')
+
+    for i in range(1000):
+        first.put('description {}'.format(i), [('skill', 0.5)])
+        second.put('other {}'.format(i), [('skill', 0.7)])
+    try:
+        second.commit()
+    except sqlite3.OperationalError as e:
+        raise AssertionError('second handle locked out: {}'.format(e))
+    first.close()
+
+    assert second.get('description 999') == [('skill', 0.5)]
+    assert len(second) == 2000
+    second.close()
+
+def test_skill_cache_reads_its_pending_entries(tmp_path):
+    cache = SkillCache(str(tmp_path / 'skills.sqlite'), 'tag', commit_every=10, commit_interval=60)
+    cache.put('description', [('python', 0.8)])
+    assert cache.get('description') == [('python', 0.8)]
+    cache.close()
+
+    cache = SkillCache(str(tmp_path / 'skills.sqlite'), 'tag')
+    assert cache.get('description') == [('python', 0.8)]
+    assert SkillCache(str(tmp_path / 'skills.sqlite'), 'other').invalidated
@@ -0,0 +1,101 @@
+from checkpoint import CheckpointLog, LoggedGraph, compact
+from conftest import graph_items
+from csr_graph import CSRGraph
+from graph import Graph
+import numpy as np
+import random
+import pickle
+
+BATCH = 5
+
+
+def postings(n=40, seed=0) -> list:
+    rng = random.Random(seed)
+    skills = ['skill {}'.format(i) for i in range(30)]
+    return [('title {}'.format(rng.randrange(8)), [(skill, rng.choice([0.2, 0.5, 0.9]))
+                                                   for skill in rng.sample(skills, 4)]) for _ in range(n)]
+
+def learn(graph, items: list, log=None, start=0):
+    """Add the postings from start on as learn_graph does, committing every BATCH postings
+    """
+    for i in range(start, len(items)):
+        title, skills = items[i]
+        graph.add_node(title, 'title')
+        for skill, weight in skills:
+            graph.add_node(skill, 'skill')
+            graph.add_edge(title, skill, weight=weight)
+        if log is not None and (i + 1) % BATCH == 0:
+            log.commit(i + 1)
+    return graph
+
+def write_log(path: str, items: list) -> list:
+    """Log of the postings, with the size of the log after every commit
+    """
+    log = CheckpointLog(path)
+    learn(LoggedGraph(Graph(), log), items, log)
+    # a batch which was never committed
+    learn(LoggedGraph(Graph(), log), postings(3, seed=1))
+    log.close()
+    commits, size = [], 0
+    with open(path, 'rb') as f:
+        for line in f:
+            size += len(line)
+            if line.startswith(b'["c"'):
+                commits.append(size)
+    return commits
+
+def test_replay_matches_the_graph_built_in_memory(tmp_path):
+    items = postings()
+    path = str(tmp_path / 'graph.log')
+    commits = write_log(path, items)
+    assert len(commits) == len(items) // BATCH
+
+    graph, offset, size = CheckpointLog.replay(path)
+    # the records after the last commit are ignored
+    assert (offset, size) == (len(items), commits[-1])
+    assert graph_items(graph) == graph_items(learn(Graph(), items))
+
+def test_resume_after_a_crash(tmp_path):
+    items = postings()
+    path = str(tmp_path / 'graph.log')
+    commits = write_log(path, items)
+    with open(path, 'rb') as f:
+        data = f.read()
+    reference = graph_items(learn(Graph(), items))
+
+    # cut inside a record, right before the newline of a commit, right after a commit and after uncommitted records
+    for cut in [commits[2] - 3, commits[3] - 1, commits[3], commits[4] + 40, len(data)]:
+        torn = str(tmp_path / 'torn.log')
+        with open(torn, 'wb') as f:
+            f.write(data[:cut])
+        graph, offset, size = CheckpointLog.replay(torn)
+        committed = sum(1 for commit in commits if commit <= cut)
+        assert offset == committed * BATCH
+        assert size == (commits[committed - 1] if committed else 0)
+        assert graph_items(graph) == graph_items(learn(Graph(), items[:offset]))
+
+        # resume from the last commit, then replay the resumed log
+        log = CheckpointLog(torn, resume_at=size)
+        learn(LoggedGraph(graph, log), items, log, start=offset)
+        log.close()
+        assert graph_items(graph) == reference
+        replayed, offset, _ = CheckpointLog.replay(torn)
+        assert offset == len(items)
+        assert graph_items(replayed) == reference
+
+def test_compaction_preserves_the_replay(tmp_path):
+    items = postings()
+    path = str(tmp_path / 'graph.log')
+    write_log(path, items)
+    graph, offset, _ = CheckpointLog.replay(path)
+
+    assert compact(path, str(tmp_path / 'graph.pkl')) == offset
+    with open(str(tmp_path / 'graph.pkl'), 'rb') as f:
+        assert graph_items(pickle.load(f)) == graph_items(graph)
+
+    assert compact(path, str(tmp_path / 'graph.csr'), csr=True) == offset
+    saved, expected = CSRGraph.load(str(tmp_path / 'graph.csr')), CSRGraph.from_graph(graph)
+    for key in ['names', 'name_offsets', 'name_order', 'types', 'indptr', 'indices', 'weights']:
+        np.testing.assert_array_equal(getattr(saved, '_' + key), getattr(expected, '_' + key))
+    for node in graph.graph:
+        assert saved.nearest_neighbor(node, 10) == graph.nearest_neighbor(node, 10)
@@ -0,0 +1,35 @@
+import random
+import pytest
+
+pytest.importorskip('regex')
+from dedup import Deduplicator
+
+
+def posting(rng: random.Random, words: list, n=80) -> str:
+    return ' '.join(rng.choice(words) for _ in range(n))
+
+def test_near_duplicates_reuse_the_skills_of_their_original():
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcdefghij') for _ in range(6)) for _ in range(500)]
+    texts = [posting(rng, words) for _ in range(1500)]
+    dedup = Deduplicator(threshold=0.8)
+    for key, text in enumerate(texts):
+        assert dedup.check(text, key) is None
+        dedup.store(key, [('skill{}'.format(key), 0.5)])
+    # more postings than the initial signature matrix, no result kept in memory yet
+    assert len(dedup._signatures) >= len(texts)
+    assert dedup._results == {}
+
+    # a duplicate of an early posting (its skills are read back from the spill file) and one changed at the end
+    assert dedup.check(texts[3], 'copy') == 3
+    assert dedup.result(3) == [('skill3', 0.5)]
+    assert dedup.check(texts[1400] + ' hiring now', 'edited') == 1400
+    assert dedup.result(1400) == [('skill1400', 0.5)]
+
+    # an original matched before its skills are stored keeps them in memory
+    assert dedup.check('a new posting ' + texts[0][::-1], 'new') is None
+    assert dedup.check('a new posting ' + texts[0][::-1], 'again') == 'new'
+    dedup.store('new', [('new skill', 1.0)])
+    assert dedup.result('new') == [('new skill', 1.0)]
+    assert sorted(dedup._results, key=str) == sorted([dedup._row_of[key] for key in [3, 1400, 'new']], key=str)
+    assert (dedup.checked, dedup.duplicates) == (len(texts) + 4, 3)
@@ -0,0 +1,29 @@
+import pytest
+import json
+import os
+
+spacy = pytest.importorskip('spacy')
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'README.MD')
+
+
+def attributes(doc) -> tuple:
+    """What Filter and the statistics helpers read from a parsed document: tokens with their POS tag and entities
+    """
+    return [(token.text, token.pos_, token.idx) for token in doc], \
+        [(ent.text, ent.label_, ent.start_char, ent.end_char) for ent in doc.ents]
+
+def test_parser_disabled_matches_full_pipeline():
+    from methods import parse, parse_posting
+
+    try:
+        full = spacy.load('en_core_web_sm')
+    except OSError:
+        pytest.skip('en_core_web_sm is not installed')
+    with open(DATA) as f:
+        texts = [parse_posting(line)[1] for line in f if line.startswith('{')]
+    assert texts
+
+    # batched, without the dependency parser (get_nlp) against one document at a time with every component
+    for doc, text in zip(parse(texts, batch_size=4), texts):
+        assert attributes(doc) == attributes(full(text))
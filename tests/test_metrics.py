@@ -0,0 +1,24 @@
+from metrics import Metrics
+import metrics as metrics_module
+
+
+def test_nested_timed_stages_are_exclusive(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(metrics_module, 'perf_counter', lambda: clock[0])
+
+    def produce():
+        for i in range(3):
+            clock[0] += 2.0
+            yield i
+
+    def consume(items):
+        for item in items:
+            clock[0] += 1.0
+            yield item
+
+    metrics = Metrics()
+    assert list(metrics.timed(consume(metrics.timed(produce(), 'read')), 'parse')) == [0, 1, 2]
+    timers = metrics.snapshot()['timers']
+    # the last steps find both iterators exhausted
+    assert (timers['read']['calls'], timers['read']['total_s']) == (4, 6.0)
+    assert (timers['parse']['calls'], timers['parse']['total_s']) == (4, 3.0)
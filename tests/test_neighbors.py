@@ -0,0 +1,40 @@
+from test_service import small_graph
+from csr_graph import CSRGraph
+from methods import get_item
+import pickle
+
+
+def test_next_neighbors_sum_path_weights():
+    graph = small_graph()
+    graph.add_node('tester', 'title')
+    graph.add_edge('tester', 'python', weight=0.3)
+    graph.add_edge('tester', 'excel', weight=0.2)
+    csr_graph = CSRGraph.from_graph(graph)
+
+    # sql is reached from python through developer (0.8 + 0.5), excel through tester (0.3 + 0.2)
+    expected = ['sql', 'excel']
+    assert graph.next_neighbor('python', 2) == expected
+    assert csr_graph.next_neighbor('python', 2) == expected
+    assert get_item('Python', 2, graph, next_n=True) == expected
+    assert get_item('Python', 2, csr_graph, next_n=True) == expected
+    # from developer: analyst through sql (0.5 + 0.7), tester through python (0.8 + 0.3)
+    assert graph.next_neighbor('developer', 5) == csr_graph.next_neighbor('developer', 5) == ['analyst', 'tester']
+
+    # python is reached from sql through developer (0.5 + 0.8) and analyst (0.7 + 0.1): once, with the sum of both
+    graph.add_edge('analyst', 'python', weight=0.1)
+    csr_graph = CSRGraph.from_graph(graph)
+    assert graph.next_neighbor('sql', 5) == csr_graph.next_neighbor('sql', 5) == ['python', 'excel']
+
+def test_neighbor_index_is_built_once_per_graph():
+    graph = small_graph()
+    index = graph.neighbor_index()
+    get_item('sql', 2, graph, next_n=True)
+    assert graph.neighbor_index() is index
+
+    graph.add_edge('analyst', 'python', weight=0.9)
+    assert graph.neighbor_index() is not index
+    assert graph.next_neighbor('analyst', 1) == ['developer']
+
+    restored = pickle.loads(pickle.dumps(graph))
+    assert '_index' not in restored.__dict__
+    assert restored.next_neighbor('analyst', 1) == ['developer']
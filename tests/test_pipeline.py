@@ -0,0 +1,40 @@
+from conftest import graph_items
+import pickle
+import pytest
+
+pytest.importorskip('tqdm')
+
+
+@pytest.mark.parametrize('dedup_threshold', [None, 0.9])
+def test_pipeline_matches_sequential(tmp_path, corpus, mapped_model, dedup_threshold):
+    from methods import learn_graph
+
+    options = dict(gazetteer_mode='replace', mapped=True, batch_size=16, dedup_threshold=dedup_threshold)
+    learn_graph(corpus, mapped_model, str(tmp_path / 'sequential.pkl'), **options)
+    learn_graph(corpus, mapped_model, str(tmp_path / 'pipeline.pkl'), read_workers=2, nlp_workers=2, score_workers=2,
+                queue_size=3, **options)
+
+    with open(str(tmp_path / 'sequential.pkl'), 'rb') as f:
+        sequential = pickle.load(f)
+    with open(str(tmp_path / 'pipeline.pkl'), 'rb') as f:
+        pipelined = pickle.load(f)
+    assert len(sequential.graph.edges) > 0
+    assert graph_items(pipelined) == graph_items(sequential)
+
+def test_pipeline_saves_the_merged_neighbor_cache(tmp_path, corpus, mapped_model):
+    from methods import learn_graph
+
+    options = dict(gazetteer_mode='replace', mapped=True, batch_size=16)
+    learn_graph(corpus, mapped_model, str(tmp_path / 'sequential.pkl'), cache_path=str(tmp_path / 'sequential.cache'),
+                **options)
+    learn_graph(corpus, mapped_model, str(tmp_path / 'pipeline.pkl'), cache_path=str(tmp_path / 'pipeline.cache'),
+                nlp_workers=2, score_workers=2, **options)
+
+    caches = []
+    for name in ['sequential.cache', 'pipeline.cache']:
+        with open(str(tmp_path / name), 'rb') as f:
+            caches.append(pickle.load(f))
+    assert len(caches[0]['entries']) > 0
+    # the scoring processes looked up the same words, the merged cache has every one of them
+    assert caches[1]['tag'] == caches[0]['tag']
+    assert sorted(key for key, _ in caches[1]['entries']) == sorted(key for key, _ in caches[0]['entries'])
@@ -0,0 +1,34 @@
+import pytest
+import json
+import os
+
+pytest.importorskip('regex')
+from preprocess import TextPreprocessor
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'README.MD')
+
+EDGE_CASES = [
+    '', 'a', '.', '...', 'Hello.. World', 'end..', 'U.S.A. based company.', 'Node.js, C++ and C#.',
+    'multiple   spaces\t\ttabs\n\nnewlines \r\n end', ' non breaking spaces　',
+    '“Quoted” and ‘single’ it’s John’s', 'en–dash — em-dash ‐ hyphen', 'â€\'s mojibake â€\' here',
+    'Digits 123 and ٣ arabic and ５ fullwidth', 'Path a / b/c \\ d: e (f) <g> +h', 'Ends with punctuation!?;',
+    "the company's culture's", '.5 years. 3.5 years', 'x. y', '¿Qué tal? ¡Bien!', 'ÉCOLE Straße ǅ',
+    'a..“b” c.’d', 'e.\u2003f', 'g.٣h', 'i.-j', "k.'s", 'l... m', None,
+]
+
+
+def descriptions() -> list:
+    with open(DATA) as f:
+        return [json.loads(line)['description'] for line in f if line.startswith('{')]
+
+def test_sample_data_matches_reference():
+    cleaner = TextPreprocessor()
+    texts = descriptions()
+    assert texts
+    for text in texts:
+        assert cleaner.pre_process(text) == cleaner.pre_process_reference(text)
+
+@pytest.mark.parametrize('text', EDGE_CASES)
+def test_edge_cases_match_reference(text):
+    cleaner = TextPreprocessor()
+    assert cleaner.pre_process(text) == cleaner.pre_process_reference(text)
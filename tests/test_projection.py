@@ -0,0 +1,44 @@
+from projection import Projection, update_projection
+from test_service import small_graph
+from csr_graph import CSRGraph
+import threading
+import pickle
+import os
+
+
+def test_update_swaps_the_projection(tmp_path):
+    graph_path, projection_path = str(tmp_path / 'graph.pkl'), str(tmp_path / 'graph.proj')
+    graph = small_graph()
+    with open(graph_path, 'wb') as f:
+        pickle.dump(graph, f)
+    update_projection(graph_path, projection_path, number=5)
+    first = Projection.load(projection_path)
+    assert first.lookup('python', 5) == graph.next_neighbor('python', 5)
+
+    graph.add_node('tester', 'title')
+    graph.add_edge('tester', 'python', weight=0.3)
+    with open(graph_path, 'wb') as f:
+        pickle.dump(graph, f)
+
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                Projection.load(projection_path).lookup('developer', 5)
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(20):
+            update_projection(graph_path, projection_path, number=5)
+    finally:
+        done.set()
+        reader.join()
+    assert errors == []
+    assert Projection.load(projection_path).lookup('developer', 5) == graph.next_neighbor('developer', 5)
+    # the replaced projection stays readable
+    assert first.lookup('developer', 5) == ['analyst']
+    assert not [entry for entry in os.listdir(str(tmp_path)) if '.tmp' in entry or '.link' in entry]
@@ -0,0 +1,42 @@
+from quantize import load_quantized, quantized_path, QuantizedVectors
+from cache import model_tag
+import numpy as np
+import json
+import os
+
+
+def test_store_is_rebuilt_for_another_model(tmp_path):
+    model_path = str(tmp_path / 'model.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'first model')
+    first = np.random.RandomState(0).randn(200, 8)
+    first /= np.linalg.norm(first, axis=1, keepdims=True)
+
+    for dtype in ['float16', 'int8']:
+        stored = load_quantized(model_path, first, dtype)
+        assert np.array_equal(load_quantized(model_path, first, dtype).codes, stored.codes)
+
+    # same shape, another model file: the stale store is not reused
+    with open(model_path, 'wb') as f:
+        f.write(b'second model, retrained')
+    second = np.random.RandomState(1).randn(200, 8)
+    second /= np.linalg.norm(second, axis=1, keepdims=True)
+    for dtype in ['float16', 'int8']:
+        rows = load_quantized(model_path, second, dtype).rows(np.arange(200))
+        assert np.allclose(rows, second, atol=0.01)
+        with open(os.path.join(quantized_path(model_path, dtype), 'meta.json')) as f:
+            assert json.load(f)['dtype'] == dtype
+
+def test_store_of_another_dtype_is_rebuilt(tmp_path):
+    model_path = str(tmp_path / 'model.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'model')
+    vectors = np.random.RandomState(0).randn(100, 8)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # a float16 store where the int8 one is expected (same model, same shape)
+    QuantizedVectors.quantize(vectors, 'float16').save(quantized_path(model_path, 'int8'), tag=model_tag(model_path))
+    quantized = load_quantized(model_path, vectors, 'int8')
+    assert quantized.dtype == 'int8'
+    assert load_quantized(model_path, vectors, 'int8').dtype == 'int8'
+    assert os.path.islink(quantized_path(model_path, 'int8'))
@@ -0,0 +1,14 @@
+from read import loads
+import pytest
+import json
+
+
+@pytest.mark.parametrize('line', ['{"title": "Cook", "description": "Lone \\ud800 surrogate"}',
+                                  b'{"title": "Cook", "description": "\\udc00 and \\u00e9"}',
+                                  '{"title": "Caf\\u00e9", "description": ""}'])
+def test_loads_matches_json(line):
+    assert loads(line) == json.loads(line)
+
+def test_loads_rejects_invalid_json():
+    with pytest.raises(ValueError):
+        loads('{"title": ')
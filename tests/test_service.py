@@ -0,0 +1,65 @@
+from service import QueryService
+from csr_graph import CSRGraph
+from graph import Graph
+import asyncio
+import os
+
+
+def small_graph() -> Graph:
+    graph = Graph()
+    for title, skills in [('developer', [('python', 0.8), ('sql', 0.5)]), ('analyst', [('sql', 0.7), ('excel', 0.6)])]:
+        graph.add_node(title, 'title')
+        for skill, weight in skills:
+            graph.add_node(skill, 'skill')
+            graph.add_edge(title, skill, weight=weight)
+    return graph
+
+def test_handle_errors(tmp_path):
+    path = str(tmp_path / 'graph.csr')
+    CSRGraph.from_graph(small_graph()).save(path)
+    service = QueryService(path)
+
+    assert service.handle('/nearest?name=SQL&n=1', b'') == (200, {'name': 'SQL', 'result': ['analyst']})
+    assert service.handle('/nearest', b'')[0] == 400
+    assert service.handle('/next?n=2', b'')[0] == 400
+    assert service.handle('/nearest?name=cobol', b'')[0] == 404
+
+def test_save_replaces_the_directory(tmp_path):
+    path = str(tmp_path / 'graph.csr')
+    graph = small_graph()
+    CSRGraph.from_graph(graph).save(path)
+    loaded = CSRGraph.load(path)
+    graph.add_node('tester', 'title')
+    graph.add_edge('tester', 'python', weight=0.9)
+    # saved over the directory the first graph is memory-mapped from
+    CSRGraph.from_graph(graph).save(path)
+
+    assert loaded.nearest_neighbor('python', 1) == ['developer']
+    assert CSRGraph.load(path).nearest_neighbor('python', 1) == ['tester']
+    # the path is a link to the new version, the replaced one is kept for readers still loading it
+    assert os.path.islink(path)
+    assert len([entry for entry in os.listdir(str(tmp_path)) if entry.startswith('graph.csr.v')]) == 2
+    assert not [entry for entry in os.listdir(str(tmp_path)) if '.tmp' in entry or '.link' in entry]
+
+def test_watch_survives_reload_errors(tmp_path):
+    path = str(tmp_path / 'graph.csr')
+    CSRGraph.from_graph(small_graph()).save(path)
+    service = QueryService(path, reload_interval=0.01)
+    calls = []
+
+    def reload():
+        calls.append(None)
+        raise ValueError('corrupt graph')
+
+    service.reload = reload
+    service._mtime = None
+
+    async def run():
+        watcher = asyncio.ensure_future(service.watch())
+        await asyncio.sleep(0.1)
+        assert not watcher.done()
+        watcher.cancel()
+
+    asyncio.run(run())
+    assert len(calls) > 1
+    assert service.query('python', 1) == ['developer']
@@ -0,0 +1,40 @@
+from conftest import graph_items
+import pickle
+import pytest
+import os
+
+
+def sequential(corpus: str, model_path: str, tmp_path, **options):
+    """Graph of the sequential path (learn_graph, or one shard over the whole file when tqdm is not installed)
+    """
+    try:
+        import tqdm
+    except ImportError:
+        from methods import learn_shard
+        return learn_shard(corpus, model_path, 0, os.path.getsize(corpus), **options)
+
+    from methods import learn_graph
+    learn_graph(corpus, model_path, str(tmp_path / 'sequential.pkl'), **options)
+    with open(str(tmp_path / 'sequential.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+def sharded(corpus: str, model_path: str, tmp_path, **options):
+    from methods import learn_graph_sharded
+
+    learn_graph_sharded(corpus, model_path, str(tmp_path / 'sharded.pkl'), n_shards=3, **options)
+    with open(str(tmp_path / 'sharded.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+def test_sharded_matches_sequential(tmp_path, corpus, mapped_model):
+    options = dict(gazetteer_mode='replace', mapped=True, batch_size=16)
+    reference = sequential(corpus, mapped_model, tmp_path, **options)
+    assert len(reference.graph.edges) > 0
+    assert graph_items(sharded(corpus, mapped_model, tmp_path, **options)) == graph_items(reference)
+
+def test_sharded_dedup_keeps_the_nodes(tmp_path, corpus, mapped_model):
+    # near-duplicates are only found within a shard: skills and weights may differ, the titles may not
+    options = dict(gazetteer_mode='replace', mapped=True, batch_size=16, dedup_threshold=0.9)
+    reference = sequential(corpus, mapped_model, tmp_path, **options)
+    titles = [node for node, c_type in reference.graph.nodes(data='type') if c_type == 'title']
+    result = sharded(corpus, mapped_model, tmp_path, **options)
+    assert [node for node, c_type in result.graph.nodes(data='type') if c_type == 'title'] == titles
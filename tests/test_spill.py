@@ -0,0 +1,36 @@
+from csr_graph import CSRGraph
+from spill import SpillGraph
+from graph import Graph
+import numpy as np
+import random
+import os
+
+
+def test_spilled_graph_equals_the_in_memory_graph(tmp_path):
+    rng = random.Random(0)
+    names = ['node {}'.format(i) for i in range(300)]
+    graph = Graph()
+    # the smallest buffer (1024 edges): about 20 runs, merged a slice of every run at a time
+    spill = SpillGraph(str(tmp_path / 'spill'), memory_budget=0)
+    for _ in range(20000):
+        if rng.random() < 0.05:
+            node, c_type = rng.choice(names), rng.choice(['title', 'skill'])
+            graph.add_node(node, c_type)
+            spill.add_node(node, c_type)
+        # few distinct weights so that rows have ties, and a few self loops
+        node1, node2, weight = rng.choice(names), rng.choice(names), rng.choice([0.2, 0.5, 0.7, 1.0])
+        graph.add_edge(node1, node2, weight=weight)
+        spill.add_edge(node1, node2, weight=weight)
+    assert len(spill.runs) > 10
+
+    path = str(tmp_path / 'graph.csr')
+    spill.save(path)
+    assert not os.path.exists(str(tmp_path / 'spill'))
+    assert [entry for entry in os.listdir(str(tmp_path)) if '.tmp' in entry or '.link' in entry] == []
+
+    saved, expected = CSRGraph.load(path), CSRGraph.from_graph(graph)
+    assert saved._type_names == expected._type_names
+    for key in ['names', 'name_offsets', 'name_order', 'types', 'indptr', 'indices', 'weights']:
+        np.testing.assert_array_equal(getattr(saved, '_' + key), getattr(expected, '_' + key))
+    for node in names[:20]:
+        assert saved.nearest_neighbor(node, 10) == graph.nearest_neighbor(node, 10)
@@ -0,0 +1,28 @@
+from utils import Vocabulary, UNK
+
+
+def test_vocabulary_keeps_only_the_arrays():
+    vocab = Vocabulary()
+    vocab.add_documents(['python sql python', 'Excel SQL python'])
+    vocab.build()
+    assert vocab.reverse_vocab == ['<pad>', UNK, 'python', 'sql', 'excel']
+    assert vocab.unk_id == 1
+    assert vocab.doc2id('SQL java') == [3, 1]
+    assert vocab.id_to_token(4) == 'excel'
+    assert not any(isinstance(value, list) for value in vars(vocab).values())
+
+def test_build_after_load_keeps_the_counts(tmp_path):
+    vocab = Vocabulary()
+    vocab.add_documents(['python sql python', 'excel sql python'])
+    vocab.build()
+    vocab.save(str(tmp_path / 'vocab'))
+
+    loaded = Vocabulary.load(str(tmp_path / 'vocab'))
+    assert loaded.token_to_id('python') == 2
+    loaded.add_documents(['excel excel excel java'])
+    loaded.build()
+    assert loaded.reverse_vocab == ['<pad>', UNK, 'excel', 'python', 'sql', 'java']
+    assert list(loaded._counts) == [0, 0, 4, 3, 2, 1]
+    # counts are only merged once
+    loaded.build()
+    assert list(loaded._counts) == [0, 0, 4, 3, 2, 1]
@@ -0,0 +1,37 @@
+from vectors import write_vectors, load_vectors, vectors_path, is_exported
+from multiprocessing import Pool
+import numpy as np
+import os
+
+
+def export(args):
+    model_path, seed = args
+    vectors = np.random.RandomState(seed).randn(50, 4)
+    write_vectors(model_path, ['w{}'.format(i) for i in range(50)], vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+    return len(load_vectors(model_path))
+
+def test_concurrent_exports(tmp_path):
+    model_path = str(tmp_path / 'model.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'model')
+    with Pool(4) as pool:
+        assert pool.map(export, [(model_path, seed) for seed in range(8)]) == [50] * 8
+    assert is_exported(model_path)
+    assert load_vectors(model_path).word(7) == 'w7'
+    assert not [entry for entry in os.listdir(str(tmp_path)) if '.tmp' in entry or '.link' in entry]
+
+def test_export_is_replaced_when_the_model_changes(tmp_path):
+    model_path = str(tmp_path / 'model.bin')
+    with open(model_path, 'wb') as f:
+        f.write(b'model')
+    export((model_path, 0))
+    mapped = load_vectors(model_path)
+    with open(model_path, 'wb') as f:
+        f.write(b'retrained model')
+    assert not is_exported(model_path)
+    export((model_path, 1))
+    assert is_exported(model_path)
+    # the old export stays readable by the processes which mapped it
+    assert mapped.word(3) == 'w3'
+    assert not np.array_equal(np.asarray(mapped.vectors_norm), np.asarray(load_vectors(model_path).vectors_norm))
+    assert os.path.islink(vectors_path(model_path))
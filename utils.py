@@ -1,70 +1,191 @@
 from collections import Counter
+from multiprocessing import Pool
+from functools import partial
+import numpy as np
+import json
+import os
+
+UNK = '<unk>'
 
 class Vocabulary():
-    """Vocabulary class to keep account of seen words, converting to index or vice versa based on token, document or documents
+    """Vocabulary class to keep account of seen words, converting to index or vice versa based on token, document or documents.
+    Counting can be split across worker processes (counts are merged), documents are converted to int32 arrays in bulk and
+    a built vocabulary is saved as a directory of .npy files which is memory-mapped on load.
     """
 
     def __init__(self, max_size = None, lower=True, unk_token=True, specials = ('<pad>',)):
         self._max_size = max_size
         self._lower = lower
         self._unk = unk_token
-        self._token2id = {token: i for i, token in enumerate(specials)}
-        self._id2token = list(specials)
+        self._specials = tuple(specials)
         self._token_count = Counter()
+        # True while the counts of a loaded vocabulary are not in the token counter
+        self._loaded_counts = False
+        self._set_tokens(list(specials))
+
+    def _set_tokens(self, tokens: list, counts=None):
+        """Index the tokens: the tokens are only kept as utf-8 bytes and offsets (the token -> id dict is built on the
+        first lookup, see vocab)
+        """
+        encoded = [token.encode('utf-8') for token in tokens]
+        self._tokens = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        self._offsets = np.cumsum([0] + [len(token) for token in encoded]).astype(np.int64)
+        self._counts = np.asarray(counts if counts is not None else np.zeros(len(tokens)), dtype=np.int64)
+        self._token2id = None
+        self._unk_id = tokens.index(UNK) if self._unk and UNK in tokens else None
+
+    def _iter_tokens(self):
+        data = bytes(self._tokens)
+        offsets = self._offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].decode('utf-8')
 
     def __len__(self):
-        return len(self._token2id)
+        return len(self._offsets) - 1
 
     def add_token(self, token):
         token = token.lower() if self._lower else token
-        self._token_count.update([token])
-
-    def add_documents(self, docs):
-        for sent in docs:
-            sent = [i.lower() if self._lower else i for i in sent.split()]
-            self._token_count.update(sent)
+        self._token_count[token] += 1
+
+    def add_documents(self, docs, n_process=1, chunksize=10000):
+        """Count the tokens of documents
+        
+        Arguments:
+            docs {iterable} -- documents as string
+        
+        Keyword Arguments:
+            n_process {int} -- number of worker processes counting chunks of documents, their counts are merged (default: {1})
+            chunksize {int} -- number of documents sent to a worker at once (default: {10000})
+        """
+        if n_process > 1:
+            with Pool(n_process) as pool:
+                for counts in pool.imap_unordered(partial(_count_tokens, lower=self._lower), _chunks(docs, chunksize)):
+                    self._token_count.update(counts)
+        else:
+            self._token_count.update(_count_tokens(docs, lower=self._lower))
 
     def add_document(self, doc):
-        sent = [i.lower() if self._lower else i for i in doc.split()]
-        self._token_count.update(sent)
+        self._token_count.update((doc.lower() if self._lower else doc).split())
 
     def doc2id(self, doc):
-        doc = [i.lower() if self._lower else i for i in doc.split()]
-        return [self.token_to_id(token) for token in doc]
+        doc = doc.lower() if self._lower else doc
+        return [self.token_to_id(token) for token in doc.split()]
+
+    def docs2id(self, docs):
+        """Convert documents to ids in bulk
+        
+        Arguments:
+            docs {iterable} -- documents as string
+        
+        Returns:
+            tuple -- (int32 array of the ids of all documents, int64 array of offsets: document i is ids[offsets[i]:offsets[i+1]])
+        """
+        vocab = self.vocab
+        lengths = [0]
+        ids = []
+        for doc in docs:
+            tokens = (doc.lower() if self._lower else doc).split()
+            lengths.append(len(tokens))
+            ids.extend(vocab.get(token, self._unk_id) for token in tokens)
+        if self._unk_id is None and None in ids:
+            raise KeyError('unknown token and no <unk> token in the vocabulary')
+        return np.array(ids, dtype=np.int32), np.cumsum(lengths).astype(np.int64)
 
     def id2doc(self, ids):
         return [self.id_to_token(idx) for idx in ids]
 
     def build(self):
-        token_freq = self._token_count.most_common(self._max_size)
-        idx = len(self.vocab)
-        for token, _ in token_freq:
-            self._token2id[token] = idx
-            self._id2token.append(token)
-            idx += 1
-        if self._unk:
-            unk = '<unk>'
-            self._token2id[unk] = idx
-            self._id2token.append(unk)
+        """Keep the specials, the <unk> token (if any) and the max_size most common tokens, by decreasing count
+        (ties in alphabetical order, so the ids do not depend on the order in which counts were merged).
+        After load, the saved counts are added to the counts of the new documents
+        """
+        if self._loaded_counts:
+            self._token_count.update({token: int(count) for token, count in zip(self._iter_tokens(), self._counts) if count})
+            self._loaded_counts = False
+        reserved = list(self._specials) + ([UNK] if self._unk and UNK not in self._specials else [])
+        token_freq = sorted(((token, count) for token, count in self._token_count.items() if token not in reserved),
+                            key=lambda item: (-item[1], item[0]))[:self._max_size]
+        self._set_tokens(reserved + [token for token, _ in token_freq],
+                         [0] * len(reserved) + [count for _, count in token_freq])
 
     def token_to_id(self, token):
         token = token.lower() if self._lower else token
-        return self._token2id.get(token, len(self._token2id) - 1)
+        idx = self.vocab.get(token, self._unk_id)
+        if idx is None:
+            raise KeyError(token)
+        return idx
 
     def id_to_token(self, idx):
-        return self._id2token[idx]
+        return bytes(self._tokens[self._offsets[idx]:self._offsets[idx + 1]]).decode('utf-8')
+
+    @property
+    def unk_id(self):
+        return self._unk_id
 
     @property
     def vocab(self):
+        if self._token2id is None:
+            self._token2id = {token: i for i, token in enumerate(self._iter_tokens())}
         return self._token2id
 
     @property
     def reverse_vocab(self):
-        return self._id2token
+        # decoded from the arrays on every call (use id_to_token for single ids)
+        return list(self._iter_tokens())
 
     def token_counter(self):
         return self._token_count
 
+    def save(self, path: str):
+        """Save the built vocabulary (tokens and their counts) as a directory of .npy files
+        
+        Arguments:
+            path {str} -- path to the directory
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        for key in ['tokens', 'offsets', 'counts']:
+            np.save(os.path.join(path, key + '.npy'), getattr(self, '_' + key))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'max_size': self._max_size, 'lower': self._lower, 'unk_token': self._unk,
+                       'specials': list(self._specials), 'unk_id': self._unk_id}, f)
+
+    @classmethod
+    def load(cls, path: str):
+        """Memory-map a vocabulary saved by save. The token dict is only built on the first token lookup
+        
+        Arguments:
+            path {str} -- path to the directory
+        
+        Returns:
+            Vocabulary -- vocabulary
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        vocab = cls(max_size=meta['max_size'], lower=meta['lower'], unk_token=meta['unk_token'], specials=meta['specials'])
+        vocab._tokens, vocab._offsets, vocab._counts = [np.load(os.path.join(path, key + '.npy'), mmap_mode='r')
+                                                        for key in ['tokens', 'offsets', 'counts']]
+        vocab._token2id = None
+        vocab._unk_id = meta['unk_id']
+        vocab._loaded_counts = True
+        return vocab
+
+def _count_tokens(docs, lower=True) -> Counter:
+    counts = Counter()
+    for doc in docs:
+        counts.update((doc.lower() if lower else doc).split())
+    return counts
+
+def _chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 class SentencesIterator():
     """Continuous generator function 
     """
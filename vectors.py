@@ -0,0 +1,250 @@
+from cache import model_tag
+import numpy as np
+import argparse
+import shutil
+import json
+import sys
+import os
+
+
+class MappedVectors():
+    """Read-only word vectors memory-mapped from an export of a fastText model (see export_vectors): the normalized
+    vocabulary matrix and the vocabulary (utf-8 words with offsets, ids sorted by word for lookups).
+    Opening costs a few milliseconds and every process mapping the same files shares one physical copy through the
+    page cache. Implements the part of the gensim KeyedVectors interface used by Filter, VectorScorer and the ANN index.
+    Unlike the fastText model, the n-gram buckets are not exported: words out of the vocabulary are unknown (KeyError).
+    """
+
+    def __init__(self, vectors, words, offsets, order):
+        """
+        Arguments:
+            vectors {np.ndarray} -- normalized vectors (float32, one row per word)
+            words {np.ndarray} -- utf-8 encoded words concatenated (uint8)
+            offsets {np.ndarray} -- start of every word in words (n + 1)
+            order {np.ndarray} -- word ids sorted by word
+        """
+        self.vectors_norm = vectors
+        self._words = words
+        self._offsets = offsets
+        self._order = order
+        self._ids = {}
+
+    @classmethod
+    def load(cls, path: str):
+        """Memory-map an export
+
+        Arguments:
+            path {str} -- path to the export directory
+
+        Returns:
+            MappedVectors -- vectors
+        """
+        # every file is read from the version the path points to when loading starts (see replace_dir)
+        path = os.path.realpath(path)
+        arrays = {key: np.load(os.path.join(path, key + '.npy'), mmap_mode='r') for key in ['vectors', 'words', 'offsets', 'order']}
+        return cls(**arrays)
+
+    def __len__(self):
+        return len(self._order)
+
+    @property
+    def wv(self):
+        # same access path as the gensim model (model.wv)
+        return self
+
+    @property
+    def vocab(self):
+        return _Vocab(self)
+
+    @property
+    def index2word(self):
+        return _Index2Word(self)
+
+    def init_sims(self):
+        pass
+
+    def word(self, idx: int) -> str:
+        return bytes(self._words[self._offsets[idx]:self._offsets[idx + 1]]).decode('utf-8')
+
+    def index(self, word: str) -> int:
+        """Id of a word (binary search over the sorted words)
+
+        Arguments:
+            word {str} -- word
+
+        Returns:
+            int -- id of the word, KeyError if the word is not in the vocabulary
+        """
+        idx = self._ids.get(word)
+        if idx is None:
+            key = word.encode('utf-8')
+            low, high = 0, len(self._order)
+            while low < high:
+                mid = (low + high) // 2
+                i = self._order[mid]
+                if bytes(self._words[self._offsets[i]:self._offsets[i + 1]]) < key:
+                    low = mid + 1
+                else:
+                    high = mid
+            if low == len(self._order) or self.word(self._order[low]) != word:
+                raise KeyError(word)
+            idx = self._ids[word] = int(self._order[low])
+        return idx
+
+    def word_vec(self, word: str, use_norm=True):
+        """Unit vector of a word (only the normalized vectors are exported: use_norm is ignored, both give the same cosine
+        similarities)
+        """
+        return self.vectors_norm[self.index(word)]
+
+    def similarity(self, word1: str, word2: str) -> float:
+        return float(np.dot(self.word_vec(word1), self.word_vec(word2)))
+
+    def most_similar(self, word: str, topn=10) -> list:
+        """Most similar words of a word (the word itself excluded), as gensim
+
+        Arguments:
+            word {str} -- word
+
+        Keyword Arguments:
+            topn {int} -- number of neighbors (default: {10})
+
+        Returns:
+            list -- list of (word, similarity)
+        """
+        from scoring import top_k
+
+        idx = self.index(word)
+        dists = self.vectors_norm @ self.vectors_norm[idx]
+        best = top_k(dists[None, :], topn + 1)[0]
+        return [(self.word(i), float(dists[i])) for i in best if i != idx][:topn]
+
+class _Vocab():
+    """word -> entry with the index of the word (as KeyedVectors.vocab)
+    """
+
+    def __init__(self, vectors: MappedVectors):
+        self._vectors = vectors
+
+    def __contains__(self, word: str) -> bool:
+        try:
+            self._vectors.index(word)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, word: str):
+        return _Entry(self._vectors.index(word))
+
+    def __len__(self):
+        return len(self._vectors)
+
+class _Entry():
+    __slots__ = ('index',)
+
+    def __init__(self, index: int):
+        self.index = index
+
+class _Index2Word():
+    """index -> word (as KeyedVectors.index2word)
+    """
+
+    def __init__(self, vectors: MappedVectors):
+        self._vectors = vectors
+
+    def __getitem__(self, idx: int) -> str:
+        return self._vectors.word(idx)
+
+    def __len__(self):
+        return len(self._vectors)
+
+def vectors_path(model_path: str) -> str:
+    """Directory of the export of a model (next to the model file)
+    """
+    return model_path + '.vectors'
+
+def is_exported(model_path: str) -> bool:
+    """Whether the export of a model exists and was made from the current model file
+    """
+    meta_path = os.path.join(vectors_path(model_path), 'meta.json')
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        return json.load(f).get('model') == model_tag(model_path)
+
+def export_vectors(model_path: str) -> str:
+    """Export the normalized vocabulary matrix and the vocabulary of a fastText model
+
+    Arguments:
+        model_path {str} -- path to word embedding model file
+
+    Returns:
+        str -- path to the export directory
+    """
+    from gensim.models.wrappers import FastText
+
+    model = FastText.load_fasttext_format(model_path)
+    model.wv.init_sims()
+    return write_vectors(model_path, model.wv.index2word, model.wv.vectors_norm)
+
+def write_vectors(model_path: str, words: list, vectors) -> str:
+    """Write the export of a model (.npy files written to a temporary directory swapped in atomically, see replace_dir:
+    concurrent readers see the old export or the new one). If another process finished exporting the same model file
+    meanwhile, its export is kept
+
+    Arguments:
+        model_path {str} -- path to word embedding model file the vectors belong to
+        words {list} -- vocabulary, in the order of the rows
+        vectors {np.ndarray} -- normalized vocabulary matrix
+
+    Returns:
+        str -- path to the export directory
+    """
+    from atomic import temp_path, replace_dir
+
+    encoded = [word.encode('utf-8') for word in words]
+    path = vectors_path(model_path)
+    temp = temp_path(path)
+    os.makedirs(temp)
+    np.save(os.path.join(temp, 'vectors.npy'), np.ascontiguousarray(vectors, dtype=np.float32))
+    np.save(os.path.join(temp, 'words.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(temp, 'offsets.npy'), np.cumsum([0] + [len(word) for word in encoded]).astype(np.int64))
+    np.save(os.path.join(temp, 'order.npy'), np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64))
+    with open(os.path.join(temp, 'meta.json'), 'w') as f:
+        json.dump({'model': model_tag(model_path), 'count': len(encoded), 'dim': int(vectors.shape[1])}, f)
+
+    if is_exported(model_path):
+        # a concurrent export of the same model file finished first
+        shutil.rmtree(temp)
+    else:
+        replace_dir(temp, path)
+    return path
+
+def load_vectors(model_path: str) -> MappedVectors:
+    """Memory-map the export of a model, exporting it first if it is missing or older than the model
+
+    Arguments:
+        model_path {str} -- path to word embedding model file
+
+    Returns:
+        MappedVectors -- vectors
+    """
+    if not is_exported(model_path):
+        export_vectors(model_path)
+    return MappedVectors.load(vectors_path(model_path))
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--modelpath', type=str, help='Enter path of pre-trained word embedding model in gensim keywordvector format')
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # SAMPLE FOR COMMAND LINE (writes /media/druv022/Data2/Challenge/models/fasttext_model.bin.vectors):
+    # python vectors.py --modelpath /media/druv022/Data2/Challenge/models/fasttext_model.bin
+    args = parse_arguments(sys.argv[1:])
+    path = export_vectors(args.modelpath)
+    vectors = MappedVectors.load(path)
+    print('{} vectors of dimension {} exported at: {}'.format(len(vectors), vectors.vectors_norm.shape[1], path))